@@ -0,0 +1,289 @@
+import asyncio
+import json
+import threading
+
+from langchain_core.messages.ai import AIMessage
+
+import socra
+from socra.agents import Agent, Context
+from socra.agents.checkpoint import SessionCheckpointer
+from socra.agents.compaction import SUMMARY_NAME, CompactionConfig, ContextCompactor
+from socra.agents.executor import DEFAULT_MAX_WORKERS, configure_executor
+from socra.completions import CompletionLog, MockResponse
+from socra.completions.usage import TokenUsage
+
+
+class TestAgent:
+    def test_arun(self):
+        """
+        - async runs callables are awaited
+        - sync runs callables are executed
+        """
+
+        async def async_action(context: Context):
+            context.add_thought("async")
+
+        def sync_action(context: Context):
+            context.add_thought("sync")
+
+        ctx = Context(messages=[])
+        asyncio.run(
+            Agent(key="a", name="a", description="a", runs=async_action).arun(ctx)
+        )
+        asyncio.run(
+            Agent(key="b", name="b", description="b", runs=sync_action).arun(ctx)
+        )
+
+        assert ctx.history[-2:] == ["a", "b"]
+        assert [m.content[0].text for m in ctx.messages[-2:]] == ["async", "sync"]
+
+    def test_arun_executor(self):
+        """
+        - aruns is awaited instead of runs, and run() still uses runs
+        - sync runs callables run in the bounded agent executor
+        """
+        threads = []
+
+        async def async_action(context: Context):
+            context.add_thought("async")
+
+        def sync_action(context: Context):
+            threads.append(threading.current_thread().name)
+            context.add_thought("sync")
+
+        agent = Agent(
+            key="a", name="a", description="a", runs=sync_action, aruns=async_action
+        )
+        ctx = Context(messages=[])
+        asyncio.run(agent.arun(ctx))
+        agent.run(ctx)
+        assert [m.content[0].text for m in ctx.messages] == ["async", "sync"]
+
+        executor = configure_executor(2)
+        try:
+            sync_agent = Agent(key="b", name="b", description="b", runs=sync_action)
+
+            async def run_many():
+                contexts = [Context(messages=[]) for _ in range(4)]
+                await asyncio.gather(*[sync_agent.arun(c) for c in contexts])
+
+            asyncio.run(run_many())
+        finally:
+            configure_executor(DEFAULT_MAX_WORKERS)
+
+        assert executor.max_workers == 2
+        assert all(name.startswith("socra-agent") for name in threads[1:])
+        assert len(set(threads[1:])) <= 2
+
+    def test_run_async_callable(self):
+        async def async_action(context: Context):
+            context.add_thought("async")
+
+        ctx = Context(messages=[])
+        Agent(key="a", name="a", description="a", runs=async_action).run(ctx)
+        assert ctx.messages[-1].content[0].text == "async"
+
+    def test_run_inside_event_loop(self):
+        """
+        - run() works from async code, e.g. Jupyter or a server handler,
+          running coroutine hooks and actions on the agent loop thread
+        """
+        threads = []
+
+        async def hook(context: Context):
+            threads.append(threading.current_thread().name)
+
+        async def async_action(context: Context):
+            context.add_thought("async")
+
+        agent = Agent(
+            key="a",
+            name="a",
+            description="a",
+            aruns=async_action,
+            before_run=[hook],
+        )
+
+        async def handler():
+            ctx = Context(messages=[])
+            agent.run(ctx)
+            return ctx
+
+        ctx = asyncio.run(handler())
+        assert ctx.messages[-1].content[0].text == "async"
+        assert threads == ["socra-agent-loop"]
+
+
+class _SummaryLLM:
+    def __init__(self):
+        self.prompts = []
+
+    def bind(self, **kwargs):
+        return self
+
+    async def ainvoke(self, messages):
+        return self.invoke(messages)
+
+    def invoke(self, messages):
+        self.prompts.append(messages)
+        return AIMessage(
+            content="- summary",
+            usage_metadata={"input_tokens": 1, "output_tokens": 1, "total_tokens": 2},
+        )
+
+
+class TestCompaction:
+    def test_compacts_between_steps(self, monkeypatch):
+        """
+        - the history is compacted once past the threshold
+        - the system message and recent messages are kept
+        - a previous summary is rolled into the next one
+        """
+        llm = _SummaryLLM()
+        monkeypatch.setattr("socra.completions.base.get_llm", lambda model: llm)
+        monkeypatch.setattr(socra.Model, "count_tokens", lambda self, text: len(text))
+
+        compactor = ContextCompactor(
+            CompactionConfig(threshold_tokens=30, keep_recent=2)
+        )
+
+        def step(context: Context):
+            context.add_thought("x" * 60)
+
+        agent = Agent(
+            key="a", name="a", description="a", runs=step, before_run=[compactor]
+        )
+        system = socra.Message(role=socra.Message.Role.SYSTEM, content="system")
+        ctx = Context(messages=[system])
+        for _ in range(6):
+            agent.run(ctx)
+
+        assert len(ctx.compactions) == 2
+        assert ctx.messages[0] is system
+        assert ctx.messages[1].name == SUMMARY_NAME
+        assert len(ctx.messages) == 5
+        assert "- summary" in llm.prompts[1][1].content
+        assert ctx.compactions[0].tokens_before == 120
+        assert ctx.tokens_saved == sum(c.tokens_saved for c in ctx.compactions) > 0
+        assert len(ctx.completions) == 2
+
+    def test_compacts_natively_async(self, monkeypatch):
+        llm = _SummaryLLM()
+        monkeypatch.setattr("socra.completions.base.aget_llm", lambda model: llm)
+        monkeypatch.setattr(socra.Model, "count_tokens", lambda self, text: len(text))
+
+        async def step(context: Context):
+            context.add_thought("x" * 60)
+
+        compactor = ContextCompactor(
+            CompactionConfig(threshold_tokens=30, keep_recent=2)
+        )
+        agent = Agent(
+            key="a", name="a", description="a", aruns=step, before_run=[compactor]
+        )
+        ctx = Context(messages=[])
+
+        async def run():
+            for _ in range(5):
+                await agent.arun(ctx)
+
+        asyncio.run(run())
+
+        assert len(ctx.compactions) == 1
+        assert ctx.messages[0].name == SUMMARY_NAME
+
+
+class TestCompletionRecords:
+    def test_ring_buffer_and_log(self, tmp_path):
+        """
+        - only the most recent records are kept, totals cover all completions
+        - the log receives every completion with its prompt and content
+        """
+        log = CompletionLog(str(tmp_path / "completions.jsonl"))
+        ctx = Context(max_completions=3, completion_log=log)
+        ctx.add_invocation("step")
+
+        for i in range(5):
+            cr = socra.Completion(
+                socra.Model.for_key(socra.Model.Key.GPT_4O_MINI_2024_07_18),
+                ctx.prompt(f"say {i}"),
+                mock_response=MockResponse(
+                    content=str(i),
+                    usage=TokenUsage(input=2, output=1, total=3),
+                    enabled=True,
+                ),
+                use_cache=False,
+            )
+            cr.process()
+            ctx.track_completion(cr)
+
+        assert len(ctx.completions) == 3
+        assert ctx.completion_count == 5
+        assert ctx.token_usage.total == 15
+        assert ctx.latency.completions == 5
+        assert ctx.latency_by_step()["step"].completions == 5
+        assert ctx.completions[-1].model == "gpt-4o-mini-2024-07-18"
+
+        log.close()
+        lines = (tmp_path / "completions.jsonl").read_text().splitlines()
+        entries = [json.loads(line) for line in lines]
+        assert [e["content"] for e in entries] == ["0", "1", "2", "3", "4"]
+        assert entries[-1]["prompt"]["messages"][-1]["content"] == "say 4"
+        assert entries[-1]["id"] == ctx.completions[-1].id
+
+
+class TestCheckpoint:
+    def test_resume(self, tmp_path):
+        """
+        - the context is rebuilt from per-step deltas
+        - rewritten history (e.g. compaction) is checkpointed
+        - a torn last line is ignored
+        """
+        checkpointer = SessionCheckpointer.for_session("s", str(tmp_path))
+        ctx = Context()
+        ctx.add_message(socra.Message(role=socra.Message.Role.HUMAN, content="hi"))
+
+        for i in range(3):
+            ctx.add_invocation(f"step-{i}")
+            ctx.add_thought(f"thought {i}")
+            cr = socra.Completion(
+                socra.Model.for_key(socra.Model.Key.GPT_4O_MINI_2024_07_18),
+                ctx.prompt("go"),
+                mock_response=MockResponse(
+                    content="ok",
+                    usage=TokenUsage(input=2, output=1, total=3),
+                    enabled=True,
+                ),
+                use_cache=False,
+            )
+            cr.process()
+            ctx.track_completion(cr)
+            checkpointer.save(ctx)
+
+        # rewrite the history, as compaction does
+        ctx.messages = ctx.messages[:1].appended(
+            socra.Message(role=socra.Message.Role.HUMAN, content="summary")
+        )
+        ctx.stop()
+        checkpoint = checkpointer.save(ctx)
+        assert checkpoint.keep == 1
+        assert len(checkpoint.messages) == 1
+        assert checkpoint.completions == []
+
+        with open(checkpointer.path, "a") as f:
+            f.write('{"step": 5, "keep"')
+
+        resumed = SessionCheckpointer(checkpointer.path)
+        loaded = resumed.load()
+        assert resumed.steps == 4
+        assert [m.content[0].text for m in loaded.messages] == ["hi", "summary"]
+        assert loaded.history == ["step-0", "step-1", "step-2"]
+        assert loaded.completion_count == 3
+        assert list(loaded.completions) == list(ctx.completions)
+        assert loaded.token_usage == ctx.token_usage
+        assert loaded.latency == ctx.latency
+        assert loaded.terminated
+
+        # resumed sessions keep appending deltas
+        loaded.add_thought("more")
+        assert resumed.save(loaded).keep == 2
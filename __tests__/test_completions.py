@@ -0,0 +1,612 @@
+import asyncio
+import importlib.metadata
+import json
+from decimal import Decimal
+
+import httpx
+import pytest
+
+from langchain_core.messages.ai import AIMessageChunk
+from openai.types.chat import ChatCompletionChunk
+
+import socra
+from socra.completions.anthropic_chat import PooledChatAnthropic
+from socra.completions.base import MockResponse
+from socra.completions.cache import CompletionCache
+from socra.completions.cassette import CassetteEntry, CassetteMode, use_cassette
+from socra.completions.cost import CostLedger
+from socra.completions.clients import ClientConfig, ClientRegistry, configure_clients
+from socra.completions.fake_server import FakeLLMServer, FakeServerConfig
+from socra.completions.openai_chat import (
+    UPSTREAM_VERSION,
+    _UPSTREAM_DIGESTS,
+    _generation_chunk,
+    upstream_digests,
+    upstream_matches,
+)
+from socra.completions.scheduler import is_rate_limit_error
+from socra.completions.stream import StreamAggregator
+from socra.completions.structured import decision_schema, strict_json_schema
+from socra.agents.user_interaction.actions import InputChoicesPayload
+from socra.agents import Context
+from socra.agents.agent_decision import _decision_prompt
+from socra.completions.usage import TokenCost, TokenUsage
+
+
+def _completion(content: str = "hello") -> socra.Completion:
+    return socra.Completion(
+        socra.Model.for_key(socra.Model.Key.GPT_4O_MINI_2024_07_18),
+        socra.Prompt(messages="hi"),
+        mock_response=MockResponse(
+            content=content,
+            usage=TokenUsage(input=10, output=5, total=15),
+            enabled=True,
+        ),
+    )
+
+
+class TestCompletion:
+    def test_process_mock(self):
+        resp = _completion().process()
+        assert resp.content == "hello"
+        assert resp.usage.total == 15
+
+    def test_aprocess_mock(self):
+        """
+        - aprocess returns the same response as process
+        - many completions can be awaited concurrently
+        """
+
+        resp = asyncio.run(_completion().aprocess())
+        assert resp.content == "hello"
+        assert resp.usage.total == 15
+
+        async def run_many():
+            return await asyncio.gather(
+                *[_completion(str(i)).aprocess() for i in range(5)]
+            )
+
+        responses = asyncio.run(run_many())
+        assert [r.content for r in responses] == ["0", "1", "2", "3", "4"]
+
+    def test_anthropic_usage(self, monkeypatch):
+        """
+        - a non-streaming completion reads usage from an Anthropic response
+        """
+
+        def handler(request):
+            return httpx.Response(
+                200,
+                json={
+                    "id": "msg_1",
+                    "type": "message",
+                    "role": "assistant",
+                    "model": "claude-3-haiku-20240307",
+                    "content": [{"type": "text", "text": "hello"}],
+                    "stop_reason": "end_turn",
+                    "stop_sequence": None,
+                    "usage": {"input_tokens": 12, "output_tokens": 3},
+                },
+            )
+
+        llm = PooledChatAnthropic(
+            model="claude-3-haiku-20240307",
+            api_key="test",
+            http_client=httpx.Client(transport=httpx.MockTransport(handler)),
+        )
+        monkeypatch.setattr("socra.completions.base.get_llm", lambda model: llm)
+
+        haiku = socra.Model.for_key(socra.Model.Key.CLAUDE_3_HAIKU_20240307)
+        response = socra.Completion(haiku, socra.Prompt(messages="hi")).process()
+        assert response.content == "hello"
+        assert response.usage == TokenUsage(input=12, output=3, total=15)
+
+
+class TestClientRegistry:
+    def test_clients_are_reused(self, monkeypatch):
+        """
+        - the same client is returned for the same model
+        - a new configuration re-creates clients
+        """
+        monkeypatch.setenv("OPENAI_API_KEY", "test")
+        registry = ClientRegistry(ClientConfig(max_connections=4))
+        model = socra.Model.for_key(socra.Model.Key.GPT_4O_MINI_2024_07_18)
+
+        llm = registry.get(model)
+        assert registry.get(model) is llm
+
+        registry.configure(ClientConfig(timeout=5))
+        assert registry.get(model) is not llm
+        registry.close()
+
+    def test_async_clients_are_closed(self, monkeypatch):
+        """
+        - async clients are shared on one event loop
+        - they are closed when the loop shuts down, or by aclose()
+        - Anthropic clients use the pooled HTTP clients too
+        """
+        monkeypatch.setenv("OPENAI_API_KEY", "test")
+        monkeypatch.setenv("ANTHROPIC_API_KEY", "test")
+        registry = ClientRegistry()
+        mini = socra.Model.for_key(socra.Model.Key.GPT_4O_MINI_2024_07_18)
+        haiku = socra.Model.for_key(socra.Model.Key.CLAUDE_3_HAIKU_20240307)
+
+        async def get_clients():
+            llm = registry.aget(mini)
+            assert registry.aget(mini) is llm
+            registry.aget(haiku)
+            await asyncio.sleep(0)
+            return registry._loop_clients[asyncio.get_running_loop()].http_clients
+
+        http_clients = asyncio.run(get_clients())
+        assert all(client.is_closed for client in http_clients.values())
+
+        async def get_and_close():
+            http_clients = await get_clients()
+            await registry.aclose()
+            return http_clients
+
+        http_clients = asyncio.run(get_and_close())
+        assert all(client.is_closed for client in http_clients.values())
+
+        llm = registry.get(haiku)
+        assert llm._client._client is registry._http_clients[haiku.provider]
+        registry.close()
+
+
+class TestCompletionCache:
+    def test_hit_and_miss(self, tmp_path):
+        """
+        - identical prompts hit the cache, different prompts miss
+        - cached usage is preserved
+        """
+        cache = CompletionCache(str(tmp_path / "cache.db"))
+        model = socra.Model.for_key(socra.Model.Key.GPT_4O_MINI_2024_07_18)
+        key = socra.Completion(model, socra.Prompt(messages="hi")).cache_key
+
+        assert cache.get(key) is None
+        cache.set(key, model.key.value, "hello", TokenUsage(input=1, output=2, total=3))
+
+        same_key = socra.Completion(model, socra.Prompt(messages="hi")).cache_key
+        other_key = socra.Completion(model, socra.Prompt(messages="bye")).cache_key
+        assert cache.get(same_key).usage.total == 3
+        assert cache.get(other_key) is None
+        assert (cache.stats.hits, cache.stats.misses) == (1, 2)
+
+    def test_cached_completion_replays_chunks(self, tmp_path):
+        cache = CompletionCache(str(tmp_path / "cache.db"))
+        model = socra.Model.for_key(socra.Model.Key.GPT_4O_MINI_2024_07_18)
+        key = socra.Completion(model, socra.Prompt(messages="hi")).cache_key
+        cache.set(key, model.key.value, "hello", TokenUsage(input=1, output=2, total=3))
+
+        chunks = []
+        resp = socra.Completion(
+            model, socra.Prompt(messages="hi"), on_chunk=chunks.append, cache=cache
+        ).process()
+        assert resp.cached
+        assert resp.usage.total == 3
+        assert resp.cost.total == 0
+        assert chunks[-1].aggregate == "hello"
+
+    def test_eviction_by_size(self, tmp_path):
+        cache = CompletionCache(str(tmp_path / "cache.db"), max_bytes=10)
+        usage = TokenUsage(input=1, output=1, total=2)
+        cache.set("a", "m", "12345678", usage)
+        cache.set("b", "m", "12345678", usage)
+        assert cache.get("a") is None
+        assert cache.get("b") is not None
+
+
+class TestProcessMany:
+    def test_order_failures_and_totals(self):
+        """
+        - results keep input order
+        - a failing completion does not affect the others
+        - usage is aggregated over successful completions
+        """
+        failing = _completion()
+        failing.prompt = None  # fails before any request is sent
+        failing._mock_response = None
+        completions = [_completion("a"), failing, _completion("c")]
+
+        for output in [
+            socra.Completion.process_many(completions, max_concurrency=2),
+            asyncio.run(socra.Completion.aprocess_many(completions, max_concurrency=2)),
+        ]:
+            assert [r.content if r else None for r in output.responses] == [
+                "a",
+                None,
+                "c",
+            ]
+            assert [item.index for item in output.errors] == [1]
+            assert output.usage.total == 30
+
+
+class TestStreamAggregator:
+    def test_aggregation(self):
+        """
+        - content is the concatenation of all chunks
+        - payload aggregates reflect the text received so far
+        - usage metadata is collected
+        """
+        aggregator = StreamAggregator()
+        payloads = [
+            aggregator.add(AIMessageChunk(content=text)) for text in ["a", "b", "c"]
+        ]
+        aggregator.add(
+            AIMessageChunk(
+                content="",
+                usage_metadata={
+                    "input_tokens": 1,
+                    "output_tokens": 3,
+                    "total_tokens": 4,
+                },
+            )
+        )
+
+        assert aggregator.content == "abc"
+        assert [p.chunk for p in payloads] == ["a", "b", "c"]
+        assert [p.aggregate for p in payloads] == ["a", "ab", "abc"]
+        assert aggregator.usage.total == 4
+
+    def test_streamed_cached_tokens(self):
+        """
+        - raw OpenAI stream chunks are converted keeping the cached prompt
+          tokens of the final usage chunk
+        - the aggregator counts them as cached input
+        """
+        completion = {
+            "id": "chatcmpl-1",
+            "object": "chat.completion.chunk",
+            "created": 0,
+            "model": "gpt-4o-mini-2024-07-18",
+        }
+        raw_chunks = [
+            {
+                **completion,
+                "choices": [{"index": 0, "delta": {"content": text}}],
+            }
+            for text in ["hel", "lo"]
+        ] + [
+            {
+                **completion,
+                "choices": [],
+                "usage": {
+                    "prompt_tokens": 2048,
+                    "completion_tokens": 2,
+                    "total_tokens": 2050,
+                    "prompt_tokens_details": {"cached_tokens": 1920},
+                },
+            }
+        ]
+
+        aggregator = StreamAggregator()
+        for raw in raw_chunks:
+            chunk = ChatCompletionChunk.model_validate(raw)
+            aggregator.add(_generation_chunk(chunk, AIMessageChunk).message)
+
+        assert aggregator.content == "hello"
+        assert aggregator.usage.input == 2048
+        assert aggregator.usage.cached_input == 1920
+
+    def test_mirrored_stream_code_is_current(self):
+        """
+        - the installed langchain-openai has the streaming code mirrored by
+          StreamUsageChatOpenAI. On an upgrade, update the mirror and its
+          digests together with the pin in pyproject.toml.
+        """
+        assert importlib.metadata.version("langchain-openai") == UPSTREAM_VERSION
+        assert upstream_digests() == _UPSTREAM_DIGESTS
+        assert upstream_matches()
+
+
+class TestCassette:
+    def test_record_and_replay(self, tmp_path):
+        """
+        - completions served from the cache are recorded
+        - replay returns recordings in order and streams recorded chunks
+        """
+        path = str(tmp_path / "session.jsonl")
+        model = socra.Model.for_key(socra.Model.Key.GPT_4O_MINI_2024_07_18)
+        cache = CompletionCache(str(tmp_path / "cache.db"))
+        key = socra.Completion(model, socra.Prompt(messages="hi")).cache_key
+        cache.set(key, model.key.value, "hello", TokenUsage(input=1, output=1, total=2))
+
+        try:
+            use_cassette(path, CassetteMode.RECORD)
+            socra.Completion(model, socra.Prompt(messages="hi"), cache=cache).process()
+
+            with open(path, "a") as file:
+                entry = CassetteEntry(
+                    key=key,
+                    model=model.key.value,
+                    content="world",
+                    usage=TokenUsage(input=1, output=1, total=2),
+                    chunks=[(0.1, "wor"), (0.2, "ld")],
+                )
+                file.write(entry.model_dump_json() + "\n")
+
+            use_cassette(path, CassetteMode.REPLAY)
+            chunks = []
+            contents = [
+                socra.Completion(
+                    model,
+                    socra.Prompt(messages="hi"),
+                    on_chunk=chunks.append,
+                    use_cache=False,
+                )
+                .process()
+                .content
+                for _ in range(3)
+            ]
+        finally:
+            use_cassette(None)
+
+        assert contents == ["hello", "world", "world"]
+        assert [c.aggregate for c in chunks[1:3]] == ["wor", "world"]
+
+
+class TestPromptCaching:
+    def test_cached_input_pricing(self):
+        """
+        - cached input tokens are billed at the cached input rate
+        - usage sums keep cached input tokens
+        """
+        model = socra.Model.for_key(socra.Model.Key.GPT_4O_MINI_2024_07_18)
+        uncached = TokenUsage(input=1000, output=0, total=1000)
+        cached = TokenUsage(input=1000, output=0, total=1000, cached_input=1000)
+
+        assert TokenCost.for_model(model, cached).input == pytest.approx(
+            TokenCost.for_model(model, uncached).input / 2
+        )
+        assert (uncached + cached).cache_hit_ratio == 0.5
+
+    def test_context_prompts_share_prefix(self):
+        ctx = Context(messages=[])
+        ctx.add_message(socra.Message(role=socra.Message.Role.HUMAN, content="hi"))
+        first = ctx.prompt("instruction one")
+        ctx.add_thought("thinking")
+        second = ctx.prompt("instruction two")
+
+        prefix = first.to_json()["messages"][:-1]
+        assert second.to_json()["messages"][: len(prefix)] == prefix
+
+
+class TestFakeServer:
+    @pytest.fixture
+    def server(self):
+        config = FakeServerConfig(ttft=0, tokens_per_second=0, retry_after=0, seed=0)
+        with FakeLLMServer(config) as server:
+            configure_clients(ClientConfig(base_url=server.url, max_retries=0))
+            yield server
+        configure_clients(ClientConfig())
+
+    def _instruction(self) -> str:
+        return _decision_prompt.format(
+            children="- key: a\n  name: A\n  description: first\n"
+            "- key: b\n  name: B\n  description: second"
+        )
+
+    def _prompt(self) -> socra.Prompt:
+        return socra.Prompt(messages=self._instruction())
+
+    def test_end_to_end(self, server):
+        """
+        - invoke and stream against the fake server
+        - decision prompts are answered with one of the listed keys
+        """
+        model = socra.Model.for_key(socra.Model.Key.GPT_4O_MINI_2024_07_18)
+
+        resp = socra.Completion(model, self._prompt(), use_cache=False).process()
+        assert json.loads(resp.content)["key"] in ("a", "b")
+        assert resp.usage.output > 0
+
+        chunks = []
+        resp = socra.Completion(
+            model,
+            self._prompt(),
+            on_chunk=lambda payload: chunks.append(payload.chunk),
+            use_cache=False,
+        ).process()
+        assert "".join(chunks) == resp.content
+        assert len(chunks) > 1
+        assert resp.usage.total == resp.usage.input + resp.usage.output
+        assert server.requests == 2
+
+    def test_rate_limit_injection(self, server):
+        server.config.rate_limit_rate = 1.0
+        model = socra.Model.for_key(socra.Model.Key.GPT_4O_MINI_2024_07_18)
+
+        with pytest.raises(Exception) as e:
+            socra.Completion(model, self._prompt(), use_cache=False).process()
+        assert is_rate_limit_error(e.value)
+
+    def test_timings(self, server):
+        """
+        - streamed completions record ttft, request time and local phases
+        - the context aggregates timings per step
+        """
+        server.config.ttft = 0.05
+        context = Context()
+        context.add_invocation("decide")
+        prompt = context.prompt(self._instruction())
+
+        cr = socra.Completion(
+            socra.Model.for_key(socra.Model.Key.GPT_4O_MINI_2024_07_18),
+            prompt,
+            on_chunk=lambda payload: None,
+            use_cache=False,
+        )
+        cr.process()
+        cr.parse_json()
+        context.track_completion(cr)
+
+        timings = cr.response.timings
+        assert timings.ttft >= 0.05
+        assert timings.request_time >= timings.ttft
+        assert timings.wall_time >= timings.request_time
+        assert timings.output_tokens == cr.response.usage.output
+        assert {"prompt_build", "conversion", "parse"} <= set(timings.phases)
+
+        steps = context.latency_by_step()
+        assert list(steps) == ["decide"]
+        assert steps["decide"].completions == 1
+        assert steps["decide"].phases["parse"] == timings.phases["parse"]
+
+    def test_structured_output(self, server):
+        """
+        - the schema is sent as a strict JSON schema response format
+        - the response is validated into `response.parsed`
+        """
+        schema = decision_schema(("a", "b"))
+        cr = socra.Completion(
+            socra.Model.for_key(socra.Model.Key.GPT_4O_MINI_2024_07_18),
+            self._prompt(),
+            use_cache=False,
+            schema=schema,
+        )
+        resp = cr.process()
+
+        assert isinstance(resp.parsed, schema)
+        assert resp.parsed.key in ("a", "b")
+        assert "parse" in resp.timings.phases
+
+
+class TestStructuredOutput:
+    def test_strict_json_schema(self):
+        """
+        - defaults are dropped and every property is required
+        - objects do not allow additional properties
+        """
+        schema = strict_json_schema(InputChoicesPayload)
+        assert schema["required"] == ["message", "choices", "allow_multiple"]
+        assert schema["additionalProperties"] is False
+        assert "default" not in schema["properties"]["allow_multiple"]
+
+    def test_schema_changes_cache_key(self):
+        model = socra.Model.for_key(socra.Model.Key.GPT_4O_MINI_2024_07_18)
+        prompt = socra.Prompt(messages="hi")
+
+        keys = {
+            socra.Completion(model, prompt).cache_key,
+            socra.Completion(model, prompt, schema=InputChoicesPayload).cache_key,
+            socra.Completion(model, prompt, schema=decision_schema(("a",))).cache_key,
+        }
+        assert len(keys) == 3
+
+    def test_mock_response_is_parsed(self):
+        cr = socra.Completion(
+            socra.Model.for_key(socra.Model.Key.GPT_4O_MINI_2024_07_18),
+            socra.Prompt(messages="hi"),
+            mock_response=MockResponse(
+                content='```json\n{"key": "c", "reasoning": "because"}\n```',
+                usage=TokenUsage(input=1, output=1, total=2),
+                enabled=True,
+            ),
+            schema=decision_schema(("a", "b")),
+        )
+        with pytest.raises(ValueError):
+            cr.process()
+
+    def test_invalid_response_is_not_cached(self, tmp_path, monkeypatch):
+        """
+        - a response failing validation is neither cached nor recorded
+        - a retry reaches the provider again and its valid response is cached
+        """
+        responses = iter(
+            [
+                '{"key": "c", "reasoning": "r"}',
+                '{"key": "a", "reasoning": "r"}',
+            ]
+        )
+        usage = TokenUsage(input=1, output=1, total=2)
+        monkeypatch.setattr(
+            socra.Completion, "_request", lambda self: (next(responses), usage)
+        )
+        model = socra.Model.for_key(socra.Model.Key.GPT_4O_MINI_2024_07_18)
+        cache = CompletionCache(str(tmp_path / "cache.db"))
+        schema = decision_schema(("a", "b"))
+
+        def completion():
+            return socra.Completion(
+                model, socra.Prompt(messages="hi"), cache=cache, schema=schema
+            )
+
+        path = str(tmp_path / "session.jsonl")
+        try:
+            use_cassette(path, CassetteMode.RECORD)
+            with pytest.raises(ValueError):
+                completion().process()
+            assert cache.get(completion().cache_key) is None
+
+            assert completion().process().parsed.key == "a"
+            assert completion().process().cached
+        finally:
+            use_cassette(None)
+
+        with open(path) as file:
+            assert [json.loads(line)["content"] for line in file] == [
+                '{"key": "a", "reasoning": "r"}'
+            ] * 2
+
+
+class TestCostLedger:
+    def test_exact_totals(self):
+        """
+        - totals are exact over many additions
+        - costs break down per model and per agent
+        - snapshots restore the ledger
+        """
+        mini = socra.Model.for_key(socra.Model.Key.GPT_4O_MINI_2024_07_18)
+        large = socra.Model.for_key(socra.Model.Key.GPT_4O_2024_08_06)
+        usage = TokenUsage(input=3, output=1, total=4, cached_input=1)
+
+        ledger = CostLedger()
+        for i in range(100_000):
+            ledger.add(mini, usage, "decide" if i % 2 else "update")
+        ledger.add(large, usage, "update")
+
+        # 100k * (2 * 0.15 + 0.075 + 0.60) / 1M + (2 * 2.5 + 1.25 + 10) / 1M
+        assert ledger.dollars() == Decimal("0.0975") + Decimal("0.00001625")
+        assert ledger.calls == 100_001
+        assert ledger.usage().cached_input == 100_001
+        assert TokenCost.for_model(mini, usage).total == pytest.approx(0.975e-6)
+        assert set(ledger.by_model()) == {mini.id, large.id}
+        assert ledger.by_agent()["decide"].total == pytest.approx(0.04875)
+
+        restored = CostLedger.restore(ledger.snapshot())
+        assert restored.dollars() == ledger.dollars()
+        assert restored.by_agent() == ledger.by_agent()
+
+    def test_unbilled_completions(self, tmp_path):
+        """
+        - cached and shared completions are counted as saved, not billed
+        - tracking a cache hit adds no cost
+        - snapshots from before the saved slots restore
+        """
+        mini = socra.Model.for_key(socra.Model.Key.GPT_4O_MINI_2024_07_18)
+        usage = TokenUsage(input=4, output=2, total=6)
+
+        ledger = CostLedger()
+        ledger.add(mini, usage)
+        ledger.add(mini, usage, billed=False)
+        assert ledger.calls == 1
+        assert ledger.usage().total == 6
+        assert ledger.saved_calls == 1
+        assert ledger.saved_dollars() == ledger.dollars()
+
+        cache = CompletionCache(str(tmp_path / "cache.db"))
+        prompt = socra.Prompt(messages="hi")
+        key = socra.Completion(mini, prompt).cache_key
+        cache.set(key, mini.id, "hello", usage)
+
+        context = Context()
+        cached = socra.Completion(mini, prompt, cache=cache)
+        assert cached.process().cached
+        context.track_completion(cached)
+        assert context.token_cost.total == 0
+        assert context.costs.saved_calls == 1
+
+        snapshot = ledger.snapshot()
+        snapshot.totals = snapshot.totals[:7]
+        assert CostLedger.restore(snapshot).dollars() == ledger.dollars()
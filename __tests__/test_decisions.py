@@ -1,6 +1,9 @@
 import socra
 
+from langchain_core.messages.ai import AIMessageChunk
+
 from socra.completions.base import MockResponse
+from socra.completions.cassette import CassetteMode, use_cassette
 from socra.completions.usage import TokenUsage
 
 
@@ -37,3 +40,81 @@ def test_decision():
     )
     assert decision.option.key == "create_file"
     assert decision.reasoning == "I want to create a file"
+
+
+class _FakeLLM:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.streamed = []
+
+    def bind(self, **kwargs):
+        self.bound = kwargs
+        return self
+
+    def stream(self, messages, stream_usage=True):
+        for chunk in self.chunks:
+            self.streamed.append(chunk)
+            yield AIMessageChunk(content=chunk)
+
+
+def test_decision_stops_after_key(monkeypatch):
+    """
+    - the stream stops as soon as the key is known
+    - usage of the stopped stream is counted locally
+    """
+    llm = _FakeLLM(['{"key": "create', '_file", ', '"reasoning": "I want', ' to"}'])
+    monkeypatch.setattr("socra.completions.base.get_llm", lambda model: llm)
+    monkeypatch.setattr(
+        socra.Model, "count_tokens", lambda self, text: len(text.split())
+    )
+
+    decision = socra.Decision.make(
+        context=socra.Context(
+            messages=[socra.Message(role=socra.Message.Role.HUMAN, content="hi")]
+        ),
+        options=[
+            socra.Option(key="create_file", name="Create", description="Create."),
+        ],
+        config=socra.DecisionConfig(stop_after_key=True),
+    )
+
+    assert decision.option.key == "create_file"
+    assert decision.reasoning == ""
+    assert len(llm.streamed) == 2
+    assert decision.token_cost.total > 0
+
+
+def test_stopped_decision_replays(tmp_path, monkeypatch):
+    """
+    - a stream stopped after the key is recorded as stopped
+    - its replay is stopped too, and the partial content is not parsed
+    """
+    llm = _FakeLLM(['{"key": "create', '_file", ', '"reasoning": "I want', ' to"}'])
+    monkeypatch.setattr("socra.completions.base.get_llm", lambda model: llm)
+    monkeypatch.setattr(
+        socra.Model, "count_tokens", lambda self, text: len(text.split())
+    )
+
+    def make():
+        return socra.Decision.make(
+            context=socra.Context(
+                messages=[socra.Message(role=socra.Message.Role.HUMAN, content="hi")]
+            ),
+            options=[
+                socra.Option(key="create_file", name="Create", description="Create."),
+            ],
+            config=socra.DecisionConfig(stop_after_key=True),
+        )
+
+    path = str(tmp_path / "session.jsonl")
+    try:
+        use_cassette(path, CassetteMode.RECORD)
+        recorded = make()
+        use_cassette(path, CassetteMode.REPLAY)
+        replayed = make()
+    finally:
+        use_cassette(None)
+
+    assert len(llm.streamed) == 2
+    assert replayed.option.key == recorded.option.key == "create_file"
+    assert replayed.token_cost == recorded.token_cost
@@ -0,0 +1,134 @@
+import pytest
+
+import socra
+from socra.agents.context import Context as AgentContext
+from socra.messages import MessageSequence
+
+
+class TestMessage:
+    def test_langchain_conversion_is_memoized(self):
+        """
+        - prompts sharing a message reuse its conversion
+        - reassigning a field converts again
+        """
+        message = socra.Message(role=socra.Message.Role.HUMAN, content="hello")
+        first = socra.Prompt(messages=[message]).to_langchain()
+        second = socra.Prompt(messages=[message, message]).to_langchain()
+        assert first[0] is second[0] is second[1]
+        assert first[0].content == "hello"
+
+        message.content = [socra.Message.Part(text="hi")]
+        converted = message.to_langchain()
+        assert converted is not first[0]
+        assert converted.content == "hi"
+
+        message.role = socra.Message.Role.ASSISTANT
+        assert message.to_langchain().type == "ai"
+
+
+class TestMessageSequence:
+    def test_append_shares_history(self):
+        """
+        - appending leaves the original unchanged
+        - indexing and iteration hold across trie levels
+        - prompts built from a context share its history
+        """
+        messages = [
+            socra.Message(role=socra.Message.Role.HUMAN, content=str(i))
+            for i in range(1_100)
+        ]
+        sequence = MessageSequence()
+        versions = []
+        for message in messages:
+            versions.append(sequence)
+            sequence = sequence.appended(message)
+
+        assert len(sequence) == 1_100
+        assert list(sequence) == messages
+        assert all(sequence[i] is messages[i] for i in range(1_100))
+        assert sequence[-1] is messages[-1]
+        assert len(versions[1_025]) == 1_025
+        assert list(versions[1_025]) == messages[:1_025]
+        assert sequence[10:12] == messages[10:12]
+
+        context = AgentContext(messages=sequence)
+        prompt = context.prompt("go")
+        assert prompt.messages._root is context.messages._root
+        assert len(prompt.messages) == len(context.messages) + 1
+
+    def test_window_shares_history(self):
+        """
+        - windows match list slicing, across leaves and of other windows
+        - they share the trie, also when appended to
+        """
+        messages = [
+            socra.Message(role=socra.Message.Role.HUMAN, content=str(i))
+            for i in range(100)
+        ]
+        sequence = MessageSequence(messages)
+
+        for head, start in [(0, 0), (0, 40), (1, 31), (5, 64), (10, 100), (3, 99)]:
+            window = sequence.window(start, head=head)
+            expected = messages[:head] + messages[start:]
+            assert window._root is sequence._root
+            assert list(window) == expected
+            assert [window[i] for i in range(len(window))] == expected
+            assert window[-1] is expected[-1]
+            assert window[2:] == expected[2:]
+
+        window = sequence.window(50, head=10)
+        assert window.window(60, head=5) == messages[:5] + messages[100:]
+        assert window.window(30, head=10) == messages[:10] + messages[70:]
+        assert window.window(30, head=10)._root is sequence._root
+        # hidden runs that are not contiguous are copied
+        assert window.window(8, head=2) == messages[:2] + messages[8:10] + messages[50:]
+        assert window.window(30, head=20) == (
+            messages[:10] + messages[50:60] + messages[70:]
+        )
+
+        message = socra.Message(role=socra.Message.Role.HUMAN, content="new")
+        appended = window.appended(message)
+        assert appended._root is sequence._root
+        assert appended == messages[:10] + messages[50:] + [message]
+        assert window == messages[:10] + messages[50:]
+
+    def test_common_prefix(self):
+        """
+        - versions of one history share their prefix
+        - any differing message ends it, in shared leaves or not
+        """
+        messages = [
+            socra.Message(role=socra.Message.Role.HUMAN, content=str(i))
+            for i in range(100)
+        ]
+        sequence = MessageSequence(messages)
+        longer = sequence.appended(messages[0])
+        assert longer.common_prefix(sequence) == 100
+        assert sequence.common_prefix(longer) == 100
+
+        for i in [1, 40, 99]:
+            replaced = list(messages)
+            replaced[i] = socra.Message(role=socra.Message.Role.HUMAN, content="x")
+            assert MessageSequence(replaced).common_prefix(sequence) == i
+            assert sequence.window(50, head=10).common_prefix(
+                MessageSequence(messages[:10] + replaced[50:])
+            ) == (i - 40 if i >= 50 else 60)
+
+    def test_validation(self):
+        system = socra.Message(role=socra.Message.Role.SYSTEM, content="s")
+        human = socra.Message(role=socra.Message.Role.HUMAN, content="h")
+
+        sequence = MessageSequence([system, human])
+        with pytest.raises(ValueError):
+            sequence.appended(system)
+        with pytest.raises(ValueError):
+            sequence.appended("hello")
+        # list-style mutation fails loudly instead of doing nothing
+        with pytest.raises(TypeError):
+            sequence.append(human)
+        with pytest.raises(TypeError):
+            sequence.extend([human])
+
+        prompt = socra.Prompt(messages=sequence)
+        assert prompt.messages is sequence
+        assert prompt.model_dump()["messages"][0]["role"] == socra.Message.Role.SYSTEM
@@ -0,0 +1,363 @@
+import json
+from decimal import Decimal
+
+import pytest
+import tiktoken
+
+import socra
+from socra.models.base import get_encoding as socra_get_encoding
+from socra.agents.context import Context as AgentContext
+from socra.models import CallClass, ModelRegistry, ModelRouter, RoutingPolicy
+from socra.models.registry import configure_registry, get_registry
+from socra.messages import MessageSequence
+from socra.prompts import TokenLedger
+
+
+def _prompt(size: int) -> socra.Prompt:
+    return socra.Prompt(messages="x" * size)
+
+
+class TestModelRouter:
+    def test_default_policies(self):
+        """
+        - decisions and extractions go to the cheapest small model
+        - generation requires a large model
+        - summaries, e.g. `socra describe`, go to a small model
+        """
+        router = ModelRouter()
+
+        model = router.route(CallClass.DECISION, _prompt(100))
+        assert model.key == socra.Model.Key.GPT_4O_MINI_2024_07_18
+
+        model = router.route(CallClass.SUMMARY, _prompt(100), output_tokens=1_024)
+        assert model.key == socra.Model.Key.GPT_4O_MINI_2024_07_18
+
+        model = router.route(CallClass.GENERATION, _prompt(100))
+        assert model.tier == socra.Model.Tier.LARGE
+        assert model.provider == socra.Model.Provider.OPENAI
+
+    def test_providers(self):
+        router = ModelRouter(
+            providers=[socra.Model.Provider.ANTHROPIC],
+        )
+        model = router.route(CallClass.GENERATION, _prompt(100))
+        assert model.key == socra.Model.Key.CLAUDE_3P5_SONNET_20240620
+
+    def test_output_limit(self):
+        router = ModelRouter(providers=list(socra.Model.Provider))
+
+        # haiku is cheaper than sonnet, but cannot output 6k tokens
+        model = router.route(
+            CallClass.GENERATION,
+            _prompt(100),
+            output_tokens=6_000,
+        )
+        assert model.max_output_tokens >= 6_000
+
+        with pytest.raises(ValueError):
+            router.route(CallClass.DECISION, _prompt(100), output_tokens=100_000)
+
+    def test_soft_latency_and_budget(self):
+        """
+        - a latency objective no model meets picks the fastest model
+        - a budget excludes models over it
+        """
+        router = ModelRouter(
+            policies={
+                CallClass.EXTRACTION: RoutingPolicy(max_latency=0.01),
+                CallClass.DECISION: RoutingPolicy(
+                    min_tier=socra.Model.Tier.LARGE,
+                    max_cost=Decimal("0.000001"),
+                ),
+            },
+            providers=list(socra.Model.Provider),
+        )
+
+        model = router.route(CallClass.EXTRACTION, _prompt(100))
+        assert model.key == socra.Model.Key.CLAUDE_3_HAIKU_20240307
+
+        model = router.route(CallClass.DECISION, _prompt(100))
+        assert model.tier == socra.Model.Tier.LARGE
+
+
+_LOCAL_MODEL = """
+[[models]]
+key = "llama-3.1-8b-instruct"
+name = "Llama 3.1 8B (local)"
+context_window = 131072
+max_output_tokens = 4096
+speed = { ttft = 0.05, tokens_per_second = 200 }
+cost = { input = "0", output = "0" }
+
+[[models]]
+key = "gpt-4o-mini-2024-07-18"
+name = "GPT4o Mini (long context)"
+encoding = "o200k_base"
+context_window = 1000000
+max_output_tokens = 16384
+speed = { ttft = 0.5, tokens_per_second = 90 }
+cost = { input = "0.00000015", output = "0.0000006" }
+"""
+
+
+class TestModelRegistry:
+    @pytest.fixture
+    def registry(self, tmp_path):
+        path = tmp_path / "models.toml"
+        path.write_text(_LOCAL_MODEL)
+        registry = ModelRegistry([str(path)])
+        previous = get_registry()
+        configure_registry(registry)
+        yield registry
+        configure_registry(previous)
+
+    def test_lookup(self, registry):
+        """
+        - models are built on first lookup
+        - file models are looked up by id, and override builtin ones
+        """
+        assert registry._models is None
+
+        local = socra.Model.for_key("llama-3.1-8b-instruct")
+        assert local.id == local.key == "llama-3.1-8b-instruct"
+        assert local.cost.input == Decimal(0)
+        assert local.provider == socra.Model.Provider.OPENAI
+
+        mini = socra.Model.for_key(socra.Model.Key.GPT_4O_MINI_2024_07_18)
+        assert mini.key == socra.Model.Key.GPT_4O_MINI_2024_07_18
+        assert mini.context_window == 1_000_000
+        assert mini is socra.Model.for_key(mini.id)
+
+        assert socra.Model.Key.CLAUDE_3_HAIKU_20240307 in registry
+        assert len(registry) == 5
+        with pytest.raises(KeyError):
+            socra.Model.for_key("unknown")
+
+    def test_json_and_routing(self, registry, tmp_path):
+        path = tmp_path / "models.json"
+        path.write_text(
+            json.dumps(
+                [
+                    {
+                        "key": "qwen-2.5-72b-instruct",
+                        "name": "Qwen 2.5 72B (local)",
+                        "tier": "large",
+                        "context_window": 32768,
+                        "max_output_tokens": 8192,
+                        "speed": {"ttft": 0.2, "tokens_per_second": 40},
+                        "cost": {"input": "0", "output": "0"},
+                    }
+                ]
+            )
+        )
+        (model,) = registry.load(str(path))
+        assert model.tier == socra.Model.Tier.LARGE
+
+        # registered models are routed to, free ones first
+        assert ModelRouter().route(CallClass.GENERATION, _prompt(100)) is model
+
+
+@pytest.fixture
+def byte_encoding(monkeypatch):
+    """
+    Byte-level encoding (one token per UTF-8 byte), so tests need no download.
+    """
+    calls = []
+
+    def get_encoding(name: str) -> tiktoken.Encoding:
+        calls.append(name)
+        return tiktoken.Encoding(
+            name=name,
+            pat_str=r"\S+|\s+",
+            mergeable_ranks={bytes([i]): i for i in range(256)},
+            special_tokens={"<|endoftext|>": 256},
+        )
+
+    monkeypatch.setattr("socra.models.base.tiktoken.get_encoding", get_encoding)
+    socra_get_encoding.cache_clear()
+    yield calls
+    socra_get_encoding.cache_clear()
+
+
+class TestTokenCounting:
+    def test_encoding_is_cached_per_model(self, byte_encoding):
+        mini = socra.Model.for_key(socra.Model.Key.GPT_4O_MINI_2024_07_18)
+        haiku = socra.Model.for_key(socra.Model.Key.CLAUDE_3_HAIKU_20240307)
+
+        for _ in range(3):
+            assert mini.count_tokens("héllo") == 6
+            assert haiku.count_tokens("hello") == 5
+        assert byte_encoding == ["o200k_base", "cl100k_base"]
+
+    def test_special_tokens_are_text(self, byte_encoding):
+        model = socra.Model.for_key(socra.Model.Key.GPT_4O_MINI_2024_07_18)
+        assert model.count_tokens("<|endoftext|>") == len("<|endoftext|>")
+
+    def test_batch(self, byte_encoding):
+        model = socra.Model.for_key(socra.Model.Key.GPT_4O_MINI_2024_07_18)
+        texts = [f"message {i}" * i for i in range(100)]
+        assert model.count_tokens_batch(texts) == [len(t) for t in texts]
+
+    def test_limit_context_window(self, byte_encoding):
+        model = socra.Model.for_key(socra.Model.Key.GPT_4O_MINI_2024_07_18)
+        prompt = socra.Prompt(
+            messages=[
+                socra.Message(role=socra.Message.Role.SYSTEM, content="s" * 10),
+                *[
+                    socra.Message(role=socra.Message.Role.HUMAN, content=str(i) * 10)
+                    for i in range(10)
+                ],
+            ]
+        )
+        assert prompt.count_tokens(model) == 110
+
+        limited = prompt.limit_context_window(model, max_tokens=45)
+        assert [m.content[0].text for m in limited.messages] == [
+            "s" * 10,
+            "7" * 10,
+            "8" * 10,
+            "9" * 10,
+        ]
+        # a window on the prompt's messages, not a copy
+        assert limited.messages._root is prompt.messages._root
+
+    def test_estimate_tokens(self, byte_encoding):
+        """
+        - the upper bound is the UTF-8 size, never below the exact count
+        - estimates use the model's bytes per token
+        """
+        model = socra.Model.for_key(socra.Model.Key.GPT_4O_MINI_2024_07_18)
+        for text in ["", "hello", "héllo wörld", "def f(x):\n    return x\n"]:
+            assert model.estimate_tokens(text, upper_bound=True) >= model.count_tokens(
+                text
+            )
+
+        model = model.model_copy(update={"bytes_per_token": 4.0})
+        assert model.estimate_tokens("x" * 10) == 3
+        assert model.estimate_tokens("é" * 10, upper_bound=True) == 20
+
+        prompt = socra.Prompt(
+            messages=[
+                socra.Message(role=socra.Message.Role.SYSTEM, content="s" * 10),
+                socra.Message(role=socra.Message.Role.HUMAN, content="h" * 6),
+            ]
+        )
+        assert prompt.estimate_tokens(model) == 5
+        assert prompt.estimate_tokens(model, upper_bound=True) == 16
+
+    def test_message_counts_are_memoized(self, byte_encoding, monkeypatch):
+        """
+        - each message is counted once per encoding
+        - multi-part messages sum their parts
+        - reassigning content resets the count
+        """
+        model = socra.Model.for_key(socra.Model.Key.GPT_4O_MINI_2024_07_18)
+        message = socra.Message(
+            role=socra.Message.Role.HUMAN,
+            content=[
+                socra.Message.Part(text="hello "),
+                socra.Message.Part(text="world"),
+            ],
+        )
+        prompt = socra.Prompt(messages=[message])
+
+        counted = []
+        count_tokens = socra.Model.count_tokens
+        monkeypatch.setattr(
+            socra.Model,
+            "count_tokens",
+            lambda self, text: counted.append(text) or count_tokens(self, text),
+        )
+
+        assert message.count_tokens(model) == 11
+        assert prompt.count_tokens(model) == 11
+        assert prompt.limit_context_window(model).messages == [message]
+        assert counted == ["hello ", "world"]
+
+        message.content = [socra.Message.Part(text="hi")]
+        assert prompt.count_tokens(model) == 2
+
+    def test_ledger_counts_new_messages(self, byte_encoding, monkeypatch):
+        """
+        - appended messages and a replaced last message are sized and
+          counted once
+        - trimming matches counting every message from scratch
+        """
+        model = socra.Model.for_key(socra.Model.Key.GPT_4O_MINI_2024_07_18)
+        context = AgentContext(
+            messages=[socra.Message(role=socra.Message.Role.SYSTEM, content="s" * 10)]
+        )
+
+        counted = []
+        count_tokens = socra.Model.count_tokens
+        monkeypatch.setattr(
+            socra.Model,
+            "count_tokens",
+            lambda self, text: counted.append(text) or count_tokens(self, text),
+        )
+
+        estimated = []
+        estimate_tokens = socra.Model.estimate_tokens
+        monkeypatch.setattr(
+            socra.Model,
+            "estimate_tokens",
+            lambda self, text, upper_bound=False: (
+                estimated.append(text) or estimate_tokens(self, text, upper_bound)
+            ),
+        )
+
+        ledger = context.token_ledger(model)
+        for i in range(10):
+            context.add_message(
+                socra.Message(role=socra.Message.Role.HUMAN, content=str(i) * 10)
+            )
+            prompt = context.prompt("go")
+            counted.clear()
+            estimated.clear()
+            limited = prompt.limit_context_window(model, max_tokens=45, ledger=ledger)
+            if i > 0:
+                # the byte bound is kept up to date, not re-summed
+                assert estimated == [str(i) * 10, "go"]
+            if i < 3:
+                # fits by byte size, nothing is counted
+                assert counted == []
+                assert ledger.bound() == prompt.estimate_tokens(model, upper_bound=True)
+            elif i > 3:
+                # the new message and this call's instruction
+                assert counted == [str(i) * 10, "go"]
+
+            expected = prompt.limit_context_window(
+                model, max_tokens=45, ledger=TokenLedger(model)
+            )
+            assert limited.messages == expected.messages
+
+        assert [m.content[0].text for m in limited.messages] == [
+            "s" * 10,
+            "7" * 10,
+            "8" * 10,
+            "9" * 10,
+            "go",
+        ]
+        assert context.token_ledger(model) is ledger
+
+        with pytest.raises(ValueError):
+            haiku = socra.Model.for_key(socra.Model.Key.CLAUDE_3_HAIKU_20240307)
+            prompt.limit_context_window(haiku, ledger=ledger)
+
+    def test_ledger_recounts_replaced_messages(self, byte_encoding):
+        """
+        - a message replaced in the middle is re-counted, whether the
+          messages are a list or a sequence of the same length
+        """
+        model = socra.Model.for_key(socra.Model.Key.GPT_4O_MINI_2024_07_18)
+        s, a, b, c, x = [
+            socra.Message(role=socra.Message.Role.HUMAN, content=text)
+            for text in ["s", "a" * 10, "b", "c", "x" * 20]
+        ]
+
+        for sequence in (list, MessageSequence):
+            ledger = TokenLedger(model)
+            ledger.sync(sequence([s, a, b, c]))
+            assert ledger.tokens() == 13
+            ledger.sync(sequence([s, x, b, c]))
+            assert ledger.tokens() == 23
@@ -0,0 +1,33 @@
+from socra.parsers.streaming import StreamingJSONParser
+
+
+class TestStreamingJSONParser:
+    def test_fields_complete_incrementally(self):
+        """
+        - fields are returned once their value is complete
+        - numbers are only returned once followed by a delimiter
+        - code fences and nested values are handled
+        """
+        text = '```json\n{"key": "create_file", "count": 12, "nested": {"a": [1, 2]}, "ok": true}\n```'
+        parser = StreamingJSONParser()
+        seen = []
+        for i in range(len(text)):
+            for key, value in parser.feed(text[i]).items():
+                seen.append((i, key, value))
+
+        assert [key for _, key, _ in seen] == ["key", "count", "nested", "ok"]
+        assert parser.fields == {
+            "key": "create_file",
+            "count": 12,
+            "nested": {"a": [1, 2]},
+            "ok": True,
+        }
+        assert parser.done
+
+        # key is known long before the response is complete
+        assert seen[0][0] == text.index('"create_file"') + len('"create_file"') - 1
+
+    def test_escaped_strings(self):
+        parser = StreamingJSONParser()
+        assert parser.feed('{"key": "a \\"quoted') == {}
+        assert parser.feed('\\" value"') == {"key": 'a "quoted" value'}
@@ -0,0 +1,104 @@
+import socra
+from socra.completions.clients import ClientConfig, get_llm
+from socra.completions.scheduler import (
+    RateLimit,
+    RetryConfig,
+    Scheduler,
+    configure_scheduler,
+)
+
+
+class _RateLimitError(Exception):
+    status_code = 429
+
+    class response:
+        headers = {"retry-after-ms": "10"}
+
+
+class TestScheduler:
+    def test_admission(self):
+        """
+        - requests within the limit are admitted immediately
+        - requests over the limit are queued until capacity refills
+        """
+        model = socra.Model.for_key(socra.Model.Key.GPT_4O_MINI_2024_07_18)
+        scheduler = Scheduler(
+            limits={model.key.value: RateLimit(requests_per_minute=600)}
+        )
+
+        # bucket starts full
+        for _ in range(600):
+            scheduler.run(model, 0, lambda: None)
+        assert scheduler.metrics(model).total_wait == 0
+
+        # 600 rpm refills one request every 0.1 seconds
+        scheduler.run(model, 0, lambda: None)
+        metrics = scheduler.metrics(model)
+        assert metrics.requests == 601
+        assert metrics.max_wait > 0
+        assert metrics.queue_depth == 0
+
+    def test_retries_rate_limit_errors(self):
+        model = socra.Model.for_key(socra.Model.Key.GPT_4O_MINI_2024_07_18)
+        scheduler = Scheduler(retry=RetryConfig(max_retries=2, base_delay=0.001))
+        calls = []
+
+        def flaky():
+            calls.append(1)
+            if len(calls) < 3:
+                raise _RateLimitError()
+            return "ok"
+
+        assert scheduler.run(model, 0, flaky) == "ok"
+        assert scheduler.metrics(model).retries == 2
+        # retry-after is honoured
+        assert scheduler.metrics(model).total_wait >= 0.02
+
+    def test_does_not_retry_other_errors(self):
+        model = socra.Model.for_key(socra.Model.Key.GPT_4O_MINI_2024_07_18)
+        scheduler = Scheduler()
+
+        def failing():
+            raise ValueError("boom")
+
+        try:
+            scheduler.run(model, 0, failing)
+            assert False, "expected ValueError"
+        except ValueError:
+            pass
+        assert scheduler.metrics(model).retries == 0
+
+    def test_failed_attempts_return_their_tokens(self):
+        """
+        - every retry is admitted again, and failed attempts return the
+          tokens they took, so only the successful one is charged
+        """
+        model = socra.Model.for_key(socra.Model.Key.GPT_4O_MINI_2024_07_18)
+        scheduler = Scheduler(
+            limits={model.key.value: RateLimit(tokens_per_minute=1_000)},
+            retry=RetryConfig(max_retries=3, base_delay=0.001),
+        )
+        calls = []
+
+        def flaky():
+            calls.append(1)
+            if len(calls) < 4:
+                raise _RateLimitError()
+            return "ok"
+
+        assert scheduler.run(model, 400, flaky) == "ok"
+        scheduler.settle(model, 400, 400)
+        assert scheduler.metrics(model).requests == 4
+        # 400 tokens for the final attempt, plus a little refill
+        assert 600 <= scheduler._state(model).tokens.available < 610
+
+    def test_clients_do_not_retry_under_a_scheduler(self, monkeypatch):
+        monkeypatch.setenv("OPENAI_API_KEY", "test")
+        model = socra.Model.for_key(socra.Model.Key.GPT_4O_MINI_2024_07_18)
+
+        configure_scheduler(Scheduler())
+        try:
+            assert get_llm(model).max_retries == 0
+        finally:
+            configure_scheduler(None)
+        assert get_llm(model).max_retries == ClientConfig().max_retries
@@ -0,0 +1,119 @@
+import asyncio
+import threading
+import time
+
+from socra.completions.singleflight import SingleFlight
+from socra.completions.stream import StopCompletion
+
+
+class TestSingleFlight:
+    def test_coalesces_concurrent_calls(self):
+        """
+        - concurrent calls with the same key make one upstream call
+        - every caller receives the result and the streamed chunks
+        """
+        flight = SingleFlight()
+        calls = []
+        release = threading.Event()
+
+        def upstream(publish):
+            calls.append(1)
+            publish("hel")
+            release.wait(5)
+            publish("lo")
+            return "hello"
+
+        results, aggregates = [], []
+
+        def caller():
+            chunks = []
+            results.append(flight.do("key", upstream, on_chunk=chunks.append))
+            aggregates.append(chunks[-1].aggregate)
+
+        threads = [threading.Thread(target=caller) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        while flight.in_flight() == 0:
+            time.sleep(0.001)
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert len(calls) == 1
+        assert sorted(shared for _, shared in results) == [False, True, True, True]
+        assert {result for result, _ in results} == {"hello"}
+        assert aggregates == ["hello"] * 4
+        assert flight.in_flight() == 0
+
+    def test_async_errors_are_shared(self):
+        flight = SingleFlight()
+
+        async def upstream(publish):
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        async def run():
+            return await asyncio.gather(
+                *[flight.ado("key", upstream) for _ in range(3)],
+                return_exceptions=True,
+            )
+
+        errors = asyncio.run(run())
+        assert all(isinstance(e, ValueError) for e in errors)
+
+    def test_stream_stops_only_once_no_waiter_needs_it(self):
+        """
+        - a waiter without on_chunk keeps the stream going after every
+          streaming subscriber stopped, and receives the full result
+        - an on_chunk error is raised to its caller only
+        """
+        flight = SingleFlight()
+        joined = threading.Event()
+
+        def upstream(publish):
+            joined.wait(5)
+            parts = []
+            for text in ["a", "b", "c"]:
+                parts.append(text)
+                try:
+                    publish(text)
+                except StopCompletion:
+                    break
+            return "".join(parts)
+
+        def stop(payload):
+            raise StopCompletion()
+
+        def fail(payload):
+            raise ValueError("boom")
+
+        results = {}
+
+        def caller(name, on_chunk):
+            try:
+                results[name] = flight.do("key", upstream, on_chunk=on_chunk)
+            except ValueError as e:
+                results[name] = e
+
+        threads = [
+            threading.Thread(target=caller, args=(name, on_chunk))
+            for name, on_chunk in [("stop", stop), ("fail", fail), ("wait", None)]
+        ]
+        threads[0].start()
+        while flight.in_flight() == 0:
+            time.sleep(0.001)
+        for thread in threads[1:]:
+            thread.start()
+        while len(flight._calls["key"].subscribers) < 3:
+            time.sleep(0.001)
+        joined.set()
+        for thread in threads:
+            thread.join()
+
+        assert results["stop"] == ("abc", False)
+        assert results["wait"] == ("abc", True)
+        assert isinstance(results["fail"], ValueError)
+
+        # with no waiter left, the stream stops at the first chunk
+        assert flight.do("key", upstream, on_chunk=stop) == ("a", False)
@@ -0,0 +1,72 @@
+"""
+Load test the completion pipeline against the local fake server.
+
+Fires batches of streaming decision completions at increasing concurrency,
+reporting throughput and latency percentiles. Needs no API key or network.
+
+Usage:
+    python -m benchmarks.fake_server_load
+"""
+
+import statistics
+import time
+
+from socra.agents.agent_decision import _decision_prompt
+from socra.completions import ClientConfig, Completion, configure_clients
+from socra.completions.fake_server import FakeLLMServer, FakeServerConfig
+from socra.models import Model
+from socra.prompts import Prompt
+
+REQUESTS = 64
+
+
+class _TimedCompletion(Completion):
+    latency = 0.0
+
+    def process(self):
+        start = time.perf_counter()
+        try:
+            return super().process()
+        finally:
+            self.latency = time.perf_counter() - start
+
+
+def _completion(i: int) -> _TimedCompletion:
+    children = "\n".join(
+        f"- key: action_{n}\n  name: Action {n}\n  description: request {i}"
+        for n in range(4)
+    )
+    return _TimedCompletion(
+        Model.for_key(Model.Key.GPT_4O_MINI_2024_07_18),
+        Prompt(messages=_decision_prompt.format(children=children)),
+        on_chunk=lambda payload: None,
+        use_cache=False,
+    )
+
+
+def main():
+    config = FakeServerConfig(ttft=0.2, tokens_per_second=100, seed=0)
+    with FakeLLMServer(config) as server:
+        configure_clients(ClientConfig(base_url=server.url, max_connections=64))
+
+        print(
+            f"{'concurrency':>12} {'req/s':>8} {'p50 (s)':>8} "
+            f"{'p95 (s)':>8} {'errors':>7}"
+        )
+        for concurrency in [1, 4, 16, 64]:
+            completions = [_completion(i) for i in range(REQUESTS)]
+            start = time.perf_counter()
+            output = Completion.process_many(completions, max_concurrency=concurrency)
+            elapsed = time.perf_counter() - start
+
+            latencies = sorted(c.latency for c in completions)
+            p95 = latencies[int(len(latencies) * 0.95) - 1]
+            print(
+                f"{concurrency:>12} {REQUESTS / elapsed:>8.1f} "
+                f"{statistics.median(latencies):>8.2f} {p95:>8.2f} "
+                f"{len(output.errors):>7}"
+            )
+
+
+if __name__ == "__main__":
+    main()
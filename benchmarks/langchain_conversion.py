@@ -0,0 +1,60 @@
+"""
+Benchmark converting a growing 1k-message context to langchain messages.
+
+An agent converts its whole history on every step. Compares converting every
+message on each step (the previous approach) against `Prompt.to_langchain()`,
+which reuses each message's conversion so only new messages are converted.
+
+Usage:
+    python -m benchmarks.langchain_conversion
+"""
+
+import time
+
+from socra.messages import Message
+from socra.prompts import Prompt
+
+
+def _messages(n: int):
+    roles = [Message.Role.HUMAN, Message.Role.ASSISTANT]
+    return [
+        Message(role=roles[i % 2], content=f"message {i} " + "lorem ipsum " * 20)
+        for i in range(n)
+    ]
+
+
+def uncached(prompt: Prompt):
+    return [m._convert_langchain() for m in prompt.messages]
+
+
+def cached(prompt: Prompt):
+    return prompt.to_langchain()
+
+
+def timed(fn, messages, steps: int) -> float:
+    """
+    Convert the context on each of the last `steps` steps, as it grows to
+    `len(messages)` messages. Earlier steps are run untimed first.
+    """
+    fn(Prompt.model_construct(messages=messages[: len(messages) - steps]))
+
+    start = time.perf_counter()
+    for step in range(len(messages) - steps, len(messages)):
+        fn(Prompt.model_construct(messages=messages[: step + 1]))
+    return time.perf_counter() - start
+
+
+def main():
+    steps = 100
+    print(f"{'messages':>9} {'uncached (ms)':>14} {'cached (ms)':>12} {'speedup':>8}")
+    for n in [250, 500, 1_000]:
+        legacy = timed(uncached, _messages(n), steps)
+        incremental = timed(cached, _messages(n), steps)
+        print(
+            f"{n:>9} {legacy / steps * 1000:>14.3f} "
+            f"{incremental / steps * 1000:>12.3f} {legacy / incremental:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
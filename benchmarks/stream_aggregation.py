@@ -0,0 +1,72 @@
+"""
+Benchmark streaming aggregation as output length grows.
+
+Compares the previous approach (re-adding `AIMessageChunk`s and validating a
+pydantic payload with the full aggregate on every chunk) against
+`StreamAggregator`.
+
+Usage:
+    python -m benchmarks.stream_aggregation
+"""
+
+import time
+
+from langchain_core.messages.ai import AIMessageChunk
+from pydantic import BaseModel
+
+from socra.completions.stream import StreamAggregator
+
+
+class _LegacyChunkPayload(BaseModel):
+    chunk: str
+    aggregate: str
+
+
+def _chunks(n: int):
+    chunks = [AIMessageChunk(content="token ") for _ in range(n)]
+    chunks.append(
+        AIMessageChunk(
+            content="",
+            usage_metadata={"input_tokens": 1, "output_tokens": n, "total_tokens": n},
+        )
+    )
+    return chunks
+
+
+def legacy(chunks) -> str:
+    aggregate = None
+    for chunk in chunks:
+        aggregate = chunk if aggregate is None else aggregate + chunk
+        _LegacyChunkPayload(chunk=chunk.content, aggregate=aggregate.content)
+    return aggregate.content
+
+
+def incremental(chunks) -> str:
+    aggregator = StreamAggregator()
+    for chunk in chunks:
+        aggregator.add(chunk)
+    return aggregator.content
+
+
+def timed(fn, chunks) -> float:
+    start = time.perf_counter()
+    fn(chunks)
+    return time.perf_counter() - start
+
+
+def main():
+    print(f"{'chunks':>8} {'legacy (s)':>12} {'incremental (s)':>16} {'speedup':>8}")
+    for n in [1_000, 2_000, 4_000, 8_000, 16_000]:
+        chunks = _chunks(n)
+        assert legacy(chunks) == incremental(chunks)
+
+        legacy_s = timed(legacy, chunks)
+        incremental_s = timed(incremental, chunks)
+        print(
+            f"{n:>8} {legacy_s:>12.4f} {incremental_s:>16.4f} "
+            f"{legacy_s / incremental_s:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark `Model.estimate_tokens()` against exact `count_tokens()` on a code
+corpus, and report how accurate the estimate is.
+
+Reports, per model encoding:
+- time to count exactly vs. to estimate, over the whole corpus
+- estimate error per file (mean absolute, p95) and how often it is too low
+- the observed bytes per token, and a calibrated `bytes_per_token` that
+  over-estimates 95% of files
+- that the upper bound is never below the exact count
+
+The corpus defaults to the socra package. Downloads the tiktoken encodings
+on first run.
+
+Usage:
+    python -m benchmarks.token_estimate [directory ...]
+"""
+
+import os
+import statistics
+import sys
+import time
+
+import socra
+from socra.models import Model
+
+_EXTENSIONS = (".py", ".js", ".ts", ".tsx", ".go", ".rs", ".java", ".md", ".yml")
+
+
+def corpus(directories):
+    texts = []
+    for directory in directories:
+        for root, _, files in os.walk(directory):
+            for name in files:
+                if name.endswith(_EXTENSIONS):
+                    with open(os.path.join(root, name), encoding="utf-8") as f:
+                        try:
+                            text = f.read()
+                        except UnicodeDecodeError:
+                            continue
+                    if text:
+                        texts.append(text)
+    return texts
+
+
+def timed(fn, texts):
+    start = time.perf_counter()
+    results = [fn(text) for text in texts]
+    return results, time.perf_counter() - start
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))]
+
+
+def report(model: Model, texts):
+    # load the encoding outside the timings
+    model.count_tokens("")
+
+    exact, exact_time = timed(model.count_tokens, texts)
+    estimates, estimate_time = timed(model.estimate_tokens, texts)
+    bounds = [model.estimate_tokens(t, upper_bound=True) for t in texts]
+
+    errors = [(e - x) / x for e, x in zip(estimates, exact) if x]
+    ratios = [b / x for b, x in zip(bounds, exact) if x]
+
+    print(f"{model.name} ({model.encoding}, bytes_per_token={model.bytes_per_token})")
+    print(f"  files:               {len(texts)}, {sum(exact)} tokens")
+    print(f"  count_tokens:        {exact_time * 1000:.1f} ms")
+    print(f"  estimate_tokens:     {estimate_time * 1000:.1f} ms")
+    print(f"  speedup:             {exact_time / max(estimate_time, 1e-9):.0f}x")
+    print(f"  mean abs error:      {statistics.mean(abs(e) for e in errors):.1%}")
+    print(f"  p95 abs error:       {percentile([abs(e) for e in errors], 0.95):.1%}")
+    print(f"  under-estimated:     {sum(e < 0 for e in errors) / len(errors):.1%}")
+    print(f"  bytes per token:     median {statistics.median(ratios):.2f}")
+    print(f"  calibrated (p5):     {percentile(ratios, 0.05):.2f}")
+    print(f"  bound below exact:   {sum(b < x for b, x in zip(bounds, exact))} files")
+    print()
+
+
+def main():
+    directories = sys.argv[1:] or [os.path.dirname(socra.__file__)]
+
+    texts = corpus(directories)
+    if not texts:
+        print("No files found")
+        return
+
+    seen = set()
+    for model in [Model.for_key(key) for key in Model.Key]:
+        if model.encoding not in seen:
+            seen.add(model.encoding)
+            report(model, texts)
+
+
+if __name__ == "__main__":
+    main()
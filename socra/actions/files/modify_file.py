@@ -1,5 +1,6 @@
 import os
 import socra
+from socra.models.router import CallClass, rewrite_output_tokens, route
 from socra.io.files import read_file, write_file
 from socra.utils.decorators import throttle
 from socra.utils.spinner import Spinner
@@ -24,7 +25,6 @@ class ActionImproveFile(socra.Action[Inputs, str]):
 
         file_contents = read_file(inputs.target)
 
-        model = socra.Model.for_key(socra.Model.Key.GPT_4O_MINI_2024_07_18)
         prompt = socra.Prompt(
             messages=[
                 socra.Message(
@@ -41,6 +41,11 @@ class ActionImproveFile(socra.Action[Inputs, str]):
         def on_chunk(stream_chunk):
             spinner.spin()
 
+        model = route(
+            CallClass.GENERATION,
+            prompt,
+            output_tokens=rewrite_output_tokens(file_contents),
+        )
         cr = socra.Completion(
             model,
             prompt,
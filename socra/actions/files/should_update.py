@@ -1,10 +1,10 @@
 import os
 import socra
+from socra.models.router import CallClass, route
 from socra.io.files import read_file
 from socra.utils.decorators import throttle
 from socra.utils.spinner import Spinner
 import typing
-import json
 
 
 class Inputs(socra.Schema):
@@ -31,7 +31,6 @@ class ActionShouldUpdateFile(socra.Action[Inputs, Outputs]):
 
         file_contents = read_file(inputs.target)
 
-        model = socra.Model.for_key(socra.Model.Key.GPT_4O_MINI_2024_07_18)
         prompt = socra.Prompt(
             messages=[
                 socra.Message(
@@ -48,19 +47,16 @@ class ActionShouldUpdateFile(socra.Action[Inputs, Outputs]):
         def on_chunk(chunk):
             spinner.spin()
 
+        model = route(CallClass.DECISION, prompt)
         cr = socra.Completion(
             model,
             prompt,
             # mock_response=inputs.mock_response,
             on_chunk=on_chunk,
+            schema=Outputs,
         )
         resp = cr.process()
-
-        content = resp.content
-
-        # parse JSON response
-        dct = json.loads(content)
-        outputs = Outputs(**dct)
+        outputs = resp.parsed
 
         if outputs.should_update:
             spinner.message = (
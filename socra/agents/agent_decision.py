@@ -1,10 +1,9 @@
 import typing
 
-from socra.prompts import Prompt
-from socra.messages import Message
-from socra.completions import Completion
-from socra.models import Model
-import json
+from socra.completions import Completion, StopCompletion
+from socra.completions.structured import decision_schema
+from socra.parsers import StreamingJSONParser
+from socra.models.router import CallClass, route
 
 from socra.utils.decorators import throttle
 from socra.utils.spinner import Spinner
@@ -19,42 +18,73 @@ def decide(agent: "Agent", context: Context) -> "Agent":
     Use LLM to decide on which child to call based on the context provided.
     """
 
+    cr, spinner, parser = _decision_completion(agent, context)
+    cr.process()
+
+    return _resolve_decision(agent, context, cr, spinner, parser)
+
+
+async def adecide(agent: "Agent", context: Context) -> "Agent":
+    """
+    Async counterpart of `decide()`.
+    """
+
+    cr, spinner, parser = _decision_completion(agent, context)
+    await cr.aprocess()
+
+    return _resolve_decision(agent, context, cr, spinner, parser)
+
+
+def _decision_completion(
+    agent: "Agent", context: Context
+) -> typing.Tuple[Completion, Spinner, StreamingJSONParser]:
     children_items = [agent_as_decision_str(child) for child in agent.children]
     children_str = "\n".join(children_items)
-    prompt = Prompt(
-        messages=[
-            *context.messages,
-            Message(
-                role=Message.Role.HUMAN,
-                content=_decision_prompt.format(children=children_str),
-            ),
-        ]
-    )
-    model = Model.for_key(Model.Key.GPT_4O_MINI_2024_07_18)
+    prompt = context.prompt(_decision_prompt.format(children=children_str))
+    model = route(CallClass.DECISION, prompt)
     spinner = Spinner(message=f"Making decision for {agent.name}")
 
     @throttle(0.1)
-    def on_chunk(chunk):
+    def spin():
         spinner.spin()
 
+    # the key is parsed while streaming, so the stream can stop once it's known
+    parser = StreamingJSONParser()
+
+    def on_chunk(chunk):
+        spin()
+        parser.feed(chunk.chunk)
+        if agent.stop_after_key and "key" in parser.fields:
+            raise StopCompletion()
+
     cr = Completion(
         model,
         prompt,
         # mock_response=inputs.mock_response,
         on_chunk=on_chunk,
+        schema=decision_schema(tuple(child.key for child in agent.children)),
     )
-    resp = cr.process()
-    context.track_completion(cr)
+    return cr, spinner, parser
 
-    content = resp.content
-    dct = json.loads(content)
-    if "key" not in dct:
-        raise ValueError("Missing 'key' in response")
-    if "reasoning" not in dct:
-        raise ValueError("Missing 'reasoning' in response")
 
-    selected_key = dct["key"]
-    reasoning = dct["reasoning"]
+def _resolve_decision(
+    agent: "Agent",
+    context: Context,
+    cr: Completion,
+    spinner: Spinner,
+    parser: StreamingJSONParser,
+) -> "Agent":
+    context.track_completion(cr)
+
+    # a stopped stream is incomplete JSON, use the fields parsed so far
+    if cr.response.stopped:
+        if "key" not in parser.fields:
+            raise ValueError("Missing 'key' in response")
+        selected_key = parser.fields["key"]
+        reasoning = None
+    else:
+        selected_key = cr.response.parsed.key
+        reasoning = cr.response.parsed.reasoning
 
     # find the child with the selected key
     selected_child = None
@@ -67,7 +97,9 @@ def decide(agent: "Agent", context: Context) -> "Agent":
         raise ValueError(f"Child with key '{selected_key}' not found")
 
     # finally, update spinner with decision and finish
-    thought = f"Decided to {selected_child.name} because {reasoning}"
+    thought = f"Decided to {selected_child.name}"
+    if reasoning:
+        thought += f" because {reasoning}"
     spinner.message = thought
     spinner.finish()
 
@@ -1,8 +1,10 @@
+import inspect
 import typing
 
-from socra.agents.agent_decision import decide
+from socra.agents.agent_decision import adecide, decide
 from socra.schemas import Schema
 from socra.agents.context import Context
+from socra.agents.executor import run_coroutine, run_sync
 
 
 class Agent(Schema):
@@ -10,13 +12,42 @@ class Agent(Schema):
     name: str
     description: str
     children: typing.List["Agent"] = []
-    runs: typing.Optional[typing.Callable[[Context], None]] = None
+    runs: typing.Optional[
+        typing.Callable[[Context], typing.Union[None, typing.Awaitable[None]]]
+    ] = None
+    """
+    Callable run when the agent has no children. May be a regular function
+    or a coroutine function; `arun()` awaits the latter directly and runs
+    the former in the agent executor (see `socra.agents.executor`).
+    """
+
+    aruns: typing.Optional[typing.Callable[[Context], typing.Awaitable[None]]] = None
+    """
+    Async counterpart of `runs`, awaited by `arun()` instead of it. Actions
+    waiting on completions provide one, so they don't hold a thread.
+    """
+
+    before_run: typing.List[
+        typing.Callable[[Context], typing.Union[None, typing.Awaitable[None]]]
+    ] = []
+    """
+    Hooks run with the context each time the agent runs, before it decides
+    or runs. On the root agent they run between steps, e.g. to compact the
+    context with a `ContextCompactor`. Sync or async, like `runs`; `arun()`
+    awaits a hook's `acall()` method instead, if it has one.
+    """
+
+    stop_after_key: bool = False
+    """
+    When deciding between children, stop streaming the decision as soon as
+    the chosen child's key is known, without waiting for the reasoning.
+    """
 
     def __eq__(self, other: "Agent") -> bool:
         return self.key == other.key
 
     def add_child(self, child: "Agent"):
-        if self.runs is not None:
+        if self.runs is not None or self.aruns is not None:
             raise ValueError("Cannot add children to an agent with a run method")
 
         self.children.append(child)
@@ -28,10 +59,19 @@ class Agent(Schema):
         which child to call based on the context provided.
 
         If the agent has no children, `runs` will be called.
+
+        Coroutine hooks and actions are run to completion, also when called
+        from inside an event loop, see `socra.agents.executor.run_coroutine()`.
         """
 
         context.add_invocation(self.key)
 
+        for hook in self.before_run:
+            if inspect.iscoroutinefunction(hook):
+                run_coroutine(hook(context))
+            else:
+                hook(context)
+
         # agent has children, we'll run an action to decide
         # which child to call based on the context provided.
         if len(self.children) > 0:
@@ -55,6 +95,49 @@ class Agent(Schema):
             #         child_to_call = decide(self, context)
 
         elif self.runs:
-            self.runs(context)
+            if inspect.iscoroutinefunction(self.runs):
+                run_coroutine(self.runs(context))
+            else:
+                self.runs(context)
+        elif self.aruns:
+            run_coroutine(self.aruns(context))
         else:
             raise ValueError(f"Agent {self.key} has no children and no run method")
+
+    async def arun(self, context: Context):
+        """
+        Async counterpart of `run()`, allowing many agent sessions
+        (one context each) to share a single event loop.
+
+        Decisions are made with `Completion.aprocess()`, and `aruns` is
+        awaited when given. Synchronous `runs` callables and hooks are run
+        in the agent executor, which bounds how many run at once.
+        """
+
+        context.add_invocation(self.key)
+
+        for hook in self.before_run:
+            acall = getattr(hook, "acall", None)
+            if acall is not None:
+                await acall(context)
+            else:
+                await _acall(hook, context)
+
+        if len(self.children) > 0:
+            child_to_call = await adecide(self, context)
+
+            await child_to_call.arun(context)
+
+        elif self.aruns:
+            await self.aruns(context)
+        elif self.runs:
+            await _acall(self.runs, context)
+        else:
+            raise ValueError(f"Agent {self.key} has no children and no run method")
+
+
+async def _acall(fn: typing.Callable, context: Context):
+    if inspect.iscoroutinefunction(fn):
+        await fn(context)
+    else:
+        await run_sync(fn, context)
@@ -0,0 +1,182 @@
+import collections
+import os
+import typing
+
+from pydantic import ValidationError
+
+from socra.agents.compaction import Compaction
+from socra.agents.context import Context
+from socra.completions.cost import CostLedger, CostSnapshot
+from socra.completions.log import CompletionRecord
+from socra.completions.timing import LatencySummary
+from socra.messages import Message, MessageSequence
+from socra.schemas import Schema
+
+
+DEFAULT_SESSIONS_DIR = os.path.join(".socra", "sessions")
+
+
+class Checkpoint(Schema):
+    """
+    Changes to a context over one step, one line of a session file.
+    """
+
+    step: int
+
+    keep: int
+    """
+    Number of messages kept from the previous checkpoint. Less than its
+    message count when the history was rewritten, e.g. by compaction.
+    """
+
+    messages: typing.List[Message] = []
+    """
+    Messages added after the kept ones.
+    """
+
+    history: typing.List[str] = []
+    """
+    Action invocations added during the step.
+    """
+
+    completions: typing.List[CompletionRecord] = []
+    """
+    Completion records added during the step.
+    """
+
+    compactions: typing.List[Compaction] = []
+
+    # running totals, replaced on every checkpoint
+    completion_count: int
+    costs: CostSnapshot
+    latency: LatencySummary
+    latency_by_step: typing.Dict[str, LatencySummary] = {}
+    terminated: bool = False
+
+
+class SessionCheckpointer:
+    """
+    Checkpoints a `socra dev` session to an append-only JSONL file after each
+    step, writing only what changed since the previous checkpoint, so a
+    crashed or interrupted session resumes without replaying completions.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.steps = 0
+
+        # state as of the last checkpoint
+        self._messages = MessageSequence()
+        self._history = 0
+        self._completion_count = 0
+        self._compactions = 0
+
+    @classmethod
+    def for_session(
+        cls, session: str, directory: str = DEFAULT_SESSIONS_DIR
+    ) -> "SessionCheckpointer":
+        return cls(os.path.join(directory, f"{session}.jsonl"))
+
+    @property
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def save(self, context: Context) -> Checkpoint:
+        """
+        Append the changes to `context` since the last checkpoint.
+        """
+        keep = _common_prefix(self._messages, context.messages)
+        new_completions = min(
+            context.completion_count - self._completion_count,
+            len(context.completions),
+        )
+
+        self.steps += 1
+        checkpoint = Checkpoint(
+            step=self.steps,
+            keep=keep,
+            messages=list(context.messages[keep:]),
+            history=context.history[self._history :],
+            completions=list(context.completions)[
+                len(context.completions) - new_completions :
+            ],
+            compactions=context.compactions[self._compactions :],
+            completion_count=context.completion_count,
+            costs=context.costs.snapshot(),
+            latency=context.latency,
+            latency_by_step=context.latency_by_step(),
+            terminated=context.terminated,
+        )
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(checkpoint.model_dump_json() + "\n")
+
+        self._mark(context)
+        return checkpoint
+
+    def load(self, **kwargs) -> Context:
+        """
+        Rebuild the context from the session file. Keyword arguments are
+        passed to `Context`. A last line torn by a crash is ignored.
+        """
+        messages = MessageSequence()
+        history: typing.List[str] = []
+        completions: typing.List[CompletionRecord] = []
+        compactions: typing.List[Compaction] = []
+        checkpoint: typing.Optional[Checkpoint] = None
+
+        with open(self.path, "r", encoding="utf-8") as f:
+            lines = f.readlines()
+
+        for i, line in enumerate(lines):
+            try:
+                checkpoint = Checkpoint.model_validate_json(line)
+            except ValidationError:
+                if i == len(lines) - 1:
+                    break
+                raise
+            messages = messages[: checkpoint.keep].extended(checkpoint.messages)
+            history.extend(checkpoint.history)
+            completions.extend(checkpoint.completions)
+            compactions.extend(checkpoint.compactions)
+
+        context = Context(**kwargs)
+        context.messages = messages
+        context.history = history
+        context.compactions = compactions
+        context.completions = collections.deque(
+            completions, maxlen=context.max_completions
+        )
+        if checkpoint is not None:
+            self.steps = checkpoint.step
+            context.completion_count = checkpoint.completion_count
+            context._costs = CostLedger.restore(checkpoint.costs)
+            context.terminated = checkpoint.terminated
+            context._latency = checkpoint.latency
+            context._latency_by_step = checkpoint.latency_by_step
+
+        self._mark(context)
+        return context
+
+    def _mark(self, context: Context):
+        self._messages = context.messages
+        self._history = len(context.history)
+        self._completion_count = context.completion_count
+        self._compactions = len(context.compactions)
+
+
+def _common_prefix(old: MessageSequence, new: MessageSequence) -> int:
+    """
+    Number of leading messages `new` shares with `old`, by identity.
+    """
+    n = len(old)
+    # fast path: messages were only appended
+    if n <= len(new) and (n == 0 or (new[0] is old[0] and new[n - 1] is old[n - 1])):
+        return n
+
+    for i, (a, b) in enumerate(zip(old, new)):
+        if a is not b:
+            return i
+    return min(n, len(new))
@@ -0,0 +1,202 @@
+import typing
+
+from socra.completions import Completion
+from socra.messages import Message, MessageSequence
+from socra.models.router import CallClass, route
+from socra.prompts import Prompt
+from socra.schemas import Schema
+from socra.utils.spinner import Spinner
+
+if typing.TYPE_CHECKING:
+    from socra.agents.context import Context
+
+
+SUMMARY_NAME = "summary"
+"""
+Name of the rolling summary message that replaces compacted messages.
+"""
+
+
+class CompactionConfig(Schema):
+    threshold_tokens: int = 16_000
+    """
+    Compact once the history is estimated to be over this many tokens.
+    """
+
+    keep_recent: int = 8
+    """
+    Number of most recent messages kept as they are.
+    """
+
+    summary_tokens: int = 512
+    """
+    Expected length of the summary.
+    """
+
+
+class Compaction(Schema):
+    """
+    A compaction of a context's history into a rolling summary.
+    """
+
+    messages: int
+    """
+    Number of messages summarized.
+    """
+
+    tokens_before: int
+    """
+    Tokens of the summarized messages.
+    """
+
+    tokens_after: int
+    """
+    Tokens of the summary replacing them.
+    """
+
+    @property
+    def tokens_saved(self) -> int:
+        """
+        Tokens removed from every prompt built from the history afterwards.
+        """
+        return self.tokens_before - self.tokens_after
+
+
+class ContextCompactor:
+    """
+    Keeps an agent's history bounded: once it grows past the threshold, older
+    messages are summarized by a cheap model into a rolling summary message.
+    The system message and the most recent messages are kept as they are.
+
+    Register it as a `before_run` hook of the root agent, so it runs between
+    steps:
+
+        agent = Agent(..., before_run=[ContextCompactor()])
+    """
+
+    def __init__(self, config: typing.Optional[CompactionConfig] = None):
+        self.config = config or CompactionConfig()
+
+    def __call__(self, context: "Context"):
+        if self.should_compact(context):
+            self.compact(context)
+
+    async def acall(self, context: "Context"):
+        """
+        Async counterpart of calling the compactor, used by `Agent.arun()`.
+        """
+        if self.should_compact(context):
+            await self.acompact(context)
+
+    def should_compact(self, context: "Context") -> bool:
+        # an estimate is enough to decide, without tokenizing the history
+        model = route(CallClass.SUMMARY)
+        tokens = sum(m.estimate_tokens(model) for m in context.messages)
+        return tokens > self.config.threshold_tokens
+
+    def compact(self, context: "Context") -> typing.Optional[Compaction]:
+        """
+        Summarize all but the system message and the most recent messages.
+        A previous summary is among the summarized messages, so it rolls over.
+        """
+        request = self._summary_request(context)
+        if request is None:
+            return None
+
+        request.completion.process()
+        return self._apply(context, request)
+
+    async def acompact(self, context: "Context") -> typing.Optional[Compaction]:
+        """
+        Async counterpart of `compact()`.
+        """
+        request = self._summary_request(context)
+        if request is None:
+            return None
+
+        await request.completion.aprocess()
+        return self._apply(context, request)
+
+    def _summary_request(self, context: "Context") -> typing.Optional["_Summary"]:
+        messages = context.messages
+        start = int(bool(messages) and messages[0].role == Message.Role.SYSTEM)
+        end = len(messages) - self.config.keep_recent
+        if end - start < 2:
+            return None
+
+        summarized = messages[start:end]
+        prompt = Prompt(
+            messages=[
+                Message(role=Message.Role.SYSTEM, content=_summary_prompt),
+                Message(role=Message.Role.HUMAN, content=_transcript(summarized)),
+            ]
+        )
+        model = route(CallClass.SUMMARY, prompt, self.config.summary_tokens)
+
+        spinner = Spinner(message=f"Compacting {len(summarized)} messages")
+        spinner.start()
+        return _Summary(messages, start, end, Completion(model, prompt), spinner)
+
+    def _apply(self, context: "Context", request: "_Summary") -> Compaction:
+        cr = request.completion
+        context.track_completion(cr)
+
+        messages = request.messages
+        summarized = messages[request.start : request.end]
+        summary = Message(
+            role=Message.Role.HUMAN,
+            name=SUMMARY_NAME,
+            content=f"Summary of the conversation so far:\n{cr.response.content}",
+        )
+        compaction = Compaction(
+            messages=len(summarized),
+            tokens_before=sum(Message.count_tokens_many(cr.model, summarized)),
+            tokens_after=summary.count_tokens(cr.model),
+        )
+
+        context.messages = (
+            messages[: request.start]
+            .appended(summary)
+            .extended(messages[request.end :])
+        )
+        context.compactions.append(compaction)
+
+        request.spinner.message = (
+            f"Compacted {compaction.messages} messages, "
+            f"saving {compaction.tokens_saved} tokens"
+        )
+        request.spinner.finish()
+        return compaction
+
+
+class _Summary(typing.NamedTuple):
+    """
+    A pending summary of the messages between `start` and `end`.
+    """
+
+    messages: MessageSequence
+    start: int
+    end: int
+    completion: Completion
+    spinner: Spinner
+
+
+def _transcript(messages: typing.Iterable[Message]) -> str:
+    return "\n\n".join(
+        f"{m.name or m.role.value}: " + "\n".join(part.text for part in m.content)
+        for m in messages
+    )
+
+
+_summary_prompt = """You are compacting the history of a software development agent.
+
+Summarize the conversation below so the agent can continue its task without it.
+If it starts with a summary, fold that summary into yours.
+
+Keep:
+- the user's requests and any answers they gave
+- decisions made, and actions taken with their outcome
+- file paths, names and other details still needed
+
+Respond only with the summary, as brief bullet points.
+"""
@@ -1,10 +1,22 @@
+import collections
 import typing
 
-from pydantic import ConfigDict
-from socra.completions.base import TokenCost
+from pydantic import ConfigDict, PrivateAttr
+from socra.agents.compaction import Compaction
+from socra.completions.cost import CostLedger
+from socra.completions.usage import TokenCost, TokenUsage
 from socra.messages.base import Message
+from socra.messages.sequence import MessageSequence
 from socra.schemas import Schema
 from socra.completions.base import Completion
+from socra.completions.log import (
+    CompletionLog,
+    CompletionRecord,
+    get_completion_log,
+)
+from socra.completions.timing import LatencySummary
+from socra.models import Model
+from socra.prompts import Prompt, TokenLedger
 from socra.utils.spinner import Spinner
 
 
@@ -13,18 +25,36 @@ class Context(Schema):
     Core context object passed around and manipulated by agents
     """
 
-    messages: typing.List[Message] = []
+    messages: MessageSequence = MessageSequence()
+    """
+    Immutable history of messages, add to it with `add_message()`.
+    """
 
     # history of action invocations
     history: typing.List[str] = []
 
-    token_cost: TokenCost = TokenCost(
-        input=0,
-        output=0,
-        total=0,
-    )
+    completions: typing.Deque[CompletionRecord] = collections.deque()
+    """
+    Records of the most recent `max_completions` tracked completions.
+    """
+
+    max_completions: int = 256
+
+    completion_count: int = 0
+    """
+    Number of completions tracked over the session.
+    """
+
+    completion_log: typing.Optional[CompletionLog] = None
+    """
+    Log receiving every tracked completion with its full prompt and content.
+    Defaults to the process-wide log, see `configure_completion_log()`.
+    """
 
-    completions: typing.List[Completion] = []
+    compactions: typing.List[Compaction] = []
+    """
+    Compactions of the history into a rolling summary, see `ContextCompactor`.
+    """
 
     # allow arbitrary types
     model_config: ConfigDict = {
@@ -35,6 +65,20 @@ class Context(Schema):
 
     terminated: bool = False
 
+    _token_ledgers: typing.Dict[str, TokenLedger] = PrivateAttr(default_factory=dict)
+
+    _costs: CostLedger = PrivateAttr(default_factory=CostLedger)
+    _latency: LatencySummary = PrivateAttr(default_factory=LatencySummary)
+    _latency_by_step: typing.Dict[str, LatencySummary] = PrivateAttr(
+        default_factory=dict
+    )
+
+    def model_post_init(self, __context: typing.Any):
+        # bound the ring buffer of records
+        self.completions = collections.deque(
+            self.completions, maxlen=self.max_completions
+        )
+
     def stop(self):
         self.terminated = True
 
@@ -53,16 +97,96 @@ class Context(Schema):
 
     def track_completion(self, completion: Completion):
         """
-        Tracks a completion in the execution context
+        Tracks a completion in the execution context.
+
+        Only a compact record is kept, in a ring buffer of the most recent
+        completions, so the completion (and its prompt) can be freed.
+        Totals cover every completion of the session. Cached and shared
+        responses made no API call, and are counted as saved, not billed.
+        """
+        if self.history:
+            completion.timings.step = self.history[-1]
+
+        record = CompletionRecord.of(completion)
+        self.completions.append(record)
+        self.completion_count += 1
+
+        step = record.timings.step or "-"
+        billed = not (record.cached or record.shared)
+        self._costs.add(completion.model, record.usage, step, billed=billed)
+
+        self._latency.add(record.timings)
+        self._latency_by_step.setdefault(step, LatencySummary()).add(record.timings)
+
+        log = self.completion_log or get_completion_log()
+        if log is not None:
+            log.write(record, completion)
+
+    @property
+    def costs(self) -> CostLedger:
+        """
+        Exact cost and usage of tracked completions, per model and per agent.
+        """
+        return self._costs
+
+    @property
+    def token_cost(self) -> TokenCost:
+        return self._costs.cost()
+
+    @property
+    def token_usage(self) -> TokenUsage:
+        return self._costs.usage()
+
+    @property
+    def latency(self) -> LatencySummary:
+        """
+        Latency summed over all tracked completions.
+        """
+        return self._latency
+
+    def latency_by_step(self) -> typing.Dict[str, LatencySummary]:
+        """
+        Latency of tracked completions, grouped by the agent step that made them.
+        """
+        return self._latency_by_step
+
+    def token_ledger(self, model: Model) -> TokenLedger:
+        """
+        Token ledger for prompts built from this context, one per encoding.
+        Pass it to `Prompt.limit_context_window()` so each call only counts
+        the messages added since the previous one.
         """
-        self.completions.append(completion)
-        self.token_cost += completion.response.cost
+        ledger = self._token_ledgers.get(model.encoding)
+        if ledger is None:
+            ledger = self._token_ledgers[model.encoding] = TokenLedger(model)
+        return ledger
+
+    @property
+    def tokens_saved(self) -> int:
+        """
+        Tokens removed from the history by compaction, over the session.
+        """
+        return sum(c.tokens_saved for c in self.compactions)
 
     def add_invocation(self, key: str):
         self.history.append(key)
 
     def add_thought(self, thought: str):
-        self.messages.append(Message(role=Message.Role.ASSISTANT, content=thought))
+        self.add_message(Message(role=Message.Role.ASSISTANT, content=thought))
 
     def add_message(self, message: Message):
-        self.messages.append(message)
+        self.messages = self.messages.appended(message)
+
+    def prompt(self, instruction: str) -> Prompt:
+        """
+        Build a prompt of the context's messages followed by `instruction`.
+
+        The history always comes first and unchanged, with the per-call
+        instruction last, so consecutive prompts share a byte-identical
+        prefix that providers can serve from their prompt cache.
+        """
+        return Prompt.build(
+            self.messages.appended(
+                Message(role=Message.Role.HUMAN, content=instruction)
+            )
+        )
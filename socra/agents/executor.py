@@ -0,0 +1,150 @@
+import asyncio
+import contextvars
+import functools
+import threading
+import typing
+from concurrent.futures import ThreadPoolExecutor
+
+T = typing.TypeVar("T")
+
+
+DEFAULT_MAX_WORKERS = 32
+"""
+Default number of threads running synchronous agent code for `Agent.arun()`.
+"""
+
+
+class AgentExecutor:
+    """
+    Thread pool for the synchronous code of async agent runs: `runs`
+    callables and hooks without an async counterpart, and blocking calls
+    inside async actions, such as console prompts.
+
+    Completion-backed actions are natively async and don't use it, so it
+    bounds only the synchronous work. At most `max_workers` synchronous
+    calls run at once across every agent on the loop; further calls wait
+    for a free thread. It is separate from the event loop's default
+    executor, so agents don't compete with other `asyncio.to_thread()` users.
+
+    It also runs the coroutines of synchronous agent runs started from
+    inside an event loop, on a loop thread of its own, see `run_coroutine()`.
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS):
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._pool: typing.Optional[ThreadPoolExecutor] = None
+        self._loop: typing.Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: typing.Optional[threading.Thread] = None
+
+    @property
+    def pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix="socra-agent",
+                    )
+        return self._pool
+
+    async def run(self, fn: typing.Callable[..., T], *args) -> T:
+        """
+        Run `fn(*args)` in the pool without blocking the event loop. Like
+        `asyncio.to_thread()`, it runs in a copy of the current context.
+        """
+        loop = asyncio.get_running_loop()
+        call = functools.partial(contextvars.copy_context().run, fn, *args)
+        return await loop.run_in_executor(self.pool, call)
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            with self._lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    self._loop_thread = threading.Thread(
+                        target=_run_loop,
+                        args=(loop,),
+                        name="socra-agent-loop",
+                        daemon=True,
+                    )
+                    self._loop_thread.start()
+                    self._loop = loop
+        return self._loop
+
+    def run_coroutine(self, coro: typing.Awaitable[T]) -> T:
+        """
+        Run `coro` on the executor's loop thread, blocking until it completes.
+        """
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is not None and running is self._loop:
+            coro.close()
+            raise RuntimeError(
+                "Agent.run() cannot block the agent loop it runs on, use arun()"
+            )
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=wait)
+                self._pool = None
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                if wait:
+                    self._loop_thread.join()
+                self._loop = self._loop_thread = None
+
+
+def _run_loop(loop: asyncio.AbstractEventLoop):
+    asyncio.set_event_loop(loop)
+    try:
+        loop.run_forever()
+    finally:
+        # closes the clients bound to the loop, see `ClientRegistry`
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        loop.close()
+
+
+_executor = AgentExecutor()
+
+
+def configure_executor(max_workers: int) -> AgentExecutor:
+    """
+    Replace the process-wide agent executor, e.g. to run more synchronous
+    actions at once. Calls already submitted to the previous executor still
+    complete.
+    """
+    global _executor
+    previous, _executor = _executor, AgentExecutor(max_workers)
+    previous.shutdown(wait=False)
+    return _executor
+
+
+def get_executor() -> AgentExecutor:
+    return _executor
+
+
+async def run_sync(fn: typing.Callable[..., T], *args) -> T:
+    """
+    Run a blocking call from async agent code, in the agent executor.
+    """
+    return await _executor.run(fn, *args)
+
+
+def run_coroutine(coro: typing.Awaitable[T]) -> T:
+    """
+    Run a coroutine from synchronous agent code, e.g. an async hook of
+    `Agent.run()`. Outside an event loop it runs with `asyncio.run()`. Inside
+    one (Jupyter, an async CLI or server), where `asyncio.run()` can't be
+    called, it runs on the agent executor's loop thread and blocks until done.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    return _executor.run_coroutine(coro)
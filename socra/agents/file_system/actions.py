@@ -2,9 +2,10 @@ from socra.agents.context import Context
 import os
 import typing
 
-from socra.parsers import parse_json
 from socra.io.files import read_file, write_file
 import socra
+from socra.models.router import CallClass, rewrite_output_tokens, route
+from socra.schemas import Schema
 from socra.utils.decorators import throttle
 
 
@@ -13,7 +14,24 @@ def create_file(context: Context):
     Create a new file
     """
     file_path = get_file_path(context)
+    if _create_empty_file(context, file_path):
+        # finally, we'll modify the file content
+        modify_file_content(context, file_path)
+
+
+async def acreate_file(context: Context):
+    """
+    Async counterpart of `create_file()`.
+    """
+    file_path = await aget_file_path(context)
+    if _create_empty_file(context, file_path):
+        await amodify_file_content(context, file_path)
 
+
+def _create_empty_file(context: Context, file_path: str) -> bool:
+    """
+    Create a blank file, unless the path exists. Returns whether it was created.
+    """
     # next, make sure file path does not exist
     context.start_thinking(f"Checking if file path exists: {file_path}")
     if os.path.exists(file_path):
@@ -22,24 +40,28 @@ def create_file(context: Context):
             context.stop_thinking(
                 f"File path is a directory. Need to ask user for a file name: {file_path}"
             )
-            return
+            return False
 
         context.stop_thinking(f"File already exists: {file_path}")
-        return
+        return False
     context.stop_thinking(f"File path does not exist: {file_path}")
 
     # next, create the file with blank content
     context.start_thinking(f"Creating a new file at {file_path}")
     write_file(file_path, "")
     context.stop_thinking(f"Created a new file at {file_path}")
-
-    # finally, we'll modify the file content
-    modify_file_content(context, file_path)
+    return True
 
 
 def create_directory(context: Context):
-    file_path = get_file_path(context)
+    _create_directory(context, get_file_path(context))
+
+
+async def acreate_directory(context: Context):
+    _create_directory(context, await aget_file_path(context))
+
 
+def _create_directory(context: Context, file_path: str):
     if os.path.exists(file_path):
         context.start_thinking(f"Checking if file path exists: {file_path}")
         context.stop_thinking(f"Path path already exists: {file_path}")
@@ -53,8 +75,14 @@ def create_directory(context: Context):
 
 
 def list_files_and_folders(context: Context):
-    file_path = get_file_path(context)
+    _list_files_and_folders(context, get_file_path(context))
+
+
+async def alist_files_and_folders(context: Context):
+    _list_files_and_folders(context, await aget_file_path(context))
+
 
+def _list_files_and_folders(context: Context, file_path: str):
     # next, make sure file path exists
     if not os.path.exists(file_path):
         context.stop_thinking(f"File path '{file_path}' does not exist")
@@ -65,8 +93,14 @@ def list_files_and_folders(context: Context):
 
 
 def rename_file_or_folder(context: Context):
-    old_path, new_path = get_old_and_new_file_paths(context)
+    _rename_file_or_folder(context, *get_old_and_new_file_paths(context))
 
+
+async def arename_file_or_folder(context: Context):
+    _rename_file_or_folder(context, *await aget_old_and_new_file_paths(context))
+
+
+def _rename_file_or_folder(context: Context, old_path: str, new_path: str):
     # next, make sure file path exists
     if not os.path.exists(old_path):
         context.start_thinking(f"Checking if file path exists: {old_path}")
@@ -77,41 +111,50 @@ def rename_file_or_folder(context: Context):
     context.stop_thinking(f"DONE: Successfully renamed {old_path} to {new_path}.")
 
 
+class RenamePayload(Schema):
+    old_path: str
+    new_path: str
+
+
 def get_old_and_new_file_paths(context: Context) -> typing.Tuple[str, str]:
-    prompt = socra.Prompt(
-        messages=[
-            *context.messages,
-            socra.Message(
-                role=socra.Message.Role.HUMAN,
-                content=get_old_and_new_file_paths_prompt,
-            ),
-        ]
-    )
-    model = socra.Model.for_key(socra.Model.Key.GPT_4O_MINI_2024_07_18)
+    cr = _old_and_new_file_paths_completion(context)
+    cr.process()
+    return _resolve_old_and_new_file_paths(context, cr)
+
+
+async def aget_old_and_new_file_paths(context: Context) -> typing.Tuple[str, str]:
+    cr = _old_and_new_file_paths_completion(context)
+    await cr.aprocess()
+    return _resolve_old_and_new_file_paths(context, cr)
+
+
+def _old_and_new_file_paths_completion(context: Context) -> socra.Completion:
+    prompt = context.prompt(get_old_and_new_file_paths_prompt)
     context.start_thinking("Getting old and new file paths")
 
     @throttle(0.1)
     def on_chunk(chunk):
         context.spinner.spin()
 
+    model = route(CallClass.EXTRACTION, prompt)
     cr = socra.Completion(
         model,
         prompt,
         # mock_response=inputs.mock_response,
         on_chunk=on_chunk,
+        schema=RenamePayload,
     )
-    resp = cr.process()
-    context.track_completion(cr)
+    return cr
 
-    content = resp.content
-    dct = parse_json(content)
-    if "old_path" not in dct:
-        raise ValueError("Missing 'old_path' in response")
-    if "new_path" not in dct:
-        raise ValueError("Missing 'new_path' in response")
 
-    old_path = dct["old_path"]
-    new_path = dct["new_path"]
+def _resolve_old_and_new_file_paths(
+    context: Context, cr: socra.Completion
+) -> typing.Tuple[str, str]:
+    resp = cr.response
+    context.track_completion(cr)
+
+    old_path = resp.parsed.old_path
+    new_path = resp.parsed.new_path
     context.stop_thinking(f"Extracted old and new file paths: {old_path}, {new_path}")
 
     return old_path, new_path
@@ -133,38 +176,46 @@ Respond only in JSON format.
 """
 
 
+class FilePathPayload(Schema):
+    path: str
+
+
 def get_file_path(context: Context) -> str:
-    prompt = socra.Prompt(
-        messages=[
-            *context.messages,
-            socra.Message(
-                role=socra.Message.Role.HUMAN,
-                content=get_file_path_prompt,
-            ),
-        ]
-    )
-    model = socra.Model.for_key(socra.Model.Key.GPT_4O_MINI_2024_07_18)
+    cr = _file_path_completion(context)
+    cr.process()
+    return _resolve_file_path(context, cr)
+
+
+async def aget_file_path(context: Context) -> str:
+    cr = _file_path_completion(context)
+    await cr.aprocess()
+    return _resolve_file_path(context, cr)
+
+
+def _file_path_completion(context: Context) -> socra.Completion:
+    prompt = context.prompt(get_file_path_prompt)
     context.start_thinking("Getting file path")
 
     @throttle(0.1)
     def on_chunk(chunk):
         context.spinner.spin()
 
+    model = route(CallClass.EXTRACTION, prompt)
     cr = socra.Completion(
         model,
         prompt,
         # mock_response=inputs.mock_response,
         on_chunk=on_chunk,
+        schema=FilePathPayload,
     )
-    resp = cr.process()
-    context.track_completion(cr)
+    return cr
 
-    content = resp.content
-    dct = parse_json(content)
-    if "path" not in dct:
-        raise ValueError("Missing 'path' in response")
 
-    path = dct["path"]
+def _resolve_file_path(context: Context, cr: socra.Completion) -> str:
+    resp = cr.response
+    context.track_completion(cr)
+
+    path = resp.parsed.path
     context.stop_thinking(f"Extracted file path: {path}")
 
     return path
@@ -200,23 +251,46 @@ def update_file(context: Context):
         modify_file_content(context, file_path)
 
 
+async def aupdate_file(context: Context):
+    """
+    Async counterpart of `update_file()`.
+    """
+    file_path = await aget_file_path(context)
+
+    if not os.path.exists(file_path):
+        return f"File path '{file_path}' does not exist"
+
+    if await ashould_update_file_content(context, file_path):
+        await amodify_file_content(context, file_path)
+
+
+class ShouldUpdatePayload(Schema):
+    should_update: bool
+    reason: str
+
+
 def should_update_file_content(context: Context, file_path: str) -> bool:
     """
     Decide if file path should be update.
     """
+    cr = _should_update_file_content_completion(context, file_path)
+    cr.process()
+    return _resolve_should_update_file_content(context, cr, file_path)
 
-    file_content = read_file(file_path)
 
-    model = socra.Model.for_key(socra.Model.Key.GPT_4O_MINI_2024_07_18)
+async def ashould_update_file_content(context: Context, file_path: str) -> bool:
+    cr = _should_update_file_content_completion(context, file_path)
+    await cr.aprocess()
+    return _resolve_should_update_file_content(context, cr, file_path)
 
-    prompt = socra.Prompt(
-        messages=[
-            *context.messages,
-            socra.Message(
-                role=socra.Message.Role.HUMAN,
-                content=should_update_file_content_prompt.format(content=file_content),
-            ),
-        ]
+
+def _should_update_file_content_completion(
+    context: Context, file_path: str
+) -> socra.Completion:
+    file_content = read_file(file_path)
+
+    prompt = context.prompt(
+        should_update_file_content_prompt.format(content=file_content)
     )
 
     context.start_thinking(f"Deciding whether to update {file_path}")
@@ -225,31 +299,30 @@ def should_update_file_content(context: Context, file_path: str) -> bool:
     def on_chunk(chunk):
         context.spinner.spin()
 
+    model = route(CallClass.DECISION, prompt)
     cr = socra.Completion(
         model,
         prompt,
         # mock_response=inputs.mock_response,
         on_chunk=on_chunk,
+        schema=ShouldUpdatePayload,
     )
-    resp = cr.process()
-    context.track_completion(cr)
-
-    content = resp.content
+    return cr
 
-    # parse JSON response
-    dct = parse_json(content)
 
-    if "should_update" not in dct:
-        raise ValueError("Missing 'should_update' in response")
-    if "reason" not in dct:
-        raise ValueError("Missing 'reason' in response")
+def _resolve_should_update_file_content(
+    context: Context, cr: socra.Completion, file_path: str
+) -> bool:
+    resp = cr.response
+    context.track_completion(cr)
 
-    should_update = dct["should_update"]
+    should_update = resp.parsed.should_update
+    reason = resp.parsed.reason.lower()
 
     if should_update:
-        message = f"Decided to update {file_path} because {dct['reason'].lower()}"
+        message = f"Decided to update {file_path} because {reason}"
     else:
-        message = f"Decided not to update {file_path} because {dct['reason'].lower()}"
+        message = f"Decided not to update {file_path} because {reason}"
 
     context.stop_thinking(message)
     return should_update
@@ -283,43 +356,56 @@ Respond only in JSON format.
 """
 
 
+class FileContentPayload(Schema):
+    content: str
+    reasoning: str
+
+
 def modify_file_content(context: Context, file_path: str):
+    cr = _modify_file_content_completion(context, file_path)
+    cr.process()
+    _resolve_modify_file_content(context, cr, file_path)
+
+
+async def amodify_file_content(context: Context, file_path: str):
+    cr = _modify_file_content_completion(context, file_path)
+    await cr.aprocess()
+    _resolve_modify_file_content(context, cr, file_path)
+
+
+def _modify_file_content_completion(
+    context: Context, file_path: str
+) -> socra.Completion:
     file_content = read_file(file_path)
 
-    prompt = socra.Prompt(
-        messages=[
-            *context.messages,
-            socra.Message(
-                role=socra.Message.Role.HUMAN,
-                content=modify_file_content_prompt.format(content=file_content),
-            ),
-        ]
-    )
-    model = socra.Model.for_key(socra.Model.Key.GPT_4O_MINI_2024_07_18)
+    prompt = context.prompt(modify_file_content_prompt.format(content=file_content))
     context.start_thinking("Modifying the file content")
 
     @throttle(0.1)
     def on_chunk(chunk):
         context.spinner.spin()
 
+    model = route(
+        CallClass.GENERATION, prompt, output_tokens=rewrite_output_tokens(file_content)
+    )
     cr = socra.Completion(
         model,
         prompt,
         # mock_response=inputs.mock_response,
         on_chunk=on_chunk,
+        schema=FileContentPayload,
     )
-    resp = cr.process()
-    context.track_completion(cr)
+    return cr
 
-    content = resp.content
-    dct = parse_json(content)
-    if "content" not in dct:
-        raise ValueError("Missing 'content' in response")
-    if "reasoning" not in dct:
-        raise ValueError("Missing 'reasoning' in response")
 
-    content = dct["content"]
-    reasoning = dct["reasoning"]
+def _resolve_modify_file_content(
+    context: Context, cr: socra.Completion, file_path: str
+):
+    resp = cr.response
+    context.track_completion(cr)
+
+    content = resp.parsed.content
+    reasoning = resp.parsed.reasoning
 
     context.stop_thinking(f"Modified the file content: {reasoning}")
     write_file(file_path, content)
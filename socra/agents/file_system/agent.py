@@ -1,6 +1,11 @@
 import typing
 from socra.agents.base import Agent
 from socra.agents.file_system.actions import (
+    acreate_directory,
+    acreate_file,
+    alist_files_and_folders,
+    arename_file_or_folder,
+    aupdate_file,
     create_directory,
     create_file,
     list_files_and_folders,
@@ -20,29 +25,34 @@ class FileSystemAgent(Agent):
             name="Create File",
             description="Create a new file. Must already have the file path and file name in mind.",
             runs=create_file,
+            aruns=acreate_file,
         ),
         Agent(
             key="update_file",
             name="Update File",
             description="Update the contents of a file.",
             runs=update_file,
+            aruns=aupdate_file,
         ),
         Agent(
             key="create_directory",
             name="Create Directory",
             description="Create a new directory.",
             runs=create_directory,
+            aruns=acreate_directory,
         ),
         Agent(
             key="rename",
             name="rename file or folder",
             description="Rename a file or folder. Must already have the previous and new paths in mind.",
             runs=rename_file_or_folder,
+            aruns=arename_file_or_folder,
         ),
         Agent(
             key="list_files_and_folders",
             name="List Files and Folders",
             description="List all files and folders for a given path. You must already have the path in mind.",
             runs=list_files_and_folders,
+            aruns=alist_files_and_folders,
         ),
     ]
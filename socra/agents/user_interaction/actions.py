@@ -1,8 +1,9 @@
 from socra.agents.context import Context
+from socra.agents.executor import run_sync
 import typing
 
-from socra.parsers import parse_json
 import socra
+from socra.models.router import CallClass, route
 from socra.utils.decorators import throttle
 from socra.schemas import Schema
 import inquirer
@@ -14,7 +15,19 @@ def input_choices(context: Context):
     """
 
     payload = get_input_choices_payload(context)
+    _prompt_choices(context, payload)
 
+
+async def ainput_choices(context: Context):
+    """
+    Async counterpart of `input_choices()`. The console prompt blocks, so it
+    runs in the agent executor.
+    """
+    payload = await aget_input_choices_payload(context)
+    await run_sync(_prompt_choices, context, payload)
+
+
+def _prompt_choices(context: Context, payload: "InputChoicesPayload"):
     context.start_thinking(f"Prompting user with: {payload.message}")
 
     if payload.allow_multiple:
@@ -46,45 +59,42 @@ class InputChoicesPayload(Schema):
 
 
 def get_input_choices_payload(context: Context) -> InputChoicesPayload:
-    prompt = socra.Prompt(
-        messages=[
-            *context.messages,
-            socra.Message(
-                role=socra.Message.Role.HUMAN,
-                content=get_input_choices_payload_prompt,
-            ),
-        ]
-    )
-    model = socra.Model.for_key(socra.Model.Key.GPT_4O_MINI_2024_07_18)
+    cr = _input_choices_payload_completion(context)
+    cr.process()
+    return _resolve_input_choices_payload(context, cr)
+
+
+async def aget_input_choices_payload(context: Context) -> InputChoicesPayload:
+    cr = _input_choices_payload_completion(context)
+    await cr.aprocess()
+    return _resolve_input_choices_payload(context, cr)
+
+
+def _input_choices_payload_completion(context: Context) -> socra.Completion:
+    prompt = context.prompt(get_input_choices_payload_prompt)
     context.start_thinking("Creating choices")
 
     @throttle(0.1)
     def on_chunk(chunk):
         context.spinner.spin()
 
+    model = route(CallClass.EXTRACTION, prompt)
     cr = socra.Completion(
         model,
         prompt,
         # mock_response=inputs.mock_response,
         on_chunk=on_chunk,
+        schema=InputChoicesPayload,
     )
-    resp = cr.process()
+    return cr
+
+
+def _resolve_input_choices_payload(
+    context: Context, cr: socra.Completion
+) -> InputChoicesPayload:
     context.track_completion(cr)
 
-    content = resp.content
-    dct = parse_json(content)
-    if "message" not in dct:
-        raise ValueError("Missing 'message' in response")
-    if "choices" not in dct:
-        raise ValueError("Missing 'choices' in response")
-    if "allow_multiple" not in dct:
-        raise ValueError("Missing 'allow_multiple' in response")
-
-    payload = InputChoicesPayload(
-        message=dct["message"],
-        choices=dct["choices"],
-        allow_multiple=dct["allow_multiple"],
-    )
+    payload = cr.response.parsed
 
     # context.stop_thinking(f"Gathered choices: {payload.choices}")
 
@@ -116,7 +126,19 @@ def text_input(context: Context):
 
     # first, determine what we want to prompt the user
     payload = determine_user_input_prefix(context)
+    _prompt_text(context, payload)
 
+
+async def atext_input(context: Context):
+    """
+    Async counterpart of `text_input()`. The console prompt blocks, so it
+    runs in the agent executor.
+    """
+    payload = await adetermine_user_input_prefix(context)
+    await run_sync(_prompt_text, context, payload)
+
+
+def _prompt_text(context: Context, payload: "UserInputPayload"):
     # next, get input from the user
     context.add_thought(f"Getting input from user because: {payload.reasoning}")
     context.add_thought(payload.reasoning)
@@ -140,35 +162,33 @@ def determine_user_input_prefix(context: Context) -> UserInputPayload:
     """
     Determine the user input prefix prompt.
     """
-    model = socra.Model.for_key(socra.Model.Key.GPT_4O_MINI_2024_07_18)
+    cr = _user_input_prefix_completion(context)
+    cr.process()
+    context.track_completion(cr)
+    return cr.response.parsed
 
+
+async def adetermine_user_input_prefix(context: Context) -> UserInputPayload:
+    cr = _user_input_prefix_completion(context)
+    await cr.aprocess()
+    context.track_completion(cr)
+    return cr.response.parsed
+
+
+def _user_input_prefix_completion(context: Context) -> socra.Completion:
     @throttle(0.1)
     def on_chunk(chunk):
         context.spinner.spin()
 
+    prompt = context.prompt(determine_user_input_prefix_prompt)
+    model = route(CallClass.EXTRACTION, prompt)
     cr = socra.Completion(
         model,
-        socra.Prompt(
-            messages=[
-                *context.messages,
-                socra.Message(
-                    role=socra.Message.Role.HUMAN,
-                    content=determine_user_input_prefix_prompt,
-                ),
-            ]
-        ),
+        prompt,
         on_chunk=on_chunk,
+        schema=UserInputPayload,
     )
-    resp = cr.process()
-    context.track_completion(cr)
-
-    content = resp.content
-    dct = parse_json(content)
-    if "prompt" not in dct:
-        raise ValueError("Missing 'prompt' in response")
-
-    payload = UserInputPayload(**dct)
-    return payload
+    return cr
 
 
 determine_user_input_prefix_prompt = """Based on the context above, what information do you need from the user?
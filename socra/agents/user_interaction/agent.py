@@ -2,6 +2,8 @@ import typing
 from socra.agents.base import Agent
 
 from socra.agents.user_interaction.actions import (
+    ainput_choices,
+    atext_input,
     input_choices,
     terminate_program,
     text_input,
@@ -19,12 +21,14 @@ class UserInteractionAgent(Agent):
             name="Input Choices",
             description="Ask user to choose from a list of options.",
             runs=input_choices,
+            aruns=ainput_choices,
         ),
         Agent(
             key="text_input",
             name="Text Input",
             description="Ask user to input text.",
             runs=text_input,
+            aruns=atext_input,
         ),
         Agent(
             key="sig_int",
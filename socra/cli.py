@@ -1,8 +1,15 @@
+import datetime
+
 import click
 
 from socra.agents.file_system.agent import FileSystemAgent
+from socra.agents.user_interaction.actions import UserInputPayload
 from socra.agents.user_interaction.agent import UserInteractionAgent
 from socra.commands.describe import Describe
+from socra.completions.cache import configure_cache, get_default_cache
+from socra.completions.cassette import CassetteMode, use_cassette
+from socra.completions.clients import ClientConfig, configure_clients
+from socra.completions.fake_server import FakeLLMServer, FakeServerConfig
 
 from dotenv import load_dotenv
 from socra.nodes import Node
@@ -11,11 +18,14 @@ from socra.nodes.actions.content_update import NodeContentUpdate
 from socra.nodes.actions.root import ActionKey, NodeRootAction
 from socra.messages import Message
 import socra
+from socra.models.router import CallClass, route
 from socra.utils.decorators import throttle
 from socra.utils.spinner import Spinner
 import json
 
 from socra.agents import Agent, Context
+from socra.agents.checkpoint import DEFAULT_SESSIONS_DIR, SessionCheckpointer
+from socra.agents.compaction import ContextCompactor
 
 
 def load_env():
@@ -26,9 +36,43 @@ load_env()
 
 
 @click.group()
-def cli():
+@click.option(
+    "--cache",
+    type=click.Path(dir_okay=False),
+    envvar="SOCRA_COMPLETION_CACHE",
+    help="Path to an on-disk completion cache (SQLite).",
+)
+@click.option(
+    "--record",
+    type=click.Path(dir_okay=False),
+    help="Record every completion of this run to a cassette file.",
+)
+@click.option(
+    "--replay",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Replay completions from a recorded cassette file, without network calls.",
+)
+@click.option(
+    "--llm-base-url",
+    envvar="SOCRA_LLM_BASE_URL",
+    help="Base URL of an OpenAI-compatible API to send completions to, "
+    "e.g. a local `socra fake-server`.",
+)
+def cli(cache: str, record: str, replay: str, llm_base_url: str):
     """socra CLI tool for code improvement and description."""
-    pass
+    if record and replay:
+        raise click.UsageError("--record and --replay are mutually exclusive.")
+
+    if llm_base_url:
+        configure_clients(ClientConfig(base_url=llm_base_url))
+
+    if cache:
+        configure_cache(cache)
+
+    if record:
+        use_cassette(record, CassetteMode.RECORD)
+    elif replay:
+        use_cassette(replay, CassetteMode.REPLAY)
 
 
 @cli.command()
@@ -64,6 +108,64 @@ def describe(target: str, prompt: str):
     command.execute()
 
 
+@cli.command("fake-server")
+@click.option("--host", default="127.0.0.1", show_default=True)
+@click.option("--port", default=8000, show_default=True)
+@click.option(
+    "--ttft", default=0.3, show_default=True, help="Time to first token, in seconds."
+)
+@click.option(
+    "--tps",
+    default=80.0,
+    show_default=True,
+    help="Tokens streamed per second, 0 for unthrottled.",
+)
+@click.option(
+    "--error-rate", default=0.0, help="Fraction of requests failing with HTTP 500."
+)
+@click.option(
+    "--rate-limit-rate",
+    default=0.0,
+    help="Fraction of requests failing with HTTP 429.",
+)
+@click.option(
+    "--retry-after",
+    default=1.0,
+    show_default=True,
+    help="Seconds sent in the retry-after header of 429 responses.",
+)
+@click.option("--seed", type=int, help="Seed for injected errors and decisions.")
+def fake_server(
+    host: str,
+    port: int,
+    ttft: float,
+    tps: float,
+    error_rate: float,
+    rate_limit_rate: float,
+    retry_after: float,
+    seed: int,
+):
+    """Serve a local OpenAI-compatible stand-in for load and latency testing."""
+    server = FakeLLMServer(
+        FakeServerConfig(
+            ttft=ttft,
+            tokens_per_second=tps,
+            error_rate=error_rate,
+            rate_limit_rate=rate_limit_rate,
+            retry_after=retry_after,
+            seed=seed,
+        ),
+        host=host,
+        port=port,
+    )
+    print(f"Serving on {server.url}")
+    print(f"Run socra against it with SOCRA_LLM_BASE_URL={server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
 # @cli.command()
 # @click.argument("args", nargs=-1)  # This allows for any number of additional arguments
 # def dev2(args):
@@ -110,11 +212,30 @@ def describe(target: str, prompt: str):
 @cli.command()
 # add optional argument that allows for user to type anything
 @click.argument("args", nargs=-1)  # This allows for any number of additional arguments
-def dev(args):
+@click.option(
+    "--session",
+    help="Name of the session to checkpoint to. Defaults to a new timestamped name.",
+)
+@click.option(
+    "--resume",
+    help="Resume a checkpointed session by name, without replaying completions.",
+)
+@click.option(
+    "--sessions-dir",
+    default=DEFAULT_SESSIONS_DIR,
+    show_default=True,
+    envvar="SOCRA_SESSIONS_DIR",
+    type=click.Path(file_okay=False),
+    help="Directory of session checkpoint files.",
+)
+def dev(args, session: str, resume: str, sessions_dir: str):
     prompt = " ".join(args)
+    if session and resume:
+        raise click.UsageError("--session and --resume are mutually exclusive.")
 
     agent = Agent(
         key="software_developer",
+        before_run=[ContextCompactor()],
         name="Software Developer Agent",
         description="An agent that can develop software on the local file system. Especially good with file manipulation.",
         children=[
@@ -141,17 +262,26 @@ def dev(args):
         ],
     )
 
-    ctx = Context()
+    if resume:
+        checkpointer = SessionCheckpointer.for_session(resume, sessions_dir)
+        if not checkpointer.exists:
+            raise click.UsageError(f"No session '{resume}' in {sessions_dir}.")
+        ctx = checkpointer.load()
+        print(f"Resumed session {resume} at step {checkpointer.steps}")
+    else:
+        session = session or datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        checkpointer = SessionCheckpointer.for_session(session, sessions_dir)
+        ctx = Context()
+        print(f"Session {session}, resume with: socra dev --resume {session}")
+
     if prompt:
         ctx.add_message(Message(role=Message.Role.HUMAN, content=prompt))
 
-    idx = 0
-    while idx < 20:
+    idx = checkpointer.steps
+    while idx < 20 and not ctx.terminated:
         idx += 1
         agent.run(ctx)
-
-        if ctx.terminated:
-            break
+        checkpointer.save(ctx)
 
         # if last invocation was do_nothing, break
         # if ctx.history[-1] == "finish":
@@ -160,8 +290,60 @@ def dev(args):
         #     break
 
     print("Cost")
-    print("Num completions:", len(ctx.completions))
+    print("Num completions:", ctx.completion_count)
     print(ctx.token_cost)
+    for label, breakdown in [
+        ("model", ctx.costs.by_model()),
+        ("agent", ctx.costs.by_agent()),
+    ]:
+        for key, cost in breakdown.items():
+            print(f"  {label} {key}: ${cost.total:.6f}")
+    if ctx.costs.saved_calls:
+        print(
+            f"Saved: ${ctx.costs.saved_dollars():.6f} over "
+            f"{ctx.costs.saved_calls} cached or shared completions"
+        )
+    print(
+        f"Prompt cache: {ctx.token_usage.cached_input}/{ctx.token_usage.input} "
+        f"input tokens cached ({ctx.token_usage.cache_hit_ratio:.1%})"
+    )
+
+    cache = get_default_cache()
+    if cache is not None:
+        print("Cache:", cache.stats)
+
+    print_latency(ctx)
+
+    if ctx.compactions:
+        print(
+            f"Compaction: {len(ctx.compactions)} compactions, "
+            f"{ctx.tokens_saved} tokens saved"
+        )
+
+
+def print_latency(ctx: Context):
+    """
+    Print the latency breakdown of the context's completions, per agent step.
+    """
+    print("Latency")
+    print(
+        f"{'step':<28} {'calls':>5} {'wall (s)':>9} {'ttft (s)':>9} "
+        f"{'tok/s':>7} {'overhead (ms)':>14}"
+    )
+    steps = ctx.latency_by_step()
+    for step, summary in [*steps.items(), ("total", ctx.latency)]:
+        print(
+            f"{step:<28} {summary.completions:>5} {summary.wall_time:>9.2f} "
+            f"{summary.average_ttft:>9.2f} {summary.tokens_per_second:>7.1f} "
+            f"{summary.overhead * 1000:>14.1f}"
+        )
+
+    phases = ", ".join(
+        f"{phase} {seconds * 1000:.1f}ms"
+        for phase, seconds in sorted(ctx.latency.phases.items())
+    )
+    if phases:
+        print("Overhead:", phases)
 
 
 def await_user_input(context: Context):
@@ -175,35 +357,24 @@ def determine_user_input_prefix(context: Context) -> str:
     """
     Determine the user input prefix prompt.
     """
-    model = socra.Model.for_key(socra.Model.Key.GPT_4O_MINI_2024_07_18)
     spinner = Spinner(message="Determining user input prefix")
 
     @throttle(0.1)
     def on_chunk(chunk):
         spinner.spin()
 
+    prompt = context.prompt(determine_user_input_prefix_prompt)
+    model = route(CallClass.EXTRACTION, prompt)
     cr = socra.Completion(
         model,
-        socra.Prompt(
-            messages=[
-                *context.messages,
-                socra.Message(
-                    role=socra.Message.Role.HUMAN,
-                    content=determine_user_input_prefix_prompt,
-                ),
-            ]
-        ),
+        prompt,
         on_chunk=on_chunk,
+        schema=UserInputPayload,
     )
     resp = cr.process()
     context.track_completion(cr)
 
-    content = resp.content
-    dct = parse_json(content)
-    if "prompt" not in dct:
-        raise ValueError("Missing 'prompt' in response")
-
-    prompt = dct["prompt"]
+    prompt = resp.parsed.prompt
     thought = f"Determined user input prefix: {prompt}"
     spinner.message = thought
     spinner.finish()
@@ -234,41 +405,33 @@ def do_nothing(context: Context):
     )
 
 
+class RespondPayload(socra.Schema):
+    response: str
+
+
 def respond(context: Context):
     """
     Respond to the user with a message.
     """
-    prompt = socra.Prompt(
-        messages=[
-            *context.messages,
-            socra.Message(
-                role=socra.Message.Role.HUMAN,
-                content=respond_prompt,
-            ),
-        ]
-    )
-    model = socra.Model.for_key(socra.Model.Key.GPT_4O_MINI_2024_07_18)
+    prompt = context.prompt(respond_prompt)
     spinner = Spinner(message="Responding to the user")
 
     @throttle(0.1)
     def on_chunk(chunk):
         spinner.spin()
 
+    model = route(CallClass.EXTRACTION, prompt)
     cr = socra.Completion(
         model,
         prompt,
         # mock_response=inputs.mock_response,
         on_chunk=on_chunk,
+        schema=RespondPayload,
     )
     resp = cr.process()
     context.track_completion(cr)
 
-    content = resp.content
-    dct = parse_json(content)
-    if "response" not in dct:
-        raise ValueError("Missing 'response' in response")
-
-    response = dct["response"]
+    response = resp.parsed.response
     thought = f"Responded to the user: {response}"
     spinner.message = thought
     spinner.finish()
@@ -1,13 +1,13 @@
 import os
-import typing
 import sys
 
 from socra.commands.command import Command
+from socra.completions import ChunkPayload, Completion
+from socra.messages import Message
+from socra.models.router import CallClass, route
+from socra.prompts import Prompt
 from socra.schemas.base import Schema
 from socra.io.files import read_file
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import BaseMessage, SystemMessage, HumanMessage
-from langchain_core.messages.ai import AIMessageChunk
 
 from socra.utils.decorators import throttle
 from socra.utils.spinner import Spinner
@@ -18,11 +18,6 @@ class DescribeConfig(Schema):
     prompt: str | None = None
 
 
-class ChunkPayload(Schema):
-    chunk: str
-    aggregate: str
-
-
 class Describe(Command):
     Config = DescribeConfig
 
@@ -36,17 +31,17 @@ class Describe(Command):
         file_contents = read_file(self.config.target)
 
         # next, let's execute a prompt to improve the contents
-        # TODO: instantiate llm elsewhere and make it super configurable
-        llm = ChatOpenAI(model="gpt-4o-mini")
-
-        messages: typing.List[BaseMessage] = [
-            SystemMessage(
-                content=system_prompt.format(
-                    prompt=self.config.prompt if self.config.prompt else ""
-                )
-            ),
-            HumanMessage(content=file_contents),
-        ]
+        prompt = Prompt(
+            messages=[
+                Message(
+                    role=Message.Role.SYSTEM,
+                    content=system_prompt.format(
+                        prompt=self.config.prompt if self.config.prompt else ""
+                    ),
+                ),
+                Message(role=Message.Role.HUMAN, content=file_contents),
+            ]
+        )
 
         spinner = Spinner(message=f"Describe {self.config.target}")
 
@@ -54,21 +49,15 @@ class Describe(Command):
         def on_chunk(stream_chunk: ChunkPayload):
             spinner.spin()
 
-        aggregate: AIMessageChunk = None
-        for chunk in llm.stream(messages):
-            aggregate: AIMessageChunk = (
-                chunk if aggregate is None else aggregate + chunk
-            )
-            stream_chunk = ChunkPayload(
-                chunk=chunk.content,
-                aggregate=aggregate.content,
-            )
+        # a description summarizes the file, which a small model does well
+        model = route(CallClass.SUMMARY, prompt, output_tokens=1_024)
 
-            on_chunk(stream_chunk)
+        # the completion reuses the shared, pooled client for the model
+        resp = Completion(model, prompt, on_chunk=on_chunk).process()
 
         spinner.finish()
 
-        content = aggregate.content
+        content = resp.content
 
         if content.startswith("```"):
             # remove first and last line
@@ -1,3 +1,40 @@
 from socra.completions.base import Completion, ChunkPayload, MockResponse
+from socra.completions.stream import StopCompletion
+from socra.completions.batch import BatchItem, BatchOutput
+from socra.completions.cache import CompletionCache, configure_cache
+from socra.completions.cassette import Cassette, use_cassette
+from socra.completions.clients import ClientConfig, configure_clients
+from socra.completions.log import CompletionLog, configure_completion_log
+from socra.completions.fake_server import FakeLLMServer, FakeServerConfig
+from socra.completions.singleflight import SingleFlight, configure_single_flight
+from socra.completions.scheduler import (
+    RateLimit,
+    RetryConfig,
+    Scheduler,
+    configure_scheduler,
+)
 
-__all__ = ["Completion", "ChunkPayload", "MockResponse"]
+__all__ = [
+    "Completion",
+    "ChunkPayload",
+    "MockResponse",
+    "StopCompletion",
+    "BatchItem",
+    "BatchOutput",
+    "CompletionCache",
+    "configure_cache",
+    "Cassette",
+    "use_cassette",
+    "ClientConfig",
+    "configure_clients",
+    "CompletionLog",
+    "configure_completion_log",
+    "FakeLLMServer",
+    "FakeServerConfig",
+    "RateLimit",
+    "RetryConfig",
+    "Scheduler",
+    "configure_scheduler",
+    "SingleFlight",
+    "configure_single_flight",
+]
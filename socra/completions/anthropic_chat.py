@@ -0,0 +1,41 @@
+import typing
+
+import anthropic
+from langchain_anthropic import ChatAnthropic
+from langchain_core.pydantic_v1 import root_validator
+
+
+class PooledChatAnthropic(ChatAnthropic):
+    """
+    `ChatAnthropic` that sends requests through the given pooled HTTP clients.
+
+    langchain-anthropic 0.1 creates its own Anthropic clients, each with a
+    new connection pool. They are re-created here around `http_client` and
+    `http_async_client`, with the same settings.
+    """
+
+    http_client: typing.Any = None
+    http_async_client: typing.Any = None
+
+    @root_validator()
+    def use_http_clients(cls, values: typing.Dict) -> typing.Dict:
+        client_params = {
+            "api_key": values["anthropic_api_key"].get_secret_value(),
+            "base_url": values["anthropic_api_url"],
+            "max_retries": values["max_retries"],
+            "default_headers": values.get("default_headers"),
+        }
+        # as ChatAnthropic, a timeout <= 0 leaves the client's default
+        timeout = values["default_request_timeout"]
+        if timeout is None or timeout > 0:
+            client_params["timeout"] = timeout
+
+        if values.get("http_client") is not None:
+            values["_client"] = anthropic.Client(
+                **client_params, http_client=values["http_client"]
+            )
+        if values.get("http_async_client") is not None:
+            values["_async_client"] = anthropic.AsyncClient(
+                **client_params, http_client=values["http_async_client"]
+            )
+        return values
@@ -1,11 +1,25 @@
 from socra.schemas import Schema
 from socra.models import Model
+from socra.parsers import parse_json
 from socra.prompts import Prompt
+import time
 import typing
 
-from langchain_openai import ChatOpenAI
-
-from langchain_core.messages.ai import AIMessageChunk
+from langchain_core.messages.ai import AIMessage
+from socra.completions.batch import (
+    BatchItem,
+    BatchOutput,
+    aprocess_many,
+    process_many,
+)
+from socra.completions.cache import CompletionCache, get_default_cache
+from socra.completions.cassette import CassetteEntry, get_cassette
+from socra.completions.clients import aget_llm, get_llm, supports_json_schema
+from socra.completions.scheduler import get_scheduler
+from socra.completions.singleflight import Publish, get_single_flight
+from socra.completions.stream import ChunkPayload, StopCompletion, StreamAggregator
+from socra.completions.structured import response_format, schema_digest
+from socra.completions.timing import CompletionTimings
 from socra.completions.usage import TokenUsage, TokenCost
 
 
@@ -20,10 +34,37 @@ class CompletionResponseOutput(Schema):
     usage: TokenUsage
     cost: TokenCost
 
+    cached: bool = False
+    """
+    Whether the response was served from the completion cache.
+    """
+
+    stopped: bool = False
+    """
+    Whether the stream was stopped early by `on_chunk` raising `StopCompletion`.
+    Content is then partial, and usage is counted locally.
+    """
+
+    shared: bool = False
+    """
+    Whether the response was shared from an identical in-flight request
+    made by another caller (see `SingleFlight`).
+    """
+
+    timings: CompletionTimings = CompletionTimings()
+
+    parsed: typing.Optional[typing.Any] = None
+    """
+    Response validated against the completion's `schema`, if one was given.
+    `None` for stopped streams, whose content is partial.
+    """
 
-class ChunkPayload(Schema):
-    chunk: str
-    aggregate: str
+
+# resolve the batch schemas' forward reference to CompletionResponseOutput
+BatchItem.model_rebuild(
+    _types_namespace={"CompletionResponseOutput": CompletionResponseOutput}
+)
+BatchOutput.model_rebuild()
 
 
 class Completion:
@@ -33,59 +74,410 @@ class Completion:
         prompt: Prompt,
         mock_response: MockResponse = None,
         on_chunk: typing.Optional[typing.Callable[[ChunkPayload], None]] = None,
+        cache: typing.Optional[CompletionCache] = None,
+        use_cache: bool = True,
+        schema: typing.Optional[typing.Type[Schema]] = None,
     ):
+        """
+        If `schema` is given, the provider is asked for a response matching its
+        JSON schema (structured outputs), and the validated object is returned
+        as `response.parsed`.
+        """
         self.model = model
         self.prompt = prompt
+        self.schema = schema
         self._mock_response = mock_response
         self.on_chunk = on_chunk
 
+        self._cache = cache
+        self._use_cache = use_cache
+
         self.response: CompletionResponseOutput = None
 
+        self.timings = CompletionTimings()
+        if prompt.build_time:
+            self.timings.add_phase("prompt_build", prompt.build_time)
+
+        self._cache_key: typing.Optional[str] = None
+        self._process_started_at: typing.Optional[float] = None
+        self._started_at: typing.Optional[float] = None
+        self._chunk_log: typing.List[typing.Tuple[float, str]] = []
+        self._publish: typing.Optional[Publish] = None
+        self._received_chunks = False
+        self._stopped_following = False
+        self._stopped = False
+
+    @staticmethod
+    def process_many(
+        completions: typing.Sequence["Completion"], max_concurrency: int = 8
+    ) -> "BatchOutput":
+        """
+        Process many completions concurrently, preserving input order.
+        See `socra.completions.batch.process_many`.
+        """
+        return process_many(completions, max_concurrency=max_concurrency)
+
+    @staticmethod
+    async def aprocess_many(
+        completions: typing.Sequence["Completion"], max_concurrency: int = 8
+    ) -> "BatchOutput":
+        """
+        Async counterpart of `process_many()`.
+        """
+        return await aprocess_many(completions, max_concurrency=max_concurrency)
+
+    @property
+    def is_mocked(self) -> bool:
+        return self._mock_response is not None and self._mock_response.enabled
+
+    @property
+    def cache(self) -> typing.Optional[CompletionCache]:
+        if not self._use_cache:
+            return None
+        return self._cache if self._cache is not None else get_default_cache()
+
+    @property
+    def cache_key(self) -> str:
+        """
+        Content-addressed key for this request: model key + prompt digest.
+        """
+        if self._cache_key is None:
+            with self.timings.measure("digest"):
+                key = f"{self.model.id}:{self.prompt.digest()}"
+                if self.schema is not None:
+                    key += f":{schema_digest(self.schema)}"
+                self._cache_key = key
+        return self._cache_key
+
+    def parse_json(self) -> dict:
+        """
+        Parse the response content as JSON, timed as the "parse" phase.
+        """
+        with self.timings.measure("parse"):
+            return parse_json(self.response.content)
+
     def process(self) -> CompletionResponseOutput:
-        if self._mock_response and self._mock_response.enabled:
-            content = self._mock_response.content
-            token_usage = self._mock_response.usage
-        else:
-            llm = ChatOpenAI(model=self.model.key.value)
+        self._start_processing()
+        local = self._local_response()
+        if local is not None:
+            return local
+
+        single_flight = get_single_flight()
+        if single_flight is None:
+            return self._upstream_response(*self._scheduled_request())
+
+        (content, token_usage), shared = single_flight.do(
+            self.cache_key,
+            self._lead_request,
+            on_chunk=self._follow_chunk if self.on_chunk is not None else None,
+        )
+        return self._flight_response(content, token_usage, shared)
+
+    async def aprocess(self) -> CompletionResponseOutput:
+        """
+        Async counterpart of `process()`. Uses the non-blocking langchain
+        APIs so many completions can be awaited on a single event loop.
+        """
+        self._start_processing()
+        local = self._local_response()
+        if local is not None:
+            return local
+
+        single_flight = get_single_flight()
+        if single_flight is None:
+            return self._upstream_response(*await self._ascheduled_request())
+
+        (content, token_usage), shared = await single_flight.ado(
+            self.cache_key,
+            self._alead_request,
+            on_chunk=self._follow_chunk if self.on_chunk is not None else None,
+        )
+        return self._flight_response(content, token_usage, shared)
+
+    def _scheduled_request(self) -> typing.Tuple[str, TokenUsage]:
+        scheduler = get_scheduler()
+        if scheduler is None:
+            return self._request()
+
+        estimated_tokens = self.prompt.estimate_tokens(self.model)
+        content, token_usage = scheduler.run(
+            self.model,
+            estimated_tokens,
+            self._request,
+            # never retry once chunks were handed to on_chunk
+            retryable=lambda: not self._chunk_log,
+        )
+        scheduler.settle(self.model, estimated_tokens, token_usage.total)
+        return content, token_usage
+
+    async def _ascheduled_request(self) -> typing.Tuple[str, TokenUsage]:
+        scheduler = get_scheduler()
+        if scheduler is None:
+            return await self._arequest()
+
+        estimated_tokens = self.prompt.estimate_tokens(self.model)
+        content, token_usage = await scheduler.arun(
+            self.model,
+            estimated_tokens,
+            self._arequest,
+            retryable=lambda: not self._chunk_log,
+        )
+        scheduler.settle(self.model, estimated_tokens, token_usage.total)
+        return content, token_usage
+
+    def _lead_request(self, publish: Publish) -> typing.Tuple[str, TokenUsage]:
+        # chunks are published to every caller waiting on this request,
+        # this completion's own on_chunk included
+        self._publish = publish
+        return self._scheduled_request()
+
+    async def _alead_request(self, publish: Publish) -> typing.Tuple[str, TokenUsage]:
+        self._publish = publish
+        return await self._ascheduled_request()
+
+    def _follow_chunk(self, payload: ChunkPayload):
+        self._received_chunks = True
+        try:
+            self.on_chunk(payload)
+        except StopCompletion:
+            self._stopped_following = True
+            raise
+
+    def _flight_response(
+        self, content: str, token_usage: TokenUsage, shared: bool
+    ) -> CompletionResponseOutput:
+        if not shared:
+            return self._upstream_response(content, token_usage)
+
+        # the leading request did not stream, deliver the content in one chunk
+        if not self._received_chunks:
+            self._replay_chunks([(0.0, content)])
+
+        # callers only share a stopped stream's content once they stopped
+        # reading it themselves
+        self._stopped = self._stopped_following
+
+        response = self._set_response(content, token_usage, shared=True)
+        self._record(content, token_usage)
+        return response
+
+    def _request(self) -> typing.Tuple[str, TokenUsage]:
+        self._start_request()
+        llm = self._bind(get_llm(self.model))
+        with self.timings.measure("conversion"):
             prompt_messages = self.prompt.to_langchain()
 
-            if self.on_chunk is not None:
-                aggregate = None
-                for chunk in llm.stream(prompt_messages, stream_usage=True):
-                    aggregate: AIMessageChunk = (
-                        chunk if aggregate is None else aggregate + chunk
-                    )
-                    stream_chunk = ChunkPayload(
-                        chunk=chunk.content,
-                        aggregate=aggregate.content,
-                    )
-
-                    self.on_chunk(stream_chunk)
-
-                content = aggregate.content
-                token_usage = TokenUsage(
-                    input=aggregate.usage_metadata["input_tokens"],
-                    output=aggregate.usage_metadata["output_tokens"],
-                    total=aggregate.usage_metadata["total_tokens"],
-                )
-            else:
-                response = llm.invoke(prompt_messages)
-                content = response.content
-                token_usage = TokenUsage(
-                    input=response.response_metadata["token_usage"]["prompt_tokens"],
-                    output=response.response_metadata["token_usage"][
-                        "completion_tokens"
-                    ],
-                    total=response.response_metadata["token_usage"]["total_tokens"],
-                )
+        if self.on_chunk is not None:
+            aggregator = StreamAggregator()
+            stream = llm.stream(prompt_messages, stream_usage=True)
+            try:
+                for chunk in stream:
+                    self._emit(aggregator.add(chunk))
+            except StopCompletion:
+                # closing the stream closes the underlying HTTP response
+                stream.close()
+                self._end_request()
+                return aggregator.content, self._stopped_usage(aggregator.content)
 
+            self._end_request()
+            return aggregator.content, aggregator.usage
+
+        response = llm.invoke(prompt_messages)
+        self._end_request()
+        return response.content, _usage_from_response(response)
+
+    async def _arequest(self) -> typing.Tuple[str, TokenUsage]:
+        self._start_request()
+        llm = self._bind(aget_llm(self.model))
+        with self.timings.measure("conversion"):
+            prompt_messages = self.prompt.to_langchain()
+
+        if self.on_chunk is not None:
+            aggregator = StreamAggregator()
+            stream = llm.astream(prompt_messages, stream_usage=True)
+            try:
+                async for chunk in stream:
+                    self._emit(aggregator.add(chunk))
+            except StopCompletion:
+                await stream.aclose()
+                self._end_request()
+                return aggregator.content, self._stopped_usage(aggregator.content)
+
+            self._end_request()
+            return aggregator.content, aggregator.usage
+
+        response = await llm.ainvoke(prompt_messages)
+        self._end_request()
+        return response.content, _usage_from_response(response)
+
+    def _bind(self, llm):
+        if self.schema is None or not supports_json_schema(self.model):
+            # other providers rely on the prompt's instructions, and the
+            # response is still validated against the schema
+            return llm
+        return llm.bind(response_format=response_format(self.schema))
+
+    def _parse(self, content: str) -> typing.Optional[Schema]:
+        if self.schema is None or self._stopped:
+            return None
+        with self.timings.measure("parse"):
+            return self.schema.model_validate(parse_json(content))
+
+    def _stopped_usage(self, content: str) -> TokenUsage:
+        """
+        Usage for a stream stopped early. The provider only reports usage at
+        the end of a stream, so it is counted locally.
+        """
+        self._stopped = True
+        input_tokens = self.prompt.count_tokens(self.model)
+        output_tokens = self.model.count_tokens(content)
+        return TokenUsage(
+            input=input_tokens,
+            output=output_tokens,
+            total=input_tokens + output_tokens,
+        )
+
+    def _local_response(self) -> typing.Optional[CompletionResponseOutput]:
+        """
+        Response that can be served without calling the provider:
+        a mock response, a cassette replay or a cache hit.
+        """
+        if self.is_mocked:
+            return self._set_response(
+                self._mock_response.content, self._mock_response.usage
+            )
+
+        cassette = get_cassette()
+        if cassette is not None and cassette.replaying:
+            entry = cassette.replay(self.cache_key)
+            self._stopped = entry.stopped
+            self._replay_chunks(entry.chunks or [(0.0, entry.content)])
+            return self._set_response(entry.content, entry.usage)
+
+        cache = self.cache
+        if cache is None:
+            return None
+
+        cached = cache.get(self.cache_key)
+        if cached is None:
+            return None
+
+        # streaming callers still receive the content through on_chunk
+        self._replay_chunks([(0.0, cached.content)])
+        response = self._set_response(cached.content, cached.usage, cached=True)
+        self._record(cached.content, cached.usage)
+        return response
+
+    def _upstream_response(
+        self, content: str, token_usage: TokenUsage
+    ) -> CompletionResponseOutput:
+        # validated first, so content failing the schema is neither cached
+        # nor recorded and a retry reaches the provider again
+        response = self._set_response(content, token_usage)
+
+        # partial responses of stopped streams are never cached
+        cache = self.cache
+        if cache is not None and not self._stopped:
+            cache.set(self.cache_key, self.model.id, content, token_usage)
+
+        self._record(content, token_usage)
+        return response
+
+    def _start_processing(self):
+        self._process_started_at = time.monotonic()
+        self.timings.started_at = time.time()
+
+    def _start_request(self):
+        self._started_at = time.monotonic()
+        self._chunk_log = []
+        self.timings.ttft = None
+
+    def _end_request(self):
+        self.timings.request_time = time.monotonic() - self._started_at
+
+    def _emit(self, payload: ChunkPayload):
+        offset = time.monotonic() - self._started_at
+        if not self._chunk_log:
+            self.timings.ttft = offset
+        self._chunk_log.append((offset, payload.chunk))
+        if self._publish is not None:
+            self._publish(payload.chunk)
+        else:
+            self.on_chunk(payload)
+
+    def _replay_chunks(self, chunks: typing.List[typing.Tuple[float, str]]):
+        if self.on_chunk is None:
+            return
+
+        parts: typing.List[str] = []
+        for _, text in chunks:
+            parts.append(text)
+            try:
+                self.on_chunk(ChunkPayload(chunk=text, parts=parts))
+            except StopCompletion:
+                return
+
+    def _record(self, content: str, token_usage: TokenUsage):
+        cassette = get_cassette()
+        if cassette is None or not cassette.recording:
+            return
+
+        cassette.record(
+            CassetteEntry(
+                key=self.cache_key,
+                model=self.model.id,
+                content=content,
+                usage=token_usage,
+                chunks=self._chunk_log,
+                latency=(
+                    time.monotonic() - self._started_at if self._started_at else 0.0
+                ),
+                stopped=self._stopped,
+            )
+        )
+
+    def _set_response(
+        self,
+        content: str,
+        token_usage: TokenUsage,
+        cached: bool = False,
+        shared: bool = False,
+    ) -> CompletionResponseOutput:
         # next, format response
-        token_cost = TokenCost.for_model(self.model, token_usage)
+        if cached or shared:
+            # served without an API call of its own
+            token_cost = TokenCost(input=0.0, output=0.0, total=0.0)
+        else:
+            token_cost = TokenCost.for_model(self.model, token_usage)
+
+        self.timings.output_tokens = token_usage.output
+        if self._process_started_at is not None:
+            self.timings.wall_time = time.monotonic() - self._process_started_at
+
+        parsed = self._parse(content)
 
         self.response = CompletionResponseOutput(
             content=content,
             usage=token_usage,
             cost=token_cost,
+            cached=cached,
+            shared=shared,
+            stopped=self._stopped,
+            timings=self.timings,
+            parsed=parsed,
         )
 
         return self.response
+
+
+def _usage_from_response(response: AIMessage) -> TokenUsage:
+    if not response.usage_metadata:
+        raise ValueError("Missing usage metadata in response")
+    usage = TokenUsage.from_usage_metadata(response.usage_metadata)
+
+    if not usage.cached_input:
+        # langchain-openai 0.1 leaves cached tokens out of `usage_metadata`
+        token_usage = response.response_metadata.get("token_usage") or {}
+        prompt_tokens_details = token_usage.get("prompt_tokens_details") or {}
+        usage.cached_input = prompt_tokens_details.get("cached_tokens") or 0
+    return usage
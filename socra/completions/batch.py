@@ -0,0 +1,102 @@
+import asyncio
+import typing
+from concurrent.futures import ThreadPoolExecutor
+
+from pydantic import ConfigDict
+
+from socra.completions.usage import TokenCost, TokenUsage
+from socra.schemas import Schema
+
+if typing.TYPE_CHECKING:
+    from socra.completions.base import Completion, CompletionResponseOutput
+
+
+class BatchItem(Schema):
+    """
+    Outcome of a single completion in a batch.
+    Exactly one of `response` or `error` is set.
+    """
+
+    model_config: ConfigDict = {
+        "arbitrary_types_allowed": True,
+    }
+
+    index: int
+    response: typing.Optional["CompletionResponseOutput"] = None
+    error: typing.Optional[Exception] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class BatchOutput(Schema):
+    """
+    Results of `Completion.process_many()`, in input order,
+    with aggregate usage and cost of the successful completions.
+    """
+
+    items: typing.List[BatchItem]
+    usage: TokenUsage
+    cost: TokenCost
+
+    @property
+    def responses(self) -> typing.List[typing.Optional["CompletionResponseOutput"]]:
+        return [item.response for item in self.items]
+
+    @property
+    def errors(self) -> typing.List[BatchItem]:
+        return [item for item in self.items if not item.ok]
+
+
+def process_many(
+    completions: typing.Sequence["Completion"], max_concurrency: int = 8
+) -> BatchOutput:
+    """
+    Process completions on a pool of at most `max_concurrency` worker threads.
+    A failing completion does not affect the others.
+    """
+
+    def run(index: int) -> BatchItem:
+        try:
+            return BatchItem(index=index, response=completions[index].process())
+        except Exception as e:
+            return BatchItem(index=index, error=e)
+
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as executor:
+        items = list(executor.map(run, range(len(completions))))
+
+    return _batch_output(items)
+
+
+async def aprocess_many(
+    completions: typing.Sequence["Completion"], max_concurrency: int = 8
+) -> BatchOutput:
+    """
+    Async counterpart of `process_many()`, with at most `max_concurrency`
+    completions in flight on the running event loop.
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def run(index: int) -> BatchItem:
+        async with semaphore:
+            try:
+                response = await completions[index].aprocess()
+                return BatchItem(index=index, response=response)
+            except Exception as e:
+                return BatchItem(index=index, error=e)
+
+    items = await asyncio.gather(*[run(i) for i in range(len(completions))])
+
+    return _batch_output(list(items))
+
+
+def _batch_output(items: typing.List[BatchItem]) -> BatchOutput:
+    usage = TokenUsage(input=0, output=0, total=0)
+    cost = TokenCost(input=0, output=0, total=0)
+    for item in items:
+        if item.ok:
+            usage += item.response.usage
+            cost += item.response.cost
+
+    return BatchOutput(items=items, usage=usage, cost=cost)
@@ -0,0 +1,197 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import typing
+
+from socra.completions.usage import TokenUsage
+from socra.schemas import Schema
+
+
+class CachedResponse(Schema):
+    content: str
+    usage: TokenUsage
+
+
+class CacheStats(Schema):
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class CompletionCache:
+    """
+    Persistent, content-addressed cache of completion responses, backed by SQLite.
+
+    Keys are derived from the model key and a canonical hash of the prompt
+    (see `Completion.cache_key`). Entries are evicted when older than
+    `max_age` seconds, and least-recently-used entries are evicted once the
+    stored content exceeds `max_bytes`.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = 256 * 1024 * 1024,
+        max_age: typing.Optional[float] = 30 * 24 * 60 * 60,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.stats = CacheStats()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS completions (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                content TEXT NOT NULL,
+                usage TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS completions_accessed_at "
+            "ON completions (accessed_at)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> typing.Optional[CachedResponse]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content, usage, created_at FROM completions WHERE key = ?",
+                (key,),
+            ).fetchone()
+
+            if row is not None and self._is_expired(row[2], now):
+                self._conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+                self._conn.commit()
+                self.stats.evictions += 1
+                row = None
+
+            if row is None:
+                self.stats.misses += 1
+                return None
+
+            self._conn.execute(
+                "UPDATE completions SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            self.stats.hits += 1
+
+        content, usage, _ = row
+        return CachedResponse(content=content, usage=TokenUsage(**json.loads(usage)))
+
+    def set(self, key: str, model: str, content: str, usage: TokenUsage):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completions "
+                "(key, model, content, usage, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    model,
+                    content,
+                    json.dumps(usage.model_dump()),
+                    len(content.encode("utf-8")),
+                    now,
+                    now,
+                ),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def evict(self):
+        """
+        Remove expired entries, then least-recently-used entries
+        until the cache fits within `max_bytes`.
+        """
+        with self._lock:
+            self._evict(time.time())
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM completions")
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _is_expired(self, created_at: float, now: float) -> bool:
+        return self.max_age is not None and created_at < now - self.max_age
+
+    def _evict(self, now: float):
+        if self.max_age is not None:
+            cursor = self._conn.execute(
+                "DELETE FROM completions WHERE created_at < ?", (now - self.max_age,)
+            )
+            self.stats.evictions += max(cursor.rowcount, 0)
+
+        (total_size,) = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM completions"
+        ).fetchone()
+        if total_size <= self.max_bytes:
+            return
+
+        rows = self._conn.execute(
+            "SELECT key, size FROM completions ORDER BY accessed_at ASC"
+        )
+        evicted_keys = []
+        for key, size in rows:
+            if total_size <= self.max_bytes:
+                break
+            evicted_keys.append((key,))
+            total_size -= size
+
+        self._conn.executemany("DELETE FROM completions WHERE key = ?", evicted_keys)
+        self.stats.evictions += len(evicted_keys)
+
+
+_default_cache: typing.Optional[CompletionCache] = None
+_default_cache_loaded = False
+
+
+def configure_cache(
+    path: typing.Optional[str], **kwargs
+) -> typing.Optional[CompletionCache]:
+    """
+    Set the process-wide completion cache used when a `Completion`
+    is not given one explicitly. Pass `None` to disable caching.
+    """
+    global _default_cache, _default_cache_loaded
+    if _default_cache is not None:
+        _default_cache.close()
+    _default_cache = CompletionCache(path, **kwargs) if path else None
+    _default_cache_loaded = True
+    return _default_cache
+
+
+def get_default_cache() -> typing.Optional[CompletionCache]:
+    """
+    The process-wide completion cache. Enabled by the
+    SOCRA_COMPLETION_CACHE environment variable or `configure_cache()`.
+    """
+    global _default_cache_loaded
+    if not _default_cache_loaded:
+        configure_cache(os.environ.get("SOCRA_COMPLETION_CACHE"))
+        _default_cache_loaded = True
+    return _default_cache
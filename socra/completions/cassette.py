@@ -0,0 +1,139 @@
+import collections
+import json
+import os
+import threading
+import typing
+from enum import Enum
+
+from socra.completions.usage import TokenUsage
+from socra.schemas import Schema
+
+
+class CassetteMode(Enum):
+    RECORD = "record"
+    REPLAY = "replay"
+
+
+class CassetteEntry(Schema):
+    """
+    A recorded completion request/response pair.
+    """
+
+    key: str
+    """
+    Request key, see `Completion.cache_key`.
+    """
+
+    model: str
+    content: str
+    usage: TokenUsage
+
+    chunks: typing.List[typing.Tuple[float, str]] = []
+    """
+    Streamed chunks as (seconds since request start, text).
+    Empty for non-streaming requests.
+    """
+
+    latency: float = 0.0
+    """
+    Wall time of the original request, in seconds.
+    """
+
+    stopped: bool = False
+    """
+    Whether the stream was stopped early, see `CompletionResponseOutput.stopped`.
+    Content is then partial, and replayed without being parsed.
+    """
+
+
+class Cassette:
+    """
+    Records every completion of a run to a JSONL file, or replays a recorded
+    run offline, deterministically and without network latency.
+
+    In replay mode, identical requests are answered in the order they were
+    recorded. Once a request's recordings are used up, its last recording is
+    reused.
+    """
+
+    Mode: typing.ClassVar = CassetteMode
+
+    def __init__(self, path: str, mode: CassetteMode):
+        self.path = path
+        self.mode = mode
+
+        self._lock = threading.Lock()
+        self._entries: typing.Dict[str, typing.Deque[CassetteEntry]] = {}
+        self._last: typing.Dict[str, CassetteEntry] = {}
+
+        if mode == CassetteMode.REPLAY:
+            self._load()
+        else:
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            # start a fresh recording
+            open(path, "w", encoding="utf-8").close()
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == CassetteMode.RECORD
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == CassetteMode.REPLAY
+
+    def record(self, entry: CassetteEntry):
+        line = json.dumps(entry.model_dump(mode="json"), ensure_ascii=False)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(line + "\n")
+
+    def replay(self, key: str) -> CassetteEntry:
+        with self._lock:
+            queue = self._entries.get(key)
+            if queue:
+                entry = queue.popleft()
+                self._last[key] = entry
+                return entry
+
+            if key in self._last:
+                return self._last[key]
+
+        raise ValueError(f"No recorded completion for request '{key}' in {self.path}")
+
+    def _load(self):
+        with open(self.path, "r", encoding="utf-8") as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                entry = CassetteEntry(**json.loads(line))
+                self._entries.setdefault(entry.key, collections.deque()).append(entry)
+
+
+_cassette: typing.Optional[Cassette] = None
+_cassette_loaded = False
+
+
+def use_cassette(
+    path: typing.Optional[str], mode: CassetteMode = CassetteMode.REPLAY
+) -> typing.Optional[Cassette]:
+    """
+    Record or replay all completions of this process. Pass `None` to disable.
+    """
+    global _cassette, _cassette_loaded
+    _cassette = Cassette(path, mode) if path else None
+    _cassette_loaded = True
+    return _cassette
+
+
+def get_cassette() -> typing.Optional[Cassette]:
+    """
+    The active cassette, if any. Enabled by `use_cassette()` or the
+    SOCRA_CASSETTE and SOCRA_CASSETTE_MODE (record/replay) environment variables.
+    """
+    global _cassette_loaded
+    if not _cassette_loaded:
+        path = os.environ.get("SOCRA_CASSETTE")
+        mode = CassetteMode(os.environ.get("SOCRA_CASSETTE_MODE", "replay"))
+        use_cassette(path, mode)
+    return _cassette
@@ -0,0 +1,314 @@
+import asyncio
+import atexit
+import os
+import threading
+import typing
+import weakref
+
+import httpx
+from langchain_core.language_models.chat_models import BaseChatModel
+
+from socra.completions.scheduler import get_scheduler
+from socra.constants import Constants
+from socra.models import Model
+from socra.schemas import Schema
+
+
+class ClientConfig(Schema):
+    """
+    Connection pool and timeout settings shared by every LLM client.
+    """
+
+    max_connections: int = 100
+    """
+    Maximum number of concurrent connections per provider.
+    """
+
+    max_keepalive_connections: int = 20
+    """
+    Maximum number of idle connections kept alive per provider.
+    """
+
+    keepalive_expiry: float = 30.0
+    """
+    Seconds an idle connection is kept in the pool.
+    """
+
+    timeout: float = 120.0
+    """
+    Total request timeout, in seconds.
+    """
+
+    connect_timeout: float = 10.0
+    """
+    Connection timeout, in seconds.
+    """
+
+    base_url: typing.Optional[str] = None
+    """
+    Base URL of an OpenAI-compatible API, e.g. a local `socra fake-server`.
+    Defaults to the SOCRA_LLM_BASE_URL environment variable, if set.
+    """
+
+    api_key: typing.Optional[str] = None
+    """
+    API key to send to `base_url`. Defaults to the provider's environment variable.
+    """
+
+    max_retries: int = 2
+    """
+    Retries performed by the provider client itself. Clients don't retry
+    while a `Scheduler` is configured, which retries rate-limit errors.
+    """
+
+    def client_retries(self) -> int:
+        return 0 if get_scheduler() is not None else self.max_retries
+
+    def resolved_base_url(self) -> typing.Optional[str]:
+        return self.base_url or os.environ.get("SOCRA_LLM_BASE_URL")
+
+    def limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+    def timeouts(self) -> httpx.Timeout:
+        return httpx.Timeout(self.timeout, connect=self.connect_timeout)
+
+
+class ClientRegistry:
+    """
+    Process-wide registry of LLM clients, keyed by provider and model.
+
+    Clients of the same provider share one pooled HTTP client, so
+    keep-alive connections and TLS sessions survive across completions.
+    Async clients are bound to the event loop they were created on, and
+    closed when that loop shuts down (e.g. at the end of `asyncio.run()`),
+    or by `aclose()`.
+    """
+
+    def __init__(self, config: typing.Optional[ClientConfig] = None):
+        self.config = config or ClientConfig()
+        self._lock = threading.Lock()
+        self._http_clients: typing.Dict[Constants.AI.Provider, httpx.Client] = {}
+        self._llms: typing.Dict[typing.Tuple, BaseChatModel] = {}
+        self._loop_clients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+    def configure(self, config: ClientConfig):
+        """
+        Replace the client configuration. Existing clients are closed and
+        re-created lazily with the new settings.
+        """
+        with self._lock:
+            self._close()
+            self.config = config
+
+    def get(self, model: Model) -> BaseChatModel:
+        """
+        Get the shared client for a model, for use with blocking calls.
+        """
+        key = (model.provider, model.key)
+        llm = self._llms.get(key)
+        if llm is not None:
+            return llm
+
+        with self._lock:
+            llm = self._llms.get(key)
+            if llm is None:
+                http_client = self._http_clients.get(model.provider)
+                if http_client is None:
+                    http_client = httpx.Client(
+                        limits=self.config.limits(),
+                        timeout=self.config.timeouts(),
+                    )
+                    self._http_clients[model.provider] = http_client
+
+                llm = self._build(model, http_client=http_client)
+                self._llms[key] = llm
+            return llm
+
+    def aget(self, model: Model) -> BaseChatModel:
+        """
+        Get the shared client for a model, for use with async calls
+        on the currently running event loop.
+        """
+        loop = asyncio.get_running_loop()
+        key = (model.provider, model.key)
+        loop_clients = self._loop_clients.get(loop)
+        if loop_clients is not None:
+            llm = loop_clients.llms.get(key)
+            if llm is not None:
+                return llm
+
+        with self._lock:
+            loop_clients = self._loop_clients.get(loop)
+            if loop_clients is None:
+                loop_clients = _LoopClients(loop)
+                self._loop_clients[loop] = loop_clients
+
+            llm = loop_clients.llms.get(key)
+            if llm is None:
+                http_client = loop_clients.http_clients.get(model.provider)
+                if http_client is None:
+                    http_client = httpx.AsyncClient(
+                        limits=self.config.limits(),
+                        timeout=self.config.timeouts(),
+                    )
+                    loop_clients.http_clients[model.provider] = http_client
+
+                llm = self._build(model, http_async_client=http_client)
+                loop_clients.llms[key] = llm
+            return llm
+
+    def close(self):
+        """
+        Close every client. Async clients of a loop that isn't running are
+        closed on it, and those of a running loop are closed from it.
+        """
+        with self._lock:
+            self._close()
+
+    async def aclose(self):
+        """
+        Close the async clients of the running event loop.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            loop_clients = self._loop_clients.pop(loop, None)
+        if loop_clients is not None:
+            await loop_clients.aclose()
+
+    def _close(self):
+        for http_client in self._http_clients.values():
+            http_client.close()
+        self._http_clients = {}
+        self._llms = {}
+
+        for loop, loop_clients in list(self._loop_clients.items()):
+            if loop.is_closed():
+                continue
+            if not loop.is_running():
+                loop.run_until_complete(loop_clients.aclose())
+            else:
+                loop.call_soon_threadsafe(loop.create_task, loop_clients.aclose())
+        self._loop_clients = weakref.WeakKeyDictionary()
+
+    def _build(
+        self,
+        model: Model,
+        http_client: typing.Optional[httpx.Client] = None,
+        http_async_client: typing.Optional[httpx.AsyncClient] = None,
+    ) -> BaseChatModel:
+        base_url = self.config.resolved_base_url()
+
+        # an OpenAI-compatible base URL serves every model, e.g. for local testing
+        if model.provider == Constants.AI.Provider.OPENAI or base_url:
+            from socra.completions.openai_chat import StreamUsageChatOpenAI
+
+            kwargs = {}
+            if base_url:
+                kwargs["base_url"] = base_url
+                # local stand-ins don't check the key, but the client requires one
+                kwargs["api_key"] = self.config.api_key or os.environ.get(
+                    "OPENAI_API_KEY", "socra-local"
+                )
+            elif self.config.api_key:
+                kwargs["api_key"] = self.config.api_key
+
+            return StreamUsageChatOpenAI(
+                model=model.id,
+                timeout=self.config.timeout,
+                max_retries=self.config.client_retries(),
+                http_client=http_client,
+                http_async_client=http_async_client,
+                **kwargs,
+            )
+
+        if model.provider == Constants.AI.Provider.ANTHROPIC:
+            from socra.completions.anthropic_chat import PooledChatAnthropic
+
+            return PooledChatAnthropic(
+                model=model.id,
+                timeout=self.config.timeout,
+                max_retries=self.config.client_retries(),
+                http_client=http_client,
+                http_async_client=http_async_client,
+            )
+
+        raise ValueError(f"Unsupported provider {model.provider} for {model.key}.")
+
+
+class _LoopClients:
+    """
+    Async clients of one event loop.
+
+    They are closed when the loop shuts down: the loop closes its async
+    generators on shutdown (`asyncio.run()` does before closing the loop),
+    so a generator started on it closes the clients when it is closed.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.http_clients: typing.Dict[Constants.AI.Provider, httpx.AsyncClient] = {}
+        self.llms: typing.Dict[typing.Tuple, BaseChatModel] = {}
+
+        # the loop only keeps a weak reference to its async generators
+        self._on_shutdown = self._close_on_shutdown()
+        asyncio.ensure_future(self._on_shutdown.__anext__(), loop=loop)
+
+    async def aclose(self):
+        http_clients, self.http_clients, self.llms = self.http_clients, {}, {}
+        for http_client in http_clients.values():
+            await http_client.aclose()
+
+    async def _close_on_shutdown(self):
+        try:
+            yield
+        finally:
+            await self.aclose()
+
+
+registry = ClientRegistry()
+atexit.register(registry.close)
+
+
+def get_llm(model: Model) -> BaseChatModel:
+    """
+    Get the shared, pooled client for a model.
+    """
+    return registry.get(model)
+
+
+def aget_llm(model: Model) -> BaseChatModel:
+    """
+    Get the shared, pooled async client for a model on the running loop.
+    """
+    return registry.aget(model)
+
+
+def supports_json_schema(model: Model) -> bool:
+    """
+    Whether the client for `model` accepts a JSON schema `response_format`,
+    i.e. whether it talks to an OpenAI-compatible API.
+    """
+    return (
+        model.provider == Constants.AI.Provider.OPENAI
+        or registry.config.resolved_base_url() is not None
+    )
+
+
+async def aclose_clients():
+    """
+    Close the shared async clients of the running event loop, e.g. before
+    the end of a long-lived loop. Loops closed by `asyncio.run()` close them
+    on shutdown already.
+    """
+    await registry.aclose()
+
+
+def configure_clients(config: ClientConfig):
+    """
+    Configure pool size and timeouts for all LLM clients.
+    """
+    registry.configure(config)
@@ -0,0 +1,156 @@
+import typing
+from decimal import Decimal
+
+from socra.completions.usage import TokenCost, TokenUsage
+from socra.models import Model
+from socra.models.base import PICOS_PER_DOLLAR
+from socra.schemas import Schema
+
+
+# slots of a ledger entry
+_INPUT = 0  # picodollars
+_OUTPUT = 1  # picodollars
+_INPUT_TOKENS = 2
+_CACHED_TOKENS = 3
+_OUTPUT_TOKENS = 4
+_TOTAL_TOKENS = 5
+_CALLS = 6
+_SAVED = 7  # picodollars
+_SAVED_CALLS = 8
+_SLOTS = 9
+
+
+class CostSnapshot(Schema):
+    """
+    Serialized `CostLedger`, see `CostLedger.snapshot()`.
+    """
+
+    totals: typing.List[int] = [0] * _SLOTS
+    by_model: typing.Dict[str, typing.List[int]] = {}
+    by_agent: typing.Dict[str, typing.List[int]] = {}
+
+
+class CostLedger:
+    """
+    Exact running cost and usage totals, overall, per model and per agent.
+
+    Costs are integer picodollars (see `ModelCost.picos`) and usage integer
+    tokens, kept in one fixed-size list of integers per entry, so adding a
+    completion neither rounds nor validates models. Totals are converted to
+    `TokenCost` and `TokenUsage` only when reported. Python integers don't
+    overflow, however many completions are added.
+
+    Completions that made no API call (cache hits, and followers of a shared
+    call) are not billed: their cost is counted apart, as saved.
+    """
+
+    __slots__ = ("_totals", "_by_model", "_by_agent")
+
+    def __init__(self):
+        self._totals = _entry()
+        self._by_model: typing.Dict[str, typing.List[int]] = {}
+        self._by_agent: typing.Dict[str, typing.List[int]] = {}
+
+    def add(
+        self, model: Model, usage: TokenUsage, agent: str = "-", billed: bool = True
+    ):
+        input_price, cached_price, output_price = model.cost.picos
+        uncached_input = usage.input - usage.cached_input
+        input_cost = input_price * uncached_input + cached_price * usage.cached_input
+        output_cost = output_price * usage.output
+
+        by_model = self._by_model.get(model.id)
+        if by_model is None:
+            by_model = self._by_model[model.id] = _entry()
+        by_agent = self._by_agent.get(agent)
+        if by_agent is None:
+            by_agent = self._by_agent[agent] = _entry()
+
+        for entry in (self._totals, by_model, by_agent):
+            if not billed:
+                entry[_SAVED] += input_cost + output_cost
+                entry[_SAVED_CALLS] += 1
+                continue
+            entry[_INPUT] += input_cost
+            entry[_OUTPUT] += output_cost
+            entry[_INPUT_TOKENS] += usage.input
+            entry[_CACHED_TOKENS] += usage.cached_input
+            entry[_OUTPUT_TOKENS] += usage.output
+            entry[_TOTAL_TOKENS] += usage.total
+            entry[_CALLS] += 1
+
+    @property
+    def calls(self) -> int:
+        return self._totals[_CALLS]
+
+    @property
+    def total_picos(self) -> int:
+        return self._totals[_INPUT] + self._totals[_OUTPUT]
+
+    def dollars(self) -> Decimal:
+        """
+        Exact total cost, in dollars.
+        """
+        return Decimal(self.total_picos) / PICOS_PER_DOLLAR
+
+    @property
+    def saved_calls(self) -> int:
+        """
+        Completions served without an API call.
+        """
+        return self._totals[_SAVED_CALLS]
+
+    def saved_dollars(self) -> Decimal:
+        """
+        Exact cost of the completions served without an API call, in dollars.
+        """
+        return Decimal(self._totals[_SAVED]) / PICOS_PER_DOLLAR
+
+    def cost(self) -> TokenCost:
+        return _cost(self._totals)
+
+    def usage(self) -> TokenUsage:
+        return _usage(self._totals)
+
+    def by_model(self) -> typing.Dict[str, TokenCost]:
+        return {key: _cost(entry) for key, entry in self._by_model.items()}
+
+    def by_agent(self) -> typing.Dict[str, TokenCost]:
+        """
+        Cost by the agent step that made the completions.
+        """
+        return {key: _cost(entry) for key, entry in self._by_agent.items()}
+
+    def snapshot(self) -> CostSnapshot:
+        return CostSnapshot(
+            totals=list(self._totals),
+            by_model={key: list(entry) for key, entry in self._by_model.items()},
+            by_agent={key: list(entry) for key, entry in self._by_agent.items()},
+        )
+
+    @classmethod
+    def restore(cls, snapshot: CostSnapshot) -> "CostLedger":
+        ledger = cls()
+        ledger._totals = _entry(snapshot.totals)
+        ledger._by_model = {k: _entry(v) for k, v in snapshot.by_model.items()}
+        ledger._by_agent = {k: _entry(v) for k, v in snapshot.by_agent.items()}
+        return ledger
+
+
+def _entry(values: typing.Optional[typing.List[int]] = None) -> typing.List[int]:
+    values = list(values) if values is not None else []
+    # snapshots taken before slots were added have fewer of them
+    return values + [0] * (_SLOTS - len(values))
+
+
+def _cost(entry: typing.List[int]) -> TokenCost:
+    return TokenCost.from_picos(entry[_INPUT], entry[_OUTPUT])
+
+
+def _usage(entry: typing.List[int]) -> TokenUsage:
+    return TokenUsage(
+        input=entry[_INPUT_TOKENS],
+        output=entry[_OUTPUT_TOKENS],
+        total=entry[_TOTAL_TOKENS],
+        cached_input=entry[_CACHED_TOKENS],
+    )
@@ -0,0 +1,402 @@
+import json
+import random
+import re
+import threading
+import time
+import typing
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from socra.schemas import Schema
+
+
+class FakeServerConfig(Schema):
+    """
+    Behaviour of the local OpenAI-compatible stand-in server.
+    """
+
+    ttft: float = 0.3
+    """
+    Seconds before the first token is sent (time to first token).
+    """
+
+    tokens_per_second: float = 80.0
+    """
+    Rate at which tokens are streamed after the first one. 0 means unthrottled.
+    """
+
+    error_rate: float = 0.0
+    """
+    Fraction of requests answered with an HTTP 500.
+    """
+
+    rate_limit_rate: float = 0.0
+    """
+    Fraction of requests answered with an HTTP 429.
+    """
+
+    retry_after: float = 1.0
+    """
+    Seconds sent in the retry-after header of 429 responses.
+    """
+
+    responses: typing.Dict[str, str] = {}
+    """
+    Scripted responses: when the last message contains a key,
+    the value is returned verbatim instead of a generated response.
+    """
+
+    seed: typing.Optional[int] = None
+
+
+class FakeLLMServer:
+    """
+    Local stand-in for the OpenAI chat completions API, for offline load
+    and latency testing of the whole completion pipeline.
+
+    Responses stream at a configurable time to first token and tokens per
+    second, and errors or rate limits can be injected at a given rate.
+    Unless scripted, responses are generated from the request: decision
+    prompts pick one of the listed `- key: ...` actions, and prompts with a
+    JSON example are answered with that example, placeholders filled in.
+
+    Point completions at it with `ClientConfig(base_url=server.url)` or the
+    SOCRA_LLM_BASE_URL environment variable.
+    """
+
+    def __init__(
+        self,
+        config: typing.Optional[FakeServerConfig] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self.config = config or FakeServerConfig()
+        self.requests = 0
+
+        self._random = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self._thread: typing.Optional[threading.Thread] = None
+
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.fake = self
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "FakeLLMServer":
+        """
+        Serve in a background thread.
+        """
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> "FakeLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _roll(self) -> typing.Optional[int]:
+        """
+        Count the request, and pick an injected error status, if any.
+        """
+        with self._lock:
+            self.requests += 1
+            roll = self._random.random()
+
+        if roll < self.config.rate_limit_rate:
+            return 429
+        if roll < self.config.rate_limit_rate + self.config.error_rate:
+            return 500
+        return None
+
+    def _choose(self, options: typing.List[str]) -> str:
+        with self._lock:
+            return self._random.choice(options)
+
+    def respond(
+        self,
+        messages: typing.List[dict],
+        response_format: typing.Optional[dict] = None,
+    ) -> str:
+        """
+        Content of the response to a chat request.
+        """
+        instruction = _text(messages[-1]["content"]) if messages else ""
+
+        for needle, response in self.config.responses.items():
+            if needle in instruction:
+                return response
+
+        # instructions may also be in an earlier (e.g. system) message
+        example = None
+        for message in reversed(messages):
+            text = _text(message.get("content"))
+            example = _json_example(text)
+            if example is not None:
+                instruction = text
+                break
+
+        json_schema = (response_format or {}).get("json_schema")
+        if example is None and json_schema is None:
+            return _LOREM
+
+        example = example or {}
+        if "key" in example:
+            # listed actions, not the description of the response format
+            keys = re.findall(
+                r"^\s*- key: (\S+)\n\s+(?:name|description):",
+                instruction,
+                re.MULTILINE,
+            )
+            if keys:
+                example["key"] = self._choose(keys)
+
+        example = _fill_placeholders(example)
+        if json_schema is not None:
+            schema = json_schema["schema"]
+            example = self._conform(schema, example, schema.get("$defs", {}))
+
+        return json.dumps(example, indent=4)
+
+    def _conform(self, schema: dict, value, defs: dict):
+        """
+        `value` if it matches the JSON `schema`, else a generated value that does.
+        """
+        if "$ref" in schema:
+            schema = defs[schema["$ref"].rsplit("/", 1)[-1]]
+        if "anyOf" in schema:
+            return self._conform(schema["anyOf"][0], value, defs)
+        if "enum" in schema:
+            return value if value in schema["enum"] else self._choose(schema["enum"])
+
+        type = schema.get("type")
+        if type == "object":
+            value = value if isinstance(value, dict) else {}
+            return {
+                name: self._conform(prop, value.get(name), defs)
+                for name, prop in schema.get("properties", {}).items()
+            }
+        if type == "array":
+            items = value if isinstance(value, list) else [None]
+            return [self._conform(schema.get("items", {}), v, defs) for v in items]
+
+        defaults = {"string": "fake", "boolean": True, "integer": 0, "number": 0.0}
+        types = {"string": str, "boolean": bool, "integer": int, "number": float}
+        if type in types and isinstance(value, types[type]):
+            return value
+        return defaults.get(type)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    server: ThreadingHTTPServer
+
+    def log_message(self, format, *args):
+        # keep load tests quiet
+        pass
+
+    def do_POST(self):
+        fake: FakeLLMServer = self.server.fake
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            return self._error(404, "not_found", f"Unknown path {self.path}")
+
+        try:
+            request = json.loads(body)
+        except ValueError:
+            return self._error(400, "invalid_request_error", "Invalid JSON body")
+
+        status = fake._roll()
+        if status == 429:
+            return self._error(
+                429,
+                "rate_limit_error",
+                "Rate limit reached",
+                {"retry-after": str(fake.config.retry_after)},
+            )
+        if status == 500:
+            return self._error(500, "server_error", "Injected server error")
+
+        messages = request.get("messages", [])
+        content = fake.respond(messages, request.get("response_format"))
+        tokens = _tokenize(content)
+        usage = {
+            "prompt_tokens": sum(len(_text(m.get("content"))) // 4 for m in messages),
+            "completion_tokens": len(tokens),
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+
+        completion = {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "created": int(time.time()),
+            "model": request.get("model", "fake"),
+        }
+
+        if request.get("stream"):
+            include_usage = (request.get("stream_options") or {}).get("include_usage")
+            return self._stream(completion, tokens, usage if include_usage else None)
+
+        _sleep(fake.config.ttft + _stream_time(fake.config, len(tokens)))
+        self._json(
+            200,
+            {
+                **completion,
+                "object": "chat.completion",
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": usage,
+            },
+        )
+
+    def _stream(
+        self, completion: dict, tokens: typing.List[str], usage: typing.Optional[dict]
+    ):
+        config = self.server.fake.config
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def chunk(choices: list, **extra) -> dict:
+            return {
+                **completion,
+                "object": "chat.completion.chunk",
+                "choices": choices,
+                **extra,
+            }
+
+        def delta(content: dict, finish_reason=None) -> list:
+            return [{"index": 0, "delta": content, "finish_reason": finish_reason}]
+
+        try:
+            _sleep(config.ttft)
+            self._event(chunk(delta({"role": "assistant", "content": ""})))
+            for i, token in enumerate(tokens):
+                if i > 0:
+                    _sleep(_stream_time(config, 1))
+                self._event(chunk(delta({"content": token})))
+            self._event(chunk(delta({}, finish_reason="stop")))
+            if usage is not None:
+                self._event(chunk([], usage=usage))
+            self._write_chunk(b"data: [DONE]\n\n")
+            self._write_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            # the client stopped reading, e.g. a stream stopped early
+            self.close_connection = True
+
+    def _event(self, data: dict):
+        self._write_chunk(f"data: {json.dumps(data)}\n\n".encode("utf-8"))
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _json(
+        self,
+        status: int,
+        data: dict,
+        headers: typing.Optional[typing.Dict[str, str]] = None,
+    ):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(
+        self,
+        status: int,
+        type: str,
+        message: str,
+        headers: typing.Optional[typing.Dict[str, str]] = None,
+    ):
+        self._json(
+            status,
+            {"error": {"message": message, "type": type, "code": None}},
+            headers,
+        )
+
+
+_LOREM = (
+    "This is a response from the local socra fake server. "
+    "It stands in for a real model so the completion pipeline "
+    "can be exercised offline."
+)
+
+
+def _text(content) -> str:
+    if isinstance(content, list):
+        return "".join(
+            part.get("text", "") if isinstance(part, dict) else str(part)
+            for part in content
+        )
+    return content or ""
+
+
+def _tokenize(content: str) -> typing.List[str]:
+    """
+    Split content into word-sized pieces, roughly one per token.
+    """
+    return re.findall(r"\s*\S+|\s+", content) or [""]
+
+
+def _json_example(text: str) -> typing.Optional[dict]:
+    """
+    First JSON object in `text`, e.g. the example in a prompt's instructions.
+    """
+    decoder = json.JSONDecoder()
+    for match in re.finditer(r"\{", text):
+        try:
+            value, _ = decoder.raw_decode(text, match.start())
+        except ValueError:
+            continue
+        if isinstance(value, dict) and value:
+            return value
+    return None
+
+
+def _fill_placeholders(value):
+    if isinstance(value, dict):
+        return {k: _fill_placeholders(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_fill_placeholders(v) for v in value]
+    if isinstance(value, str) and "..." in value:
+        return value.replace("...", "").strip() or "fake"
+    return value
+
+
+def _stream_time(config: FakeServerConfig, tokens: int) -> float:
+    if config.tokens_per_second <= 0:
+        return 0.0
+    return tokens / config.tokens_per_second
+
+
+def _sleep(seconds: float):
+    if seconds > 0:
+        time.sleep(seconds)
@@ -0,0 +1,106 @@
+import json
+import os
+import threading
+import typing
+import uuid
+
+from socra.completions.timing import CompletionTimings
+from socra.completions.usage import TokenCost, TokenUsage
+from socra.schemas import Schema
+
+if typing.TYPE_CHECKING:
+    from socra.completions.base import Completion
+
+
+class CompletionRecord(Schema):
+    """
+    Compact record of a completion, without its prompt or content.
+    """
+
+    id: str
+    key: str
+    """
+    Request key, see `Completion.cache_key`. Identifies the prompt.
+    """
+
+    model: str
+    usage: TokenUsage
+    cost: TokenCost
+    timings: CompletionTimings
+
+    cached: bool = False
+    shared: bool = False
+    stopped: bool = False
+
+    @classmethod
+    def of(cls, completion: "Completion") -> "CompletionRecord":
+        response = completion.response
+        return cls(
+            id=uuid.uuid4().hex,
+            key=completion.cache_key,
+            model=completion.model.id,
+            usage=response.usage,
+            cost=response.cost,
+            timings=completion.timings,
+            cached=response.cached,
+            shared=response.shared,
+            stopped=response.stopped,
+        )
+
+
+class CompletionLog:
+    """
+    Append-only JSONL log of completions with their full prompt and content,
+    one line per completion, written as completions are tracked.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def write(self, record: CompletionRecord, completion: "Completion"):
+        entry = {
+            **record.model_dump(mode="json"),
+            "prompt": completion.prompt.to_json(),
+            "content": completion.response.content,
+        }
+        line = json.dumps(entry, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+_completion_log: typing.Optional[CompletionLog] = None
+_completion_log_loaded = False
+
+
+def configure_completion_log(
+    path: typing.Optional[str],
+) -> typing.Optional[CompletionLog]:
+    """
+    Set the process-wide completion log. Pass `None` to disable.
+    """
+    global _completion_log, _completion_log_loaded
+    if _completion_log is not None:
+        _completion_log.close()
+    _completion_log = CompletionLog(path) if path else None
+    _completion_log_loaded = True
+    return _completion_log
+
+
+def get_completion_log() -> typing.Optional[CompletionLog]:
+    """
+    The process-wide completion log, if any. Enabled by the
+    SOCRA_COMPLETION_LOG environment variable or `configure_completion_log()`.
+    """
+    if not _completion_log_loaded:
+        configure_completion_log(os.environ.get("SOCRA_COMPLETION_LOG"))
+    return _completion_log
@@ -0,0 +1,179 @@
+import functools
+import hashlib
+import inspect
+import typing
+
+from langchain_core.messages.ai import AIMessageChunk
+from langchain_core.outputs import ChatGenerationChunk
+from langchain_core.utils.pydantic import is_basemodel_subclass
+from langchain_openai import ChatOpenAI
+from langchain_openai.chat_models import base as upstream
+
+_convert_chunk_to_generation_chunk = getattr(
+    upstream, "_convert_chunk_to_generation_chunk", None
+)
+
+UPSTREAM_VERSION = "0.1.25"
+"""
+langchain-openai version whose streaming code `StreamUsageChatOpenAI` mirrors.
+"""
+
+_UPSTREAM_DIGESTS = {
+    "ChatOpenAI._stream": "9393be84fa35ddad1d79bf82a589262400a70e42da20da8fae36fbb642438d43",
+    "ChatOpenAI._astream": "252c7c2691641ca136658083e453b9df0557d6e1f1b6d9e4834bd68428643086",
+    "ChatOpenAI._should_stream_usage": "e2add0d7b9fba506ac1ad1018ef82dd1f9643fda0d0c5599a04090afdc29822a",
+    "BaseChatOpenAI._stream": "7458faabb11c52f59a795e73078259b9f37b7f16a26036de14cb21e6971a391a",
+    "BaseChatOpenAI._astream": "dc145c2b225d40089c70ce9df3a27f13f57dd53a4d06c8f5e20955ed64278ffb",
+    "_convert_chunk_to_generation_chunk": "41aba3b2986c3b3ddc0870cedb8c4e961ecdae9f685e4876652bc1435a0ff0a4",
+}
+"""
+SHA-256 of the source of the upstream code mirrored here, as of `UPSTREAM_VERSION`.
+"""
+
+
+class StreamUsageChatOpenAI(ChatOpenAI):
+    """
+    `ChatOpenAI` that keeps the cached prompt tokens of streamed completions.
+
+    langchain-openai 0.1 only reads input, output and total tokens from the
+    usage chunk ending a stream, and drops `prompt_tokens_details`, with no
+    public way to get them. Streams are read as `ChatOpenAI` does here, and
+    `cached_tokens` is added to the chunk's usage metadata as
+    `input_token_details.cache_read`, as later versions do.
+
+    This mirrors private langchain-openai code, pinned to `UPSTREAM_VERSION`.
+    If the installed code differs (see `upstream_matches()`), streams are
+    left to `ChatOpenAI`, without cached tokens.
+    """
+
+    def _stream(
+        self, messages, stop=None, run_manager=None, stream_usage=None, **kwargs
+    ):
+        if not upstream_matches():
+            yield from super()._stream(
+                messages, stop, run_manager, stream_usage=stream_usage, **kwargs
+            )
+            return
+
+        kwargs = self._stream_kwargs(stream_usage, kwargs)
+        payload = self._get_request_payload(messages, stop=stop, **kwargs)
+        if self.include_response_headers or _pydantic_format(payload):
+            yield from super()._stream(messages, stop, run_manager, **kwargs)
+            return
+
+        payload["stream"] = True
+        default_chunk_class = AIMessageChunk
+        with self.client.create(**payload) as response:
+            for chunk in response:
+                generation_chunk = _generation_chunk(chunk, default_chunk_class)
+                if generation_chunk is None:
+                    continue
+                default_chunk_class = generation_chunk.message.__class__
+                if run_manager:
+                    run_manager.on_llm_new_token(
+                        generation_chunk.text,
+                        chunk=generation_chunk,
+                        logprobs=_logprobs(generation_chunk),
+                    )
+                yield generation_chunk
+
+    async def _astream(
+        self, messages, stop=None, run_manager=None, stream_usage=None, **kwargs
+    ):
+        if not upstream_matches():
+            async for generation_chunk in super()._astream(
+                messages, stop, run_manager, stream_usage=stream_usage, **kwargs
+            ):
+                yield generation_chunk
+            return
+
+        kwargs = self._stream_kwargs(stream_usage, kwargs)
+        payload = self._get_request_payload(messages, stop=stop, **kwargs)
+        if self.include_response_headers or _pydantic_format(payload):
+            async for generation_chunk in super()._astream(
+                messages, stop, run_manager, **kwargs
+            ):
+                yield generation_chunk
+            return
+
+        payload["stream"] = True
+        default_chunk_class = AIMessageChunk
+        response = await self.async_client.create(**payload)
+        async with response:
+            async for chunk in response:
+                generation_chunk = _generation_chunk(chunk, default_chunk_class)
+                if generation_chunk is None:
+                    continue
+                default_chunk_class = generation_chunk.message.__class__
+                if run_manager:
+                    await run_manager.on_llm_new_token(
+                        generation_chunk.text,
+                        chunk=generation_chunk,
+                        logprobs=_logprobs(generation_chunk),
+                    )
+                yield generation_chunk
+
+    def _stream_kwargs(self, stream_usage: typing.Optional[bool], kwargs: dict) -> dict:
+        # as `ChatOpenAI._stream()`, which this overrides
+        if self._should_stream_usage(stream_usage, **kwargs):
+            kwargs["stream_options"] = {"include_usage": True}
+        return kwargs
+
+
+@functools.lru_cache(maxsize=None)
+def upstream_matches() -> bool:
+    """
+    Whether the installed langchain-openai has the streaming code mirrored
+    by `StreamUsageChatOpenAI`, i.e. matches `UPSTREAM_VERSION`.
+    """
+    return upstream_digests() == _UPSTREAM_DIGESTS
+
+
+def upstream_digests() -> typing.Dict[str, typing.Optional[str]]:
+    """
+    SHA-256 of the source of the mirrored code in the installed
+    langchain-openai, `None` for code that is missing or has no source.
+    """
+    digests = {}
+    for name in _UPSTREAM_DIGESTS:
+        obj = upstream
+        for attr in name.split("."):
+            obj = getattr(obj, attr, None)
+        try:
+            source = inspect.getsource(obj)
+        except (OSError, TypeError):
+            digests[name] = None
+        else:
+            digests[name] = hashlib.sha256(source.encode()).hexdigest()
+    return digests
+
+
+def _generation_chunk(
+    chunk: typing.Any, default_chunk_class: typing.Type
+) -> typing.Optional[ChatGenerationChunk]:
+    """
+    Convert a raw chunk of a chat completion stream, keeping cached tokens.
+    """
+    if not isinstance(chunk, dict):
+        chunk = chunk.model_dump()
+
+    generation_chunk = _convert_chunk_to_generation_chunk(
+        chunk, default_chunk_class, None
+    )
+    if generation_chunk is None:
+        return None
+
+    usage = chunk.get("usage") or {}
+    cached_tokens = (usage.get("prompt_tokens_details") or {}).get("cached_tokens")
+    usage_metadata = getattr(generation_chunk.message, "usage_metadata", None)
+    if cached_tokens and usage_metadata:
+        usage_metadata["input_token_details"] = {"cache_read": cached_tokens}
+    return generation_chunk
+
+
+def _pydantic_format(payload: dict) -> bool:
+    return is_basemodel_subclass(payload.get("response_format"))
+
+
+def _logprobs(generation_chunk: ChatGenerationChunk) -> typing.Optional[dict]:
+    return (generation_chunk.generation_info or {}).get("logprobs")
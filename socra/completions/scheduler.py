@@ -0,0 +1,346 @@
+import asyncio
+import random
+import threading
+import time
+import typing
+
+from socra.models import Model
+from socra.schemas import Schema
+
+T = typing.TypeVar("T")
+
+
+class RateLimit(Schema):
+    """
+    Provider rate limits for a model. `None` means unlimited.
+    """
+
+    requests_per_minute: typing.Optional[int] = None
+    tokens_per_minute: typing.Optional[int] = None
+
+
+class RetryConfig(Schema):
+    max_retries: int = 5
+    """
+    Maximum number of retries after a rate-limit error.
+    """
+
+    base_delay: float = 1.0
+    """
+    Initial backoff delay, in seconds. Doubled on every retry.
+    """
+
+    max_delay: float = 60.0
+    """
+    Upper bound for a single backoff delay, in seconds.
+    """
+
+
+class SchedulerMetrics(Schema):
+    """
+    Admission metrics for one model.
+    """
+
+    queue_depth: int = 0
+    """
+    Requests currently waiting for admission.
+    """
+
+    max_queue_depth: int = 0
+    requests: int = 0
+    retries: int = 0
+
+    total_wait: float = 0.0
+    """
+    Total seconds spent waiting for admission or backing off.
+    """
+
+    max_wait: float = 0.0
+
+    @property
+    def average_wait(self) -> float:
+        return self.total_wait / self.requests if self.requests else 0.0
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at `capacity` units per minute.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.available = float(capacity)
+        self._updated_at = time.monotonic()
+
+    def refill(self, now: float):
+        elapsed = now - self._updated_at
+        self.available = min(
+            self.capacity, self.available + elapsed * self.capacity / 60
+        )
+        self._updated_at = now
+
+    def wait_time(self, amount: int) -> float:
+        """
+        Seconds until `amount` units are available (0 if available now).
+        Requests larger than the bucket only wait for a full bucket.
+        """
+        amount = min(amount, self.capacity)
+        if self.available >= amount:
+            return 0.0
+        return (amount - self.available) * 60 / self.capacity
+
+    def take(self, amount: int):
+        # negative amounts return capacity, e.g. when usage was over-estimated
+        self.available = min(self.capacity, self.available - amount)
+
+
+class _ModelState:
+    def __init__(self, limit: RateLimit):
+        self.requests = (
+            TokenBucket(limit.requests_per_minute)
+            if limit.requests_per_minute
+            else None
+        )
+        self.tokens = (
+            TokenBucket(limit.tokens_per_minute) if limit.tokens_per_minute else None
+        )
+        self.metrics = SchedulerMetrics()
+
+
+class Scheduler:
+    """
+    Admission control in front of completion requests.
+
+    Requests are admitted against per-model requests-per-minute and
+    tokens-per-minute token buckets, using a pre-flight token estimate that
+    is reconciled with actual usage once the request completes, and
+    returned if it fails. Rate-limit errors (HTTP 429) are retried with
+    jittered exponential backoff, honouring the provider's retry-after
+    header. Clients don't retry themselves while a scheduler is configured,
+    so every attempt goes through admission.
+    """
+
+    def __init__(
+        self,
+        limits: typing.Optional[typing.Dict[str, RateLimit]] = None,
+        default_limit: typing.Optional[RateLimit] = None,
+        retry: typing.Optional[RetryConfig] = None,
+    ):
+        self.limits = limits or {}
+        """
+        Rate limits keyed by model id, e.g. "gpt-4o-mini-2024-07-18".
+        """
+
+        self.default_limit = default_limit or RateLimit()
+        self.retry = retry or RetryConfig()
+
+        self._lock = threading.Lock()
+        self._states: typing.Dict[str, _ModelState] = {}
+
+    def metrics(self, model: Model) -> SchedulerMetrics:
+        with self._lock:
+            return self._state(model).metrics
+
+    def run(
+        self,
+        model: Model,
+        estimated_tokens: int,
+        fn: typing.Callable[[], T],
+        retryable: typing.Callable[[], bool] = lambda: True,
+    ) -> T:
+        """
+        Run `fn` once admitted, retrying on rate-limit errors while
+        `retryable()` is true.
+        """
+        attempt = 0
+        while True:
+            self._acquire(model, estimated_tokens)
+            try:
+                return fn()
+            except Exception as e:
+                # the failed attempt used no tokens, return the ones it took
+                self.settle(model, estimated_tokens, 0)
+                delay = self._retry_delay(model, e, attempt, retryable)
+                if delay is None:
+                    raise
+                attempt += 1
+                self._waited(model, delay)
+                time.sleep(delay)
+
+    async def arun(
+        self,
+        model: Model,
+        estimated_tokens: int,
+        fn: typing.Callable[[], typing.Awaitable[T]],
+        retryable: typing.Callable[[], bool] = lambda: True,
+    ) -> T:
+        """
+        Async counterpart of `run()`.
+        """
+        attempt = 0
+        while True:
+            await self._aacquire(model, estimated_tokens)
+            try:
+                return await fn()
+            except Exception as e:
+                self.settle(model, estimated_tokens, 0)
+                delay = self._retry_delay(model, e, attempt, retryable)
+                if delay is None:
+                    raise
+                attempt += 1
+                self._waited(model, delay)
+                await asyncio.sleep(delay)
+
+    def settle(self, model: Model, estimated_tokens: int, actual_tokens: int):
+        """
+        Correct the tokens-per-minute bucket once actual usage is known.
+        """
+        with self._lock:
+            state = self._state(model)
+            if state.tokens is not None:
+                state.tokens.take(actual_tokens - estimated_tokens)
+
+    def _state(self, model: Model) -> _ModelState:
+        key = model.id
+        state = self._states.get(key)
+        if state is None:
+            state = _ModelState(self.limits.get(key, self.default_limit))
+            self._states[key] = state
+        return state
+
+    def _reserve(self, model: Model, tokens: int) -> float:
+        """
+        Take capacity for one request if available. Returns 0 when admitted,
+        otherwise the number of seconds to wait before trying again.
+        """
+        with self._lock:
+            state = self._state(model)
+            now = time.monotonic()
+            buckets = [(state.requests, 1), (state.tokens, tokens)]
+            wait = 0.0
+            for bucket, amount in buckets:
+                if bucket is not None:
+                    bucket.refill(now)
+                    wait = max(wait, bucket.wait_time(amount))
+
+            if wait > 0:
+                return wait
+
+            for bucket, amount in buckets:
+                if bucket is not None:
+                    bucket.take(amount)
+            state.metrics.requests += 1
+            return 0.0
+
+    def _acquire(self, model: Model, tokens: int):
+        wait = self._reserve(model, tokens)
+        if wait == 0:
+            return
+
+        started_at = time.monotonic()
+        self._enqueue(model, 1)
+        try:
+            while wait > 0:
+                time.sleep(wait)
+                wait = self._reserve(model, tokens)
+        finally:
+            self._enqueue(model, -1)
+            self._waited(model, time.monotonic() - started_at)
+
+    async def _aacquire(self, model: Model, tokens: int):
+        wait = self._reserve(model, tokens)
+        if wait == 0:
+            return
+
+        started_at = time.monotonic()
+        self._enqueue(model, 1)
+        try:
+            while wait > 0:
+                await asyncio.sleep(wait)
+                wait = self._reserve(model, tokens)
+        finally:
+            self._enqueue(model, -1)
+            self._waited(model, time.monotonic() - started_at)
+
+    def _enqueue(self, model: Model, delta: int):
+        with self._lock:
+            metrics = self._state(model).metrics
+            metrics.queue_depth += delta
+            metrics.max_queue_depth = max(metrics.max_queue_depth, metrics.queue_depth)
+
+    def _waited(self, model: Model, seconds: float):
+        with self._lock:
+            metrics = self._state(model).metrics
+            metrics.total_wait += seconds
+            metrics.max_wait = max(metrics.max_wait, seconds)
+
+    def _retry_delay(
+        self,
+        model: Model,
+        error: Exception,
+        attempt: int,
+        retryable: typing.Callable[[], bool],
+    ) -> typing.Optional[float]:
+        if not is_rate_limit_error(error) or not retryable():
+            return None
+        if attempt >= self.retry.max_retries:
+            return None
+
+        with self._lock:
+            self._state(model).metrics.retries += 1
+
+        backoff = min(self.retry.max_delay, self.retry.base_delay * 2**attempt)
+        # full jitter, but never retry before the provider allows it
+        delay = random.uniform(0, backoff)
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    status_code = getattr(error, "status_code", None)
+    if status_code is None:
+        status_code = getattr(getattr(error, "response", None), "status_code", None)
+    return status_code == 429
+
+
+def _retry_after(error: Exception) -> typing.Optional[float]:
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms is not None:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if retry_after is not None:
+        try:
+            return float(retry_after)
+        except ValueError:
+            return None
+    return None
+
+
+_scheduler: typing.Optional[Scheduler] = None
+
+
+def configure_scheduler(scheduler: typing.Optional[Scheduler]):
+    """
+    Route all completions through `scheduler`. Pass `None` to disable.
+    Shared clients are re-created, with client retries turned off while
+    the scheduler owns them.
+    """
+    from socra.completions.clients import registry
+
+    global _scheduler
+    _scheduler = scheduler
+    registry.configure(registry.config)
+
+
+def get_scheduler() -> typing.Optional[Scheduler]:
+    return _scheduler
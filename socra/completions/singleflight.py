@@ -0,0 +1,236 @@
+import asyncio
+import threading
+import typing
+
+from socra.completions.stream import ChunkPayload, StopCompletion
+
+T = typing.TypeVar("T")
+
+Publish = typing.Callable[[str], None]
+
+
+class _Subscriber:
+    """
+    A caller waiting on a call. Callers without `on_chunk` need the full
+    response, so they never stop.
+    """
+
+    def __init__(
+        self, on_chunk: typing.Optional[typing.Callable[[ChunkPayload], None]]
+    ):
+        self.on_chunk = on_chunk
+        self.parts: typing.List[str] = []
+        self.stopped = False
+        self.error: typing.Optional[BaseException] = None
+
+    def send(self, text: str):
+        if self.stopped or self.on_chunk is None:
+            return
+        self.parts.append(text)
+        try:
+            self.on_chunk(ChunkPayload(chunk=text, parts=self.parts))
+        except StopCompletion:
+            self.stopped = True
+        except Exception as e:
+            # raised to this caller only, the others keep streaming
+            self.stopped = True
+            self.error = e
+
+
+class _Call:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+        self.result = None
+        self.error: typing.Optional[BaseException] = None
+        self.chunks: typing.List[str] = []
+        self.subscribers: typing.List[_Subscriber] = []
+        self.stopped = False
+        self.futures: typing.List[
+            typing.Tuple[asyncio.AbstractEventLoop, asyncio.Future]
+        ] = []
+
+    def subscribe(
+        self, on_chunk: typing.Optional[typing.Callable]
+    ) -> typing.Optional[_Subscriber]:
+        """
+        Wait on this call. `None` if its stream was already stopped, so it
+        has nothing more to share.
+        """
+        subscriber = _Subscriber(on_chunk)
+        with self.lock:
+            if self.stopped:
+                return None
+            # late joiners first receive the chunks streamed so far
+            for text in self.chunks:
+                subscriber.send(text)
+            self.subscribers.append(subscriber)
+        return subscriber
+
+    def publish(self, text: str):
+        with self.lock:
+            self.chunks.append(text)
+            for subscriber in self.subscribers:
+                subscriber.send(text)
+
+            # the stream is only stopped once no waiter needs more of it
+            if all(s.stopped for s in self.subscribers):
+                self.stopped = True
+                raise StopCompletion()
+
+    def wait_future(self) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self.lock:
+            if not self.done.is_set():
+                self.futures.append((loop, future))
+                return future
+
+        _resolve(future, self.result, self.error)
+        return future
+
+    def finish(self, result, error: typing.Optional[BaseException]):
+        with self.lock:
+            self.result = result
+            self.error = error
+            self.done.set()
+            futures = self.futures
+            self.futures = []
+
+        for loop, future in futures:
+            loop.call_soon_threadsafe(_resolve, future, result, error)
+
+    def outcome(self, subscriber: _Subscriber):
+        if self.error is not None:
+            raise self.error
+        if subscriber.error is not None:
+            raise subscriber.error
+        return self.result
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical requests into a single upstream call.
+
+    The first caller for a key (the leader) performs the call; callers that
+    arrive while it is in flight wait for its result instead of issuing their
+    own request. Chunks the leader publishes are fanned out to every waiter's
+    `on_chunk`, including waiters that join mid-stream.
+
+    The shared stream is stopped early only once every waiter's `on_chunk`
+    raised `StopCompletion`; waiters without `on_chunk` need the full
+    response, so they keep it going. Callers arriving after a stream was
+    stopped make a new request.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: typing.Dict[str, _Call] = {}
+
+    def do(
+        self,
+        key: str,
+        fn: typing.Callable[[Publish], T],
+        on_chunk: typing.Optional[typing.Callable[[ChunkPayload], None]] = None,
+    ) -> typing.Tuple[T, bool]:
+        """
+        Run `fn(publish)` for `key`, or wait for the in-flight call with the
+        same key. Returns the result and whether it was shared from another
+        caller's request.
+        """
+        call, leader, subscriber = self._subscribe(key, on_chunk)
+
+        if not leader:
+            call.done.wait()
+            return call.outcome(subscriber), True
+
+        result, error = None, None
+        try:
+            result = fn(call.publish)
+        except BaseException as e:
+            error = e
+        finally:
+            self._finish(key, call, result, error)
+
+        return call.outcome(subscriber), False
+
+    async def ado(
+        self,
+        key: str,
+        fn: typing.Callable[[Publish], typing.Awaitable[T]],
+        on_chunk: typing.Optional[typing.Callable[[ChunkPayload], None]] = None,
+    ) -> typing.Tuple[T, bool]:
+        """
+        Async counterpart of `do()`.
+        """
+        call, leader, subscriber = self._subscribe(key, on_chunk)
+
+        if not leader:
+            await call.wait_future()
+            return call.outcome(subscriber), True
+
+        result, error = None, None
+        try:
+            result = await fn(call.publish)
+        except BaseException as e:
+            error = e
+        finally:
+            self._finish(key, call, result, error)
+
+        return call.outcome(subscriber), False
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+    def _subscribe(
+        self, key: str, on_chunk: typing.Optional[typing.Callable]
+    ) -> typing.Tuple[_Call, bool, _Subscriber]:
+        while True:
+            call, leader = self._join(key)
+            subscriber = call.subscribe(on_chunk)
+            if subscriber is not None:
+                return call, leader, subscriber
+
+    def _join(self, key: str) -> typing.Tuple[_Call, bool]:
+        with self._lock:
+            call = self._calls.get(key)
+            # a stream stopped early has no more content to share,
+            # later callers make a new request
+            if call is not None and not call.stopped:
+                return call, False
+
+            call = _Call()
+            self._calls[key] = call
+            return call, True
+
+    def _finish(self, key: str, call: _Call, result, error):
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+        call.finish(result, error)
+
+
+def _resolve(future: asyncio.Future, result, error):
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+_single_flight: typing.Optional[SingleFlight] = None
+
+
+def configure_single_flight(single_flight: typing.Optional[SingleFlight]):
+    """
+    Coalesce identical concurrent completions through `single_flight`.
+    Pass `None` to disable.
+    """
+    global _single_flight
+    _single_flight = single_flight
+
+
+def get_single_flight() -> typing.Optional[SingleFlight]:
+    return _single_flight
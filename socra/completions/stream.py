@@ -0,0 +1,98 @@
+import typing
+
+from langchain_core.messages.ai import AIMessageChunk
+
+from socra.completions.usage import TokenUsage
+
+
+class StopCompletion(Exception):
+    """
+    Raise from an `on_chunk` callback to stop a streaming completion early,
+    e.g. once the fields needed from the response have been received.
+    The completion's response then holds the content streamed so far.
+    """
+
+
+class ChunkPayload:
+    """
+    Payload passed to `on_chunk` callbacks while a completion streams.
+
+    `chunk` is the newly received text. `aggregate` (all text received so
+    far) is only joined when accessed, so streaming stays linear in the
+    output length for callbacks that don't need it.
+    """
+
+    __slots__ = ("chunk", "_parts", "_length", "_aggregate")
+
+    def __init__(
+        self,
+        chunk: str,
+        aggregate: typing.Optional[str] = None,
+        parts: typing.Optional[typing.List[str]] = None,
+    ):
+        self.chunk = chunk
+        self._aggregate = aggregate
+        self._parts = parts
+        self._length = len(parts) if parts is not None else 0
+
+    @property
+    def aggregate(self) -> str:
+        if self._aggregate is None:
+            self._aggregate = "".join(self._parts[: self._length])
+        return self._aggregate
+
+    def __repr__(self) -> str:
+        return f"ChunkPayload(chunk={self.chunk!r})"
+
+
+class StreamAggregator:
+    """
+    Incrementally aggregates streamed message chunks.
+
+    Text parts are collected in a list and joined once, and usage metadata
+    is summed as it arrives, instead of re-adding `AIMessageChunk`s (which
+    copies the full content on every chunk).
+    """
+
+    __slots__ = ("_parts", "_content", "_usage")
+
+    def __init__(self):
+        self._parts: typing.List[str] = []
+        self._content: typing.Optional[str] = None
+        self._usage: typing.Optional[TokenUsage] = None
+
+    def add(self, chunk: AIMessageChunk) -> ChunkPayload:
+        text = _chunk_text(chunk)
+        if text:
+            self._parts.append(text)
+            self._content = None
+
+        usage_metadata = chunk.usage_metadata
+        if usage_metadata:
+            usage = TokenUsage.from_usage_metadata(usage_metadata)
+            self._usage = usage if self._usage is None else self._usage + usage
+
+        return ChunkPayload(chunk=text, parts=self._parts)
+
+    @property
+    def content(self) -> str:
+        if self._content is None:
+            self._content = "".join(self._parts)
+        return self._content
+
+    @property
+    def usage(self) -> TokenUsage:
+        if self._usage is None:
+            raise ValueError("Missing usage metadata in streamed response")
+        return self._usage
+
+
+def _chunk_text(chunk: AIMessageChunk) -> str:
+    content = chunk.content
+    if isinstance(content, str):
+        return content
+
+    # some providers stream a list of content blocks
+    return "".join(
+        block if isinstance(block, str) else block.get("text", "") for block in content
+    )
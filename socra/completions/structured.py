@@ -0,0 +1,87 @@
+import functools
+import hashlib
+import json
+import typing
+
+import pydantic
+
+from socra.schemas import Schema
+
+
+def strict_json_schema(schema: typing.Type[Schema]) -> dict:
+    """
+    JSON schema of `schema` in the subset accepted by OpenAI's strict
+    structured outputs: every property required, no additional properties
+    and no defaults.
+    """
+    return _strict(schema.model_json_schema())
+
+
+@functools.lru_cache(maxsize=None)
+def response_format(schema: typing.Type[Schema]) -> dict:
+    """
+    `response_format` request parameter constraining the response to `schema`.
+    """
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": schema.__name__,
+            "schema": strict_json_schema(schema),
+            "strict": True,
+        },
+    }
+
+
+@functools.lru_cache(maxsize=None)
+def schema_digest(schema: typing.Type[Schema]) -> str:
+    """
+    Stable hash of the schema, so responses to the same prompt with different
+    output schemas are cached separately.
+    """
+    canonical = json.dumps(
+        strict_json_schema(schema), sort_keys=True, separators=(",", ":")
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+@functools.lru_cache(maxsize=None)
+def decision_schema(keys: typing.Tuple[str, ...]) -> typing.Type[Schema]:
+    """
+    Schema of a decision between options: the chosen option's key,
+    constrained to `keys`, and brief reasoning.
+    """
+    return pydantic.create_model(
+        "Decision",
+        __base__=Schema,
+        key=(typing.Literal[keys], ...),
+        reasoning=(str, ...),
+    )
+
+
+def _strict(node):
+    if isinstance(node, list):
+        return [_strict(item) for item in node]
+    if not isinstance(node, dict):
+        return node
+
+    strict = {}
+    for key, value in node.items():
+        # strict mode rejects defaults; every property is required instead
+        if key == "default":
+            continue
+        if key in ("properties", "$defs"):
+            # mappings of names to schemas, names are kept as is
+            strict[key] = {name: _strict(v) for name, v in value.items()}
+        else:
+            strict[key] = _strict(value)
+    node = strict
+
+    if node.get("type") == "object" or "properties" in node:
+        node["additionalProperties"] = False
+        node["required"] = list(node.get("properties", {}))
+
+    # a "$ref" may not have sibling keywords such as a description
+    if "$ref" in node:
+        node = {"$ref": node["$ref"]}
+
+    return node
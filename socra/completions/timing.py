@@ -0,0 +1,131 @@
+import contextlib
+import time
+import typing
+
+from socra.schemas import Schema
+
+
+class CompletionTimings(Schema):
+    """
+    Latency of a single completion, in seconds.
+    """
+
+    started_at: typing.Optional[float] = None
+    """
+    Unix time at which processing started.
+    """
+
+    wall_time: float = 0.0
+    """
+    Total time from the start of processing until the response was ready,
+    including admission waits and local overhead.
+    """
+
+    request_time: float = 0.0
+    """
+    Time spent on the provider request, 0 when served locally.
+    """
+
+    ttft: typing.Optional[float] = None
+    """
+    Time from sending the request until the first streamed chunk.
+    `None` when the response was not streamed from the provider.
+    """
+
+    output_tokens: int = 0
+
+    phases: typing.Dict[str, float] = {}
+    """
+    Local overhead by phase, e.g. "prompt_build", "digest", "conversion", "parse".
+    """
+
+    step: typing.Optional[str] = None
+    """
+    Agent step the completion was made for, set when tracked by a context.
+    """
+
+    @property
+    def overhead(self) -> float:
+        return sum(self.phases.values())
+
+    @property
+    def tokens_per_second(self) -> float:
+        """
+        Output throughput. For streamed responses, measured from the first token.
+        """
+        generation_time = self.request_time - (self.ttft or 0.0)
+        if generation_time <= 0:
+            return 0.0
+        return self.output_tokens / generation_time
+
+    @contextlib.contextmanager
+    def measure(self, phase: str):
+        """
+        Add the time spent in the block to `phase`.
+        """
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_phase(phase, time.perf_counter() - started_at)
+
+    def add_phase(self, phase: str, seconds: float):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+
+class LatencySummary(Schema):
+    """
+    Latency aggregated over many completions.
+    """
+
+    completions: int = 0
+    wall_time: float = 0.0
+    request_time: float = 0.0
+
+    streamed: int = 0
+    """
+    Completions streamed from the provider, i.e. with a time to first token.
+    """
+
+    ttft: float = 0.0
+    """
+    Sum of time to first token over streamed completions.
+    """
+
+    generation_time: float = 0.0
+    output_tokens: int = 0
+    phases: typing.Dict[str, float] = {}
+
+    @classmethod
+    def of(cls, timings: typing.Iterable[CompletionTimings]) -> "LatencySummary":
+        summary = cls()
+        for t in timings:
+            summary.add(t)
+        return summary
+
+    def add(self, timings: CompletionTimings):
+        self.completions += 1
+        self.wall_time += timings.wall_time
+        self.request_time += timings.request_time
+        if timings.ttft is not None:
+            self.streamed += 1
+            self.ttft += timings.ttft
+        if timings.request_time > 0:
+            self.generation_time += timings.request_time - (timings.ttft or 0.0)
+            self.output_tokens += timings.output_tokens
+        for phase, seconds in timings.phases.items():
+            self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    @property
+    def average_ttft(self) -> float:
+        return self.ttft / self.streamed if self.streamed else 0.0
+
+    @property
+    def tokens_per_second(self) -> float:
+        if self.generation_time <= 0:
+            return 0.0
+        return self.output_tokens / self.generation_time
+
+    @property
+    def overhead(self) -> float:
+        return sum(self.phases.values())
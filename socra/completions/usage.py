@@ -1,5 +1,6 @@
 from socra.schemas import Schema
 from socra.models import Model
+from socra.models.base import PICOS_PER_DOLLAR
 
 
 class TokenUsage(Schema):
@@ -7,13 +8,40 @@ class TokenUsage(Schema):
     output: int
     total: int
 
+    cached_input: int = 0
+    """
+    Input tokens served from the provider's prompt cache. Included in `input`.
+    """
+
+    @classmethod
+    def from_usage_metadata(cls, usage_metadata: dict) -> "TokenUsage":
+        """
+        Usage from a LangChain message's `usage_metadata`, which every
+        provider reports in the same shape.
+        """
+        input_details = usage_metadata.get("input_token_details") or {}
+        return cls(
+            input=usage_metadata.get("input_tokens", 0),
+            output=usage_metadata.get("output_tokens", 0),
+            total=usage_metadata.get("total_tokens", 0),
+            cached_input=input_details.get("cache_read") or 0,
+        )
+
     def __add__(self, other: "TokenUsage") -> "TokenUsage":
         return TokenUsage(
             input=self.input + other.input,
             output=self.output + other.output,
             total=self.total + other.total,
+            cached_input=self.cached_input + other.cached_input,
         )
 
+    @property
+    def cache_hit_ratio(self) -> float:
+        """
+        Share of input tokens served from the provider's prompt cache.
+        """
+        return self.cached_input / self.input if self.input else 0.0
+
 
 class TokenCost(Schema):
     input: float
@@ -27,17 +55,28 @@ class TokenCost(Schema):
             total=self.total + other.total,
         )
 
+    @classmethod
+    def from_picos(cls, input: int, output: int) -> "TokenCost":
+        """
+        Cost from exact picodollar amounts, see `CostLedger`.
+        """
+        return cls(
+            input=input / PICOS_PER_DOLLAR,
+            output=output / PICOS_PER_DOLLAR,
+            total=(input + output) / PICOS_PER_DOLLAR,
+        )
+
     @classmethod
     def for_model(
         cls,
         model: Model,
         token_usage: TokenUsage,
     ):
-        cost_input = model.cost.input * token_usage.input
-        cost_output = model.cost.output * token_usage.output
-        cost_total = cost_input + cost_output
-        return cls(
-            input=cost_input,
-            output=cost_output,
-            total=cost_total,
+        input_price, cached_price, output_price = model.cost.picos
+        # cached input tokens are billed at the model's cached input rate
+        uncached_input = token_usage.input - token_usage.cached_input
+        cost_input = (
+            input_price * uncached_input + cached_price * token_usage.cached_input
         )
+        cost_output = output_price * token_usage.output
+        return cls.from_picos(cost_input, cost_output)
@@ -11,7 +11,7 @@ class Constants:
                 # GPT_3P5 = "gpt-3.5"
                 # GPT_3P5_TURBO = "gpt-3.5-turbo"
                 # GPT_4O_2024_05_13 = "gpt-4o-2024-05-13"
-                # GPT_4O_2024_08_06 = "gpt-4o-2024-08-06"
+                GPT_4O_2024_08_06 = "gpt-4o-2024-08-06"
                 GPT_4O_MINI_2024_07_18 = "gpt-4o-mini-2024-07-18"
                 # GPT_3P5_TURBO_0125 = "gpt-3.5-turbo-0125"
 
@@ -20,13 +20,21 @@ class Constants:
                 # O1_PREVIEW_2024_09_12 = "o1-preview-2024-09-12"
                 # O1_MINI_2024_09_12 = "o1-mini-2024-09-12"
 
-                # # anthropic
+                # anthropic
                 # CLAUDE_3P5_SONNET = "claude-3-5-sonnet"
-                # CLAUDE_3P5_SONNET_20240620 = "claude-3-5-sonnet-20240620"
+                CLAUDE_3P5_SONNET_20240620 = "claude-3-5-sonnet-20240620"
                 # CLAUDE_3_OPUS = "claude-3-opus"
                 # CLAUDE_3_OPUS_20240229 = "claude-3-opus-20240229"
                 # CLAUDE_3_HAIKU = "claude-3-haiku"
-                # CLAUDE_3_HAIKU_20240307 = "claude-3-haiku-20240307"
+                CLAUDE_3_HAIKU_20240307 = "claude-3-haiku-20240307"
+
+            class Tier(Enum):
+                """
+                Capability tier, in increasing order of capability and cost.
+                """
+
+                SMALL = "small"
+                LARGE = "large"
 
         class Provider(Enum):
             OPENAI = "openai"
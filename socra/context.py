@@ -1,6 +1,6 @@
 from socra.schemas import Schema
-from socra.messages import Message
-import typing
+from socra.messages import Message, MessageSequence
+from socra.prompts import Prompt
 
 
 class Context(Schema):
@@ -10,7 +10,7 @@ class Context(Schema):
     and agents use context to make decisions.
     """
 
-    messages: typing.List[Message] = []
+    messages: MessageSequence = MessageSequence()
 
     def add_message(self, message: Message, inplace: bool = False) -> "Context":
         """
@@ -20,7 +20,21 @@ class Context(Schema):
         """
 
         if inplace:
-            self.messages.append(message)
+            self.messages = self.messages.appended(message)
             return self
         else:
-            return Context(messages=self.messages + [message])
+            return Context(messages=self.messages.appended(message))
+
+    def prompt(self, instruction: str) -> Prompt:
+        """
+        Build a prompt of the context's messages followed by `instruction`.
+
+        The history always comes first and unchanged, with the per-call
+        instruction last, so consecutive prompts share a byte-identical
+        prefix that providers can serve from their prompt cache.
+        """
+        return Prompt.build(
+            self.messages.appended(
+                Message(role=Message.Role.HUMAN, content=instruction)
+            )
+        )
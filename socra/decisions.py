@@ -2,11 +2,10 @@ import typing
 from socra.completions.usage import TokenCost
 from socra.context import Context
 from socra.schemas import Schema
-from socra.messages import Message
-from socra.models import Model
-from socra.prompts import Prompt
-from socra.completions import Completion, ChunkPayload, MockResponse
-import json
+from socra.models.router import CallClass, route
+from socra.completions import Completion, ChunkPayload, MockResponse, StopCompletion
+from socra.completions.structured import decision_schema
+from socra.parsers import StreamingJSONParser
 
 
 class Option(Schema):
@@ -57,6 +56,12 @@ class DecisionConfig(Schema):
 
     mock_response: typing.Optional[MockResponse] = None
 
+    stop_after_key: bool = False
+    """
+    Stop streaming the response as soon as the chosen option's key is known.
+    Saves latency and output tokens; `Decision.reasoning` may then be empty.
+    """
+
 
 class Decision(Schema):
     """
@@ -103,33 +108,39 @@ def make_decision(
 
     options_str = "\n".join([option.to_str() for option in options])
 
+    user_on_chunk = config.on_chunk if config and config.on_chunk else None
+    stop_after_key = config is not None and config.stop_after_key
+    parser = StreamingJSONParser()
+
+    def on_chunk(chunk: ChunkPayload):
+        if user_on_chunk is not None:
+            user_on_chunk(chunk)
+
+        parser.feed(chunk.chunk)
+        if stop_after_key and "key" in parser.fields:
+            raise StopCompletion()
+
+    prompt = context.prompt(_decision_prompt.format(options=options_str))
     completion = Completion(
-        model=Model.for_key(Model.Key.GPT_4O_MINI_2024_07_18),
-        prompt=Prompt(
-            messages=[
-                *context.messages,
-                Message(
-                    role=Message.Role.HUMAN,
-                    content=_decision_prompt.format(options=options_str),
-                ),
-            ]
-        ),
-        on_chunk=config.on_chunk if config and config.on_chunk else None,
+        model=route(CallClass.DECISION, prompt),
+        prompt=prompt,
+        on_chunk=on_chunk if user_on_chunk or stop_after_key else None,
         mock_response=config.mock_response if config and config.mock_response else None,
+        schema=decision_schema(tuple(option.key for option in options)),
     )
     resp = completion.process()
     print("prompt")
     print(completion.prompt)
 
-    content = resp.content
-    dct = json.loads(content)
-    if "key" not in dct:
-        raise ValueError("Missing 'key' in response")
-    if "reasoning" not in dct:
-        raise ValueError("Missing 'reasoning' in response")
-
-    selected_key = dct["key"]
-    reasoning = dct["reasoning"]
+    # a stopped stream is incomplete JSON, use the fields parsed so far
+    if resp.stopped:
+        if "key" not in parser.fields:
+            raise ValueError("Missing 'key' in response")
+        selected_key = parser.fields["key"]
+        reasoning = ""
+    else:
+        selected_key = resp.parsed.key
+        reasoning = resp.parsed.reasoning
 
     # find
     selected_option = next(
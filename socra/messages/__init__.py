@@ -1,3 +1,4 @@
 from socra.messages.base import Message, MessageRole
+from socra.messages.sequence import MessageSequence
 
-__all__ = ["Message", "MessageRole"]
+__all__ = ["Message", "MessageRole", "MessageSequence"]
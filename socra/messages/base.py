@@ -2,7 +2,7 @@ import typing
 
 from enum import Enum
 from socra.schemas.base import Schema
-from pydantic import model_validator
+from pydantic import PrivateAttr, model_validator
 from langchain.schema import (
     AIMessage as LCAIMessage,
     HumanMessage as LCHumanMessage,
@@ -51,6 +51,12 @@ class ContentPart(Schema):
             return model.count_tokens(self.text)
         raise ValueError(f"Invalid type {self.type} for ContentPart.")
 
+    def estimate_tokens(self, model: "Model", upper_bound: bool = False) -> int:
+        """Estimate tokens for content part, see `Model.estimate_tokens()`"""
+        if self.type == ContentPart.Type.TEXT:
+            return model.estimate_tokens(self.text, upper_bound)
+        raise ValueError(f"Invalid type {self.type} for ContentPart.")
+
     @classmethod
     def from_json(cls, dct: dict):
         """Deserialize from JSON"""
@@ -76,7 +82,27 @@ class Message(Schema):
 
     role: MessageRole
     content: typing.List[ContentPart] = []
-    name: str = None
+    name: typing.Optional[str] = None
+
+    _token_counts: typing.Dict[str, int] = PrivateAttr(default_factory=dict)
+    """
+    Memoized token counts by encoding name. Messages are treated as
+    immutable once created; reassigning `content` resets the counts.
+    """
+
+    _langchain: typing.Optional[LCAIMessage | LCHumanMessage | LCSystemMessage] = (
+        PrivateAttr(default=None)
+    )
+    """
+    Memoized `to_langchain()` conversion, reset when a field is reassigned.
+    """
+
+    def __setattr__(self, name: str, value: typing.Any):
+        if name == "content":
+            self._token_counts = {}
+        if name in ("role", "content", "name"):
+            self._langchain = None
+        super().__setattr__(name, value)
 
     # field validator for content
     @model_validator(mode="before")
@@ -104,6 +130,18 @@ class Message(Schema):
         return dct
 
     def to_langchain(self) -> LCAIMessage | LCHumanMessage | LCSystemMessage:
+        """
+        Convert to a langchain message. Converted once and shared by every
+        prompt including the message, so the result must not be mutated.
+        """
+        # read the private attribute directly, pydantic's attribute lookup
+        # costs more than the cached conversion saves on long histories
+        converted = self.__pydantic_private__["_langchain"]
+        if converted is None:
+            converted = self._langchain = self._convert_langchain()
+        return converted
+
+    def _convert_langchain(self) -> LCAIMessage | LCHumanMessage | LCSystemMessage:
         dct = self.to_json()
 
         if self.role == Message.Role.HUMAN:
@@ -117,17 +155,39 @@ class Message(Schema):
 
     def count_tokens(self, model: "Model") -> int:
         """Count total tokens for message, taking into account
-        that the message might be content of parts
+        that the message might be content of parts.
+        Counted once per encoding.
         """
+        count = self._token_counts.get(model.encoding)
+        if count is None:
+            count = sum(part.count_tokens(model) for part in self.content)
+            self._token_counts[model.encoding] = count
+        return count
+
+    def estimate_tokens(self, model: "Model", upper_bound: bool = False) -> int:
+        """Estimate tokens for message without tokenizing it,
+        see `Model.estimate_tokens()`.
+        """
+        return sum(part.estimate_tokens(model, upper_bound) for part in self.content)
 
-        if self.content:
-            return model.count_tokens(self.content)
-
-        total_tokens = 0
-        for part in self.content:
-            total_tokens += part.count_tokens(model)
-
-        return total_tokens
+    @staticmethod
+    def count_tokens_many(
+        model: "Model", messages: typing.Sequence["Message"]
+    ) -> typing.List[int]:
+        """
+        Token count of each message. Messages not counted yet for the model's
+        encoding are counted together, with their parts encoded in one batch.
+        """
+        uncounted = [m for m in messages if model.encoding not in m._token_counts]
+        if uncounted:
+            texts = [part.text for m in uncounted for part in m.content]
+            part_counts = iter(model.count_tokens_batch(texts))
+            for message in uncounted:
+                message._token_counts[model.encoding] = sum(
+                    next(part_counts) for _ in message.content
+                )
+
+        return [m._token_counts[model.encoding] for m in messages]
 
     @classmethod
     def from_json(cls, dct: dict):
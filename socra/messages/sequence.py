@@ -0,0 +1,239 @@
+import typing
+
+from pydantic_core import core_schema
+
+from socra.messages.base import Message
+
+
+_BITS = 5
+_WIDTH = 1 << _BITS
+_MASK = _WIDTH - 1
+
+
+class MessageSequence(typing.Sequence[Message]):
+    """
+    Immutable sequence of messages that shares structure between versions.
+
+    `appended()` returns a new sequence in O(1) (amortized, copying at most a
+    few 32-slot nodes) and leaves the original unchanged, so a context and
+    every prompt built from it share one history instead of copying it.
+    Each message is validated once, when appended: it must be a `Message`,
+    and a system message can only come first.
+
+    Stored as a persistent vector: a 32-way trie of full 32-message leaves,
+    plus a tail of up to 32 messages not yet pushed into the trie. A
+    `window()` hides a run of stored messages, `_skip` of them after the
+    first `_head`, so it shares the whole trie too.
+    """
+
+    __slots__ = ("_count", "_shift", "_root", "_tail", "_head", "_skip")
+
+    def __init__(self, messages: typing.Iterable[Message] = ()):
+        self._count = 0
+        self._head = 0
+        self._skip = 0
+        self._shift = _BITS
+        self._root: tuple = ()
+        self._tail: tuple = ()
+        for message in messages:
+            self._push(message)
+
+    def appended(self, message: Message) -> "MessageSequence":
+        """
+        New sequence with `message` appended.
+        """
+        sequence = self._copy()
+        sequence._push(message)
+        return sequence
+
+    def extended(self, messages: typing.Iterable[Message]) -> "MessageSequence":
+        """
+        New sequence with `messages` appended.
+        """
+        sequence = self._copy()
+        for message in messages:
+            sequence._push(message)
+        return sequence
+
+    def append(self, message: Message):
+        raise TypeError(
+            "MessageSequence is immutable: use `appended()`, or "
+            "`Context.add_message()` to add a message to a context"
+        )
+
+    def extend(self, messages: typing.Iterable[Message]):
+        raise TypeError(
+            "MessageSequence is immutable: use `extended()`, or "
+            "`Context.add_message()` to add messages to a context"
+        )
+
+    def window(self, start: int, head: int = 0) -> "MessageSequence":
+        """
+        The first `head` messages followed by the messages from `start` on,
+        e.g. the system message and the most recent messages of a trimmed
+        prompt. Shares this sequence's structure in O(1), unless this is
+        already a window hiding messages outside `head..start`.
+        """
+        start = min(max(start, 0), len(self))
+        head = min(max(head, 0), start)
+        if head == start:
+            return self
+
+        if self._skip and not head <= self._head <= start:
+            # the hidden runs would not be contiguous
+            messages = list(self)
+            return MessageSequence(messages[:head] + messages[start:])
+
+        sequence = self._copy()
+        sequence._head = head
+        sequence._skip = self._skip + start - head
+        return sequence
+
+    def common_prefix(self, other: "MessageSequence") -> int:
+        """
+        Number of leading messages that are the same objects in both
+        sequences. Leaves shared by both, e.g. by versions of one history,
+        are compared at once rather than message by message.
+        """
+        n = min(len(self), len(other))
+        i = 0
+        if not self._skip and not other._skip:
+            tail_offset = min(self._tail_offset(), other._tail_offset(), n)
+            while i < tail_offset and self._leaf(i) is other._leaf(i):
+                i += _WIDTH
+            i = min(i, n)
+
+        while i < n and self[i] is other[i]:
+            i += 1
+        return i
+
+    def __len__(self) -> int:
+        return self._count - self._skip
+
+    @typing.overload
+    def __getitem__(self, index: int) -> Message: ...
+
+    @typing.overload
+    def __getitem__(self, index: slice) -> "MessageSequence": ...
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step == 1 and stop >= len(self):
+                return self.window(start)
+            return MessageSequence(self[i] for i in range(start, stop, step))
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("message index out of range")
+        if index >= self._head:
+            index += self._skip
+        return self._leaf(index)[index & _MASK]
+
+    def __iter__(self) -> typing.Iterator[Message]:
+        yield from self._stored(0, self._head)
+        yield from self._stored(self._head + self._skip, self._count)
+
+    def __add__(self, other: typing.Iterable[Message]) -> "MessageSequence":
+        return self.extended(other)
+
+    def __eq__(self, other: typing.Any) -> bool:
+        if not isinstance(other, (MessageSequence, list, tuple)):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"MessageSequence({list(self)!r})"
+
+    def _copy(self) -> "MessageSequence":
+        sequence = MessageSequence.__new__(MessageSequence)
+        sequence._count = self._count
+        sequence._shift = self._shift
+        sequence._root = self._root
+        sequence._tail = self._tail
+        sequence._head = self._head
+        sequence._skip = self._skip
+        return sequence
+
+    def _stored(self, start: int, stop: int) -> typing.Iterator[Message]:
+        """
+        Stored messages from `start` to `stop`, ignoring the window.
+        """
+        while start < stop:
+            leaf = self._leaf(start)
+            offset = start & _MASK
+            end = min(stop - start + offset, len(leaf))
+            yield from leaf[offset:end]
+            start += end - offset
+
+    def _tail_offset(self) -> int:
+        return self._count - len(self._tail)
+
+    def _leaf(self, index: int) -> tuple:
+        if index >= self._tail_offset():
+            return self._tail
+        node = self._root
+        for level in range(self._shift, 0, -_BITS):
+            node = node[(index >> level) & _MASK]
+        return node
+
+    def _push(self, message: Message):
+        """
+        Append in place. Only used on sequences not shared yet.
+        """
+        if not isinstance(message, Message):
+            raise ValueError(
+                f"message at index {len(self)} should be an instance of Message"
+            )
+        if message.role == Message.Role.SYSTEM and len(self):
+            raise ValueError("system message should be first message")
+
+        if len(self._tail) < _WIDTH:
+            self._tail = self._tail + (message,)
+        else:
+            leaf, self._tail = self._tail, (message,)
+            tail_offset = self._count - _WIDTH
+            if (tail_offset >> _BITS) >= (1 << self._shift):
+                # root is full, grow the trie by a level
+                self._root = (self._root, self._path(self._shift, leaf))
+                self._shift += _BITS
+            else:
+                self._root = self._push_leaf(self._shift, self._root, tail_offset, leaf)
+        self._count += 1
+
+    def _push_leaf(self, level: int, node: tuple, offset: int, leaf: tuple) -> tuple:
+        index = (offset >> level) & _MASK
+        if level == _BITS:
+            child = leaf
+        elif index < len(node):
+            child = self._push_leaf(level - _BITS, node[index], offset, leaf)
+        else:
+            child = self._path(level - _BITS, leaf)
+        return node[:index] + (child,) + node[index + 1 :]
+
+    def _path(self, level: int, leaf: tuple) -> tuple:
+        node = leaf
+        for _ in range(0, level, _BITS):
+            node = (node,)
+        return node
+
+    @classmethod
+    def validate(cls, value: typing.Any) -> "MessageSequence":
+        if isinstance(value, MessageSequence):
+            # already validated
+            return value
+        if isinstance(value, (list, tuple)):
+            return cls(value)
+        raise ValueError("messages should be a list")
+
+    @classmethod
+    def __get_pydantic_core_schema__(
+        cls, source_type: typing.Any, handler: typing.Any
+    ) -> core_schema.CoreSchema:
+        return core_schema.no_info_plain_validator_function(
+            cls.validate,
+            serialization=core_schema.plain_serializer_function_ser_schema(list),
+        )
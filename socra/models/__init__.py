@@ -1,4 +1,21 @@
 from socra.models.base import Model
+from socra.models.registry import ModelRegistry, configure_registry
+from socra.models.router import (
+    CallClass,
+    ModelRouter,
+    RoutingPolicy,
+    configure_router,
+    route,
+)
 
 
-__all__ = ["Model"]
+__all__ = [
+    "Model",
+    "ModelRegistry",
+    "configure_registry",
+    "CallClass",
+    "ModelRouter",
+    "RoutingPolicy",
+    "configure_router",
+    "route",
+]
@@ -1,22 +1,151 @@
+import functools
+import math
 import typing
 from socra.schemas import Schema
 from socra.constants import Constants
-from decimal import Decimal
+from decimal import ROUND_HALF_EVEN, Decimal
+from enum import Enum
+
+from pydantic import field_validator
 
 import tiktoken
 
 
+PICOS_PER_DOLLAR = 10**12
+"""
+Costs are accounted exactly as integer picodollars. Per-token prices are
+whole picodollars down to $0.000001 per million tokens.
+"""
+
+
+def to_picos(dollars: Decimal) -> int:
+    """
+    Dollars as whole picodollars, rounding half to even.
+    """
+    return int((Decimal(dollars) * PICOS_PER_DOLLAR).to_integral_value(ROUND_HALF_EVEN))
+
+
 class ModelCost(Schema):
     input: Decimal
     output: Decimal
 
+    cached_input: typing.Optional[Decimal] = None
+    """
+    Cost per input token served from the provider's prompt cache.
+    Defaults to the regular input cost.
+    """
+
+    @property
+    def cached_input_price(self) -> Decimal:
+        return self.cached_input if self.cached_input is not None else self.input
+
+    @functools.cached_property
+    def picos(self) -> typing.Tuple[int, int, int]:
+        """
+        Input, cached input and output prices per token, in picodollars.
+        """
+        return (
+            to_picos(self.input),
+            to_picos(self.cached_input_price),
+            to_picos(self.output),
+        )
+
+
+DEFAULT_BYTES_PER_TOKEN = 3.5
+"""
+Average UTF-8 bytes per token of BPE tokenizers on source code, slightly
+low so estimates lean high. It is a typical figure for cl100k_base and
+o200k_base, not yet measured with benchmarks/token_estimate.py: override
+`Model.bytes_per_token` with the benchmark's calibrated value per model.
+"""
+
+
+def utf8_size(text: str) -> int:
+    """
+    UTF-8 byte length of `text`, without encoding ASCII text.
+    """
+    return len(text) if text.isascii() else len(text.encode("utf-8"))
+
+
+def estimate_tokens(text: str, bytes_per_token: float = DEFAULT_BYTES_PER_TOKEN) -> int:
+    """
+    Approximate token count of `text`, without tokenizing it.
+    """
+    return math.ceil(utf8_size(text) / bytes_per_token)
+
+
+_BATCH_THRESHOLD = 16
+"""
+Below this many texts, thread pool overhead outweighs parallel encoding.
+"""
+
+
+@functools.lru_cache(maxsize=None)
+def get_encoding(name: str) -> tiktoken.Encoding:
+    """
+    tiktoken encoding by name, loaded once per process.
+    """
+    return tiktoken.get_encoding(name)
+
+
+class ModelSpeed(Schema):
+    """
+    Typical serving speed, used to estimate latency when routing.
+    """
+
+    ttft: float
+    """
+    Time to first token, in seconds.
+    """
+
+    tokens_per_second: float
+
+    def estimate(self, output_tokens: int) -> float:
+        """
+        Estimated seconds to generate `output_tokens`.
+        """
+        return self.ttft + output_tokens / self.tokens_per_second
+
 
 class Model(Schema):
     Key: typing.ClassVar = Constants.AI.Model.Key
+    Provider: typing.ClassVar = Constants.AI.Provider
+    Tier: typing.ClassVar = Constants.AI.Model.Tier
+
+    key: typing.Union[Constants.AI.Model.Key, str]
+    """
+    Builtin models use a `Key`, models registered from a file any string.
+    """
 
-    key: Constants.AI.Model.Key
     name: str
 
+    provider: Constants.AI.Provider = Constants.AI.Provider.OPENAI
+    """
+    Provider serving the model. Used to select and pool clients.
+    """
+
+    context_window: int
+    """
+    Maximum number of tokens of input and output combined.
+    """
+
+    max_output_tokens: int
+
+    tier: Constants.AI.Model.Tier = Constants.AI.Model.Tier.SMALL
+
+    speed: ModelSpeed
+
+    encoding: str = "cl100k_base"
+    """
+    tiktoken encoding of the model's tokenizer. Providers without a public
+    tokenizer (e.g. anthropic) use cl100k_base as an approximation.
+    """
+
+    bytes_per_token: float = DEFAULT_BYTES_PER_TOKEN
+    """
+    Average UTF-8 bytes per token, used by `estimate_tokens()`.
+    """
+
     cost: ModelCost
     """
     Cost per token or generation, where applicable.
@@ -30,32 +159,68 @@ class Model(Schema):
         )
     """
 
-    def get_encoding(self):
-        return tiktoken.get_encoding("cl100k_base")
+    @field_validator("key", mode="before")
+    @classmethod
+    def validate_key(cls, key: typing.Any) -> typing.Any:
+        # known ids from model files resolve to their builtin key
+        if isinstance(key, str):
+            try:
+                return Constants.AI.Model.Key(key)
+            except ValueError:
+                pass
+        return key
+
+    @property
+    def id(self) -> str:
+        """
+        Model id sent to the provider, and used to look the model up.
+        """
+        return self.key.value if isinstance(self.key, Enum) else self.key
+
+    def get_encoding(self) -> tiktoken.Encoding:
+        return get_encoding(self.encoding)
 
     def count_tokens(self, text: str) -> int:
         """Count tokens for piece of text.
-        Note that anthropic does not provide docs on this,
-        so we're using gpt-4 as a reference.
+        Special tokens are counted as plain text.
         """
+        return len(self.get_encoding().encode_ordinary(text))
+
+    def estimate_tokens(self, text: str, upper_bound: bool = False) -> int:
+        """Estimate tokens for piece of text, without tokenizing it.
+
+        upper_bound: return a bound that is never below `count_tokens()`
+            instead of an estimate. Every token spans at least one byte,
+            so the bound is the UTF-8 byte length.
+
+        Use as a cheap first pass, e.g. to decide whether text fits,
+        and count exactly only when the bound does not settle it.
+        """
+        if upper_bound:
+            return utf8_size(text)
+        return estimate_tokens(text, self.bytes_per_token)
+
+    def count_tokens_batch(
+        self, texts: typing.Sequence[str], num_threads: int = 8
+    ) -> typing.List[int]:
+        """
+        Count tokens for many pieces of text, encoding them in parallel.
+        """
+        if len(texts) < _BATCH_THRESHOLD:
+            return [self.count_tokens(text) for text in texts]
+
         encoding = self.get_encoding()
-        return len(encoding.encode(text))
+        tokens = encoding.encode_ordinary_batch(list(texts), num_threads=num_threads)
+        return [len(t) for t in tokens]
+
+    def estimate_cost(self, input_tokens: int, output_tokens: int) -> Decimal:
+        """
+        Estimated cost of a call, ignoring prompt caching.
+        """
+        return self.cost.input * input_tokens + self.cost.output * output_tokens
 
     @classmethod
-    def for_key(cls, key: Constants.AI.Model.Key) -> "Model":
-        return next(m for m in ALL_MODELS if m.key == key)
-
-
-ALL_MODELS: typing.List[Model] = [
-    Model(
-        key=Model.Key.GPT_4O_MINI_2024_07_18,
-        name="GPT4o Mini 2024-07-18",
-        # context_window=16_384,
-        context_window=128_000,
-        is_latest=True,
-        cost=ModelCost(
-            input=Decimal("0.15") / Decimal(1_000_000),
-            output=Decimal("0.60") / Decimal(1_000_000),
-        ),
-    ),
-]
+    def for_key(cls, key: typing.Union[Constants.AI.Model.Key, str]) -> "Model":
+        from socra.models.registry import get_registry
+
+        return get_registry().get(key)
@@ -0,0 +1,198 @@
+import json
+import os
+import threading
+import typing
+from decimal import Decimal
+
+from socra.models.base import Model
+
+try:
+    import tomllib
+except ImportError:  # python < 3.11
+    tomllib = None
+
+
+_PER_MILLION = Decimal(1_000_000)
+
+BUILTIN_MODELS: typing.List[dict] = [
+    dict(
+        key=Model.Key.GPT_4O_MINI_2024_07_18,
+        encoding="o200k_base",
+        name="GPT4o Mini 2024-07-18",
+        context_window=128_000,
+        max_output_tokens=16_384,
+        tier=Model.Tier.SMALL,
+        speed=dict(ttft=0.5, tokens_per_second=90),
+        cost=dict(
+            input=Decimal("0.15") / _PER_MILLION,
+            output=Decimal("0.60") / _PER_MILLION,
+            cached_input=Decimal("0.075") / _PER_MILLION,
+        ),
+    ),
+    dict(
+        key=Model.Key.GPT_4O_2024_08_06,
+        encoding="o200k_base",
+        name="GPT4o 2024-08-06",
+        context_window=128_000,
+        max_output_tokens=16_384,
+        tier=Model.Tier.LARGE,
+        speed=dict(ttft=0.6, tokens_per_second=80),
+        cost=dict(
+            input=Decimal("2.50") / _PER_MILLION,
+            output=Decimal("10.00") / _PER_MILLION,
+            cached_input=Decimal("1.25") / _PER_MILLION,
+        ),
+    ),
+    dict(
+        key=Model.Key.CLAUDE_3_HAIKU_20240307,
+        name="Claude 3 Haiku 2024-03-07",
+        provider=Model.Provider.ANTHROPIC,
+        context_window=200_000,
+        max_output_tokens=4_096,
+        tier=Model.Tier.SMALL,
+        speed=dict(ttft=0.5, tokens_per_second=120),
+        cost=dict(
+            input=Decimal("0.25") / _PER_MILLION,
+            output=Decimal("1.25") / _PER_MILLION,
+            cached_input=Decimal("0.03") / _PER_MILLION,
+        ),
+    ),
+    dict(
+        key=Model.Key.CLAUDE_3P5_SONNET_20240620,
+        name="Claude 3.5 Sonnet 2024-06-20",
+        provider=Model.Provider.ANTHROPIC,
+        context_window=200_000,
+        max_output_tokens=8_192,
+        tier=Model.Tier.LARGE,
+        speed=dict(ttft=1.0, tokens_per_second=60),
+        cost=dict(
+            input=Decimal("3.00") / _PER_MILLION,
+            output=Decimal("15.00") / _PER_MILLION,
+            cached_input=Decimal("0.30") / _PER_MILLION,
+        ),
+    ),
+]
+"""
+Specs of the models socra ships with, validated on first lookup.
+"""
+
+
+class ModelRegistry:
+    """
+    Models by id, built lazily on first lookup from the builtin models and
+    any model files, which may add models or override builtin ones.
+
+    A model file is TOML or JSON with a list of models, e.g.:
+
+        [[models]]
+        key = "llama-3.1-8b-instruct"
+        name = "Llama 3.1 8B (local)"
+        provider = "openai"
+        context_window = 131072
+        max_output_tokens = 4096
+        tier = "small"
+        speed = { ttft = 0.2, tokens_per_second = 150 }
+        cost = { input = "0", output = "0" }
+
+    Costs are per token; write them as strings to keep them exact.
+    Registered models take part in routing like builtin ones.
+    """
+
+    def __init__(
+        self,
+        paths: typing.Sequence[str] = (),
+        builtin: bool = True,
+    ):
+        self.paths = list(paths)
+        self.builtin = builtin
+
+        self._lock = threading.Lock()
+        self._models: typing.Optional[typing.Dict[str, Model]] = None
+
+    def get(self, key: typing.Union[Model.Key, str]) -> Model:
+        models = self._loaded()
+        model_id = key.value if isinstance(key, Model.Key) else key
+        try:
+            return models[model_id]
+        except KeyError:
+            raise KeyError(f"Unknown model '{model_id}'") from None
+
+    def models(self) -> typing.List[Model]:
+        return list(self._loaded().values())
+
+    def register(self, model: Model) -> Model:
+        """
+        Add a model, replacing any registered model with the same id.
+        """
+        self._loaded()[model.id] = model
+        return model
+
+    def load(self, path: str) -> typing.List[Model]:
+        """
+        Register the models of a TOML or JSON model file.
+        """
+        return [self.register(m) for m in read_models(path)]
+
+    def __contains__(self, key: typing.Union[Model.Key, str]) -> bool:
+        model_id = key.value if isinstance(key, Model.Key) else key
+        return model_id in self._loaded()
+
+    def __len__(self) -> int:
+        return len(self._loaded())
+
+    def _loaded(self) -> typing.Dict[str, Model]:
+        if self._models is None:
+            with self._lock:
+                if self._models is None:
+                    models: typing.Dict[str, Model] = {}
+                    if self.builtin:
+                        for spec in BUILTIN_MODELS:
+                            model = Model.model_validate(spec)
+                            models[model.id] = model
+                    for path in self.paths:
+                        for model in read_models(path):
+                            models[model.id] = model
+                    self._models = models
+        return self._models
+
+
+def read_models(path: str) -> typing.List[Model]:
+    """
+    Parse a TOML or JSON model file, see `ModelRegistry`.
+    """
+    if path.endswith(".toml"):
+        if tomllib is None:
+            raise RuntimeError(
+                f"Reading '{path}' requires Python 3.11+, use a JSON model file"
+            )
+        with open(path, "rb") as f:
+            data = tomllib.load(f)
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+    specs = data.get("models", []) if isinstance(data, dict) else data
+    return [Model.model_validate(spec) for spec in specs]
+
+
+_registry: typing.Optional[ModelRegistry] = None
+
+
+def configure_registry(registry: ModelRegistry):
+    """
+    Set the process-wide model registry used by `Model.for_key()`.
+    """
+    global _registry
+    _registry = registry
+
+
+def get_registry() -> ModelRegistry:
+    """
+    The process-wide model registry. Model files listed in the SOCRA_MODELS
+    environment variable (separated by os.pathsep) are loaded on first lookup.
+    """
+    global _registry
+    if _registry is None:
+        paths = os.environ.get("SOCRA_MODELS")
+        _registry = ModelRegistry(paths.split(os.pathsep) if paths else ())
+    return _registry
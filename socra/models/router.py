@@ -0,0 +1,214 @@
+import typing
+from decimal import Decimal
+from enum import Enum
+
+from socra.models.base import Model, estimate_tokens
+from socra.models.registry import get_registry
+from socra.schemas import Schema
+
+if typing.TYPE_CHECKING:
+    from socra.prompts import Prompt
+
+
+class CallClass(Enum):
+    """
+    Kind of work a completion does, used to pick a routing policy.
+    """
+
+    DECISION = "decision"
+    """
+    Choosing between a few options, e.g. which agent to run next.
+    """
+
+    EXTRACTION = "extraction"
+    """
+    Short structured extraction from the context, e.g. a file path.
+    """
+
+    GENERATION = "generation"
+    """
+    Producing content, e.g. rewriting a file.
+    """
+
+    SUMMARY = "summary"
+    """
+    Summarizing context, e.g. compacting an agent's history.
+    """
+
+
+class RoutingPolicy(Schema):
+    min_tier: Model.Tier = Model.Tier.SMALL
+    """
+    Least capable tier allowed.
+    """
+
+    output_tokens: int = 256
+    """
+    Expected output size, unless given when routing.
+    """
+
+    max_latency: typing.Optional[float] = None
+    """
+    Latency objective, in seconds, for the estimated time to generate the output.
+    """
+
+    max_cost: typing.Optional[Decimal] = None
+    """
+    Budget per call, in dollars.
+    """
+
+
+DEFAULT_POLICIES: typing.Dict[CallClass, RoutingPolicy] = {
+    CallClass.DECISION: RoutingPolicy(output_tokens=64),
+    CallClass.EXTRACTION: RoutingPolicy(output_tokens=128),
+    CallClass.GENERATION: RoutingPolicy(
+        min_tier=Model.Tier.LARGE,
+        output_tokens=2_048,
+    ),
+    CallClass.SUMMARY: RoutingPolicy(output_tokens=512),
+}
+
+
+class ModelRouter:
+    """
+    Picks the model for a completion from a policy per call class.
+
+    Candidates must be of at least the policy's tier, fit the prompt and
+    expected output within their context window and output limit, and meet
+    the latency objective and budget. The cheapest candidate is chosen,
+    the fastest one on ties. Latency and budget are soft: if no model meets
+    them, the fastest model that fits is chosen instead.
+    """
+
+    def __init__(
+        self,
+        policies: typing.Optional[typing.Dict[CallClass, RoutingPolicy]] = None,
+        providers: typing.Optional[typing.List[Model.Provider]] = None,
+        models: typing.Optional[typing.List[Model]] = None,
+    ):
+        self.policies = {**DEFAULT_POLICIES, **(policies or {})}
+
+        self.providers = providers or [Model.Provider.OPENAI]
+        """
+        Providers to route to, i.e. the ones with credentials configured.
+        """
+
+        self._models = models
+
+    @property
+    def models(self) -> typing.List[Model]:
+        """
+        Models to route between, the registered models unless given.
+        """
+        if self._models is not None:
+            return self._models
+        return get_registry().models()
+
+    def route(
+        self,
+        call_class: CallClass,
+        prompt: typing.Optional["Prompt"] = None,
+        output_tokens: typing.Optional[int] = None,
+    ) -> Model:
+        policy = self.policies[call_class]
+        if output_tokens is None:
+            output_tokens = policy.output_tokens
+
+        tiers = list(Model.Tier)
+        candidates = [
+            m
+            for m in self.models
+            if m.provider in self.providers
+            and tiers.index(m.tier) >= tiers.index(policy.min_tier)
+        ]
+        if not candidates:
+            raise ValueError(f"No {policy.min_tier.value} model for {call_class.value}")
+
+        input_tokens = self._input_tokens(prompt, candidates, output_tokens)
+
+        fitting = [
+            m
+            for m in candidates
+            if input_tokens + output_tokens <= m.context_window
+            and output_tokens <= m.max_output_tokens
+        ]
+        if not fitting:
+            raise ValueError(
+                f"No model fits {input_tokens} input and {output_tokens} output tokens"
+            )
+
+        def meets_policy(m: Model) -> bool:
+            if policy.max_latency is not None:
+                if m.speed.estimate(output_tokens) > policy.max_latency:
+                    return False
+            if policy.max_cost is not None:
+                if m.estimate_cost(input_tokens, output_tokens) > policy.max_cost:
+                    return False
+            return True
+
+        eligible = [m for m in fitting if meets_policy(m)]
+        if not eligible:
+            return min(fitting, key=lambda m: m.speed.estimate(output_tokens))
+
+        return min(
+            eligible,
+            key=lambda m: (
+                m.estimate_cost(input_tokens, output_tokens),
+                m.speed.estimate(output_tokens),
+            ),
+        )
+
+    def _input_tokens(
+        self,
+        prompt: typing.Optional["Prompt"],
+        candidates: typing.List[Model],
+        output_tokens: int,
+    ) -> int:
+        if prompt is None:
+            return 0
+
+        # prompts that fit every window by their upper bound aren't tokenized,
+        # and are priced by their estimate
+        bound = prompt.estimate_tokens(candidates[0], upper_bound=True)
+        if bound + output_tokens <= min(m.context_window for m in candidates):
+            return prompt.estimate_tokens(candidates[0])
+
+        # token counts barely differ between tokenizers, count once
+        return prompt.count_tokens(candidates[0])
+
+
+_router: typing.Optional[ModelRouter] = None
+
+
+def configure_router(router: ModelRouter):
+    """
+    Set the process-wide router used by `route()`.
+    """
+    global _router
+    _router = router
+
+
+def get_router() -> ModelRouter:
+    global _router
+    if _router is None:
+        _router = ModelRouter()
+    return _router
+
+
+def route(
+    call_class: CallClass,
+    prompt: typing.Optional["Prompt"] = None,
+    output_tokens: typing.Optional[int] = None,
+) -> Model:
+    """
+    Pick a model for a call with the process-wide router.
+    """
+    return get_router().route(call_class, prompt, output_tokens)
+
+
+def rewrite_output_tokens(content: str) -> int:
+    """
+    Expected output size for rewriting `content`: about as long as the
+    content, plus room for changes.
+    """
+    return estimate_tokens(content) + 512
@@ -1,5 +1,5 @@
 import socra
-import json
+from socra.models.router import CallClass, route
 from socra.nodes.node import NodeType
 from socra.utils.decorators import throttle
 from socra.utils.spinner import Spinner
@@ -28,7 +28,6 @@ class NodeAddChild(socra.Action[Inputs, str]):
     Inputs: typing.ClassVar = Inputs
 
     def run(self, inputs):
-        model = socra.Model.for_key(socra.Model.Key.GPT_4O_MINI_2024_07_18)
 
         prompt = socra.Prompt(
             messages=[
@@ -50,28 +49,18 @@ class NodeAddChild(socra.Action[Inputs, str]):
         def on_chunk(stream_chunk):
             spinner.spin()
 
+        model = route(CallClass.EXTRACTION, prompt)
         cr = socra.Completion(
             model,
             prompt,
             # mock_response=inputs.mock_response,
             on_chunk=on_chunk,
+            schema=Outputs,
         )
         resp = cr.process()
 
         spinner.finish()
-        content = resp.content
-
-        if content.startswith("```"):
-            # remove first and last line
-            content = "\n".join(content.split("\n")[1:-1])
-
-        # parse JSON response
-        dct = json.loads(content)
-        outputs = Outputs(
-            name=dct["name"],
-            type=NodeType(dct["type"]),
-            reason=dct["reason"],
-        )
+        outputs = resp.parsed
 
         spinner.message = f"Decided to add {outputs.name} of type {outputs.type} because {outputs.reason.lower()}"
 
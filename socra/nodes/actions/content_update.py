@@ -1,4 +1,5 @@
 import socra
+from socra.models.router import CallClass, rewrite_output_tokens, route
 from socra.utils.decorators import throttle
 from socra.utils.spinner import Spinner
 import typing
@@ -23,8 +24,6 @@ class NodeContentUpdate(socra.Action[Inputs, str]):
         if inputs.node.type != Node.Type.FILE:
             raise ValueError("Node must be a file.")
 
-        model = socra.Model.for_key(socra.Model.Key.GPT_4O_MINI_2024_07_18)
-
         prompt = socra.Prompt(
             messages=[
                 socra.Message(
@@ -42,6 +41,11 @@ class NodeContentUpdate(socra.Action[Inputs, str]):
         def on_chunk(stream_chunk):
             spinner.spin()
 
+        model = route(
+            CallClass.GENERATION,
+            prompt,
+            output_tokens=rewrite_output_tokens(inputs.node.content),
+        )
         cr = socra.Completion(
             model,
             prompt,
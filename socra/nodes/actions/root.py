@@ -1,7 +1,7 @@
 import typing
 import socra
+from socra.models.router import CallClass, route
 from enum import Enum
-import json
 
 from socra.utils.decorators import throttle
 from socra.utils.spinner import Spinner
@@ -81,7 +81,6 @@ class NodeRootAction(socra.Action[Inputs, None]):
             ]
         )
 
-        model = socra.Model.for_key(socra.Model.Key.GPT_4O_MINI_2024_07_18)
         prompt = socra.Prompt(
             messages=[
                 socra.Message(
@@ -102,22 +101,16 @@ class NodeRootAction(socra.Action[Inputs, None]):
         def on_chunk(chunk):
             spinner.spin()
 
+        model = route(CallClass.DECISION, prompt)
         cr = socra.Completion(
             model,
             prompt,
             # mock_response=inputs.mock_response,
             on_chunk=on_chunk,
+            schema=Outputs,
         )
         resp = cr.process()
-
-        content = resp.content
-
-        # parse JSON response
-        dct = json.loads(content)
-        outputs = Outputs(
-            key=ActionKey(dct["key"]),
-            reason=dct["reason"],
-        )
+        outputs = resp.parsed
 
         spinner.message = (
             f"Decided to {outputs.key.value} because {outputs.reason.lower()}"
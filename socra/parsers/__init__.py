@@ -1,5 +1,9 @@
 import json
 
+from socra.parsers.streaming import StreamingJSONParser
+
+__all__ = ["StreamingJSONParser", "parse_json"]
+
 
 def parse_json(json_str: str) -> dict:
     # if begins with ```, strip first line
@@ -0,0 +1,99 @@
+import json
+import typing
+
+
+class StreamingJSONParser:
+    """
+    Incremental parser for a top-level JSON object, fed text as it streams.
+
+    Fields are returned as soon as their value is complete, so callers can act
+    on e.g. a `key` field before the rest of the response has been generated.
+    A leading markdown code fence (```json) is ignored.
+
+    Example:
+        parser = StreamingJSONParser()
+        parser.feed('{"key": "crea')  # => {}
+        parser.feed('te_file", "rea')  # => {"key": "create_file"}
+    """
+
+    def __init__(self):
+        self.fields: typing.Dict[str, typing.Any] = {}
+        self.done = False
+
+        self._buffer = ""
+        self._pos: typing.Optional[int] = None
+        self._decoder = json.JSONDecoder()
+
+    def feed(self, text: str) -> typing.Dict[str, typing.Any]:
+        """
+        Add streamed text. Returns the fields completed by this text.
+        """
+        completed: typing.Dict[str, typing.Any] = {}
+        if self.done:
+            return completed
+
+        self._buffer += text
+        if self._pos is None:
+            start = self._buffer.find("{")
+            if start == -1:
+                return completed
+            self._pos = start + 1
+
+        while True:
+            field = self._next_field()
+            if field is None:
+                break
+            key, value = field
+            self.fields[key] = value
+            completed[key] = value
+
+        return completed
+
+    def _next_field(self) -> typing.Optional[typing.Tuple[str, typing.Any]]:
+        pos = self._skip(self._pos, ",")
+        if pos >= len(self._buffer):
+            return None
+        if self._buffer[pos] == "}":
+            self.done = True
+            return None
+
+        key_and_end = self._decode(pos)
+        if key_and_end is None:
+            return None
+        key, pos = key_and_end
+
+        pos = self._skip(pos, "")
+        if pos >= len(self._buffer):
+            return None
+        if self._buffer[pos] != ":":
+            raise ValueError(f"Expected ':' after key '{key}'")
+
+        pos = self._skip(pos + 1, "")
+        value_and_end = self._decode(pos)
+        if value_and_end is None:
+            return None
+        value, end = value_and_end
+
+        # a number at the end of the buffer may still be growing
+        is_number = isinstance(value, (int, float)) and not isinstance(value, bool)
+        if is_number and end >= len(self._buffer):
+            return None
+
+        self._pos = end
+        return key, value
+
+    def _decode(self, pos: int) -> typing.Optional[typing.Tuple[typing.Any, int]]:
+        if pos >= len(self._buffer):
+            return None
+        try:
+            return self._decoder.raw_decode(self._buffer, pos)
+        except json.JSONDecodeError:
+            # incomplete value, wait for more text
+            return None
+
+    def _skip(self, pos: int, separators: str) -> int:
+        while pos < len(self._buffer) and (
+            self._buffer[pos].isspace() or self._buffer[pos] in separators
+        ):
+            pos += 1
+        return pos
@@ -1,3 +1,4 @@
 from socra.prompts.base import Prompt
+from socra.prompts.ledger import TokenLedger
 
-__all__ = ["Prompt"]
+__all__ = ["Prompt", "TokenLedger"]
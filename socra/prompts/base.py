@@ -1,6 +1,9 @@
+import hashlib
+import json
+import time
 import typing
 
-from pydantic import ValidationError, model_validator
+from pydantic import PrivateAttr, ValidationError, model_validator
 from langchain.schema import (
     AIMessage as LCAIMessage,
     HumanMessage as LCHumanMessage,
@@ -8,18 +11,51 @@ from langchain.schema import (
 )
 
 from socra.schemas import Schema
-from socra.messages import Message
+from socra.messages import Message, MessageSequence
 from socra.models import Model
+from socra.prompts.ledger import TokenLedger
 
 
 class Prompt(Schema):
-    messages: typing.List[Message] = []
+    messages: MessageSequence = MessageSequence()
+
+    _build_time: float = PrivateAttr(default=0.0)
+
+    @classmethod
+    def build(cls, messages: typing.Sequence[Message]) -> "Prompt":
+        """
+        Build a prompt from `messages`, recording the time spent in `build_time`.
+        """
+        started_at = time.perf_counter()
+        prompt = cls(messages=messages)
+        prompt._build_time = time.perf_counter() - started_at
+        return prompt
+
+    @property
+    def build_time(self) -> float:
+        """
+        Seconds spent validating the prompt, when created with `build()`.
+        """
+        return self._build_time
 
     def to_json(self):
         return {
             "messages": [m.to_json() for m in self.messages],
         }
 
+    def digest(self) -> str:
+        """
+        Stable hash of the prompt, computed from a canonical form of `to_json()`.
+        Identical prompts always produce identical digests.
+        """
+        canonical = json.dumps(
+            self.to_json(),
+            sort_keys=True,
+            separators=(",", ":"),
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
     @classmethod
     def from_json(cls, dct: dict):
         return cls(
@@ -41,6 +77,9 @@ class Prompt(Schema):
             raise ValidationError("data should be a dict")
 
         messages = data.get("messages")
+        if isinstance(messages, MessageSequence):
+            # validated as each message was appended
+            return data
         # if messages is None:
         #     raise ValidationError("messages should be included")
 
@@ -77,11 +116,25 @@ class Prompt(Schema):
     def add_message(self, message: Message):
         if not isinstance(message, Message):
             raise ValueError("message should be an instance of Message")
-        self.messages.append(message)
+        self.messages = self.messages.appended(message)
         return self
 
+    def count_tokens(self, model: Model) -> int:
+        """Count total tokens for all messages in the prompt."""
+        return sum(Message.count_tokens_many(model, self.messages))
+
+    def estimate_tokens(self, model: Model, upper_bound: bool = False) -> int:
+        """Estimate total tokens for all messages without tokenizing them,
+        see `Model.estimate_tokens()`.
+        """
+        return sum(m.estimate_tokens(model, upper_bound) for m in self.messages)
+
     def limit_context_window(
-        self, model: Model, buffer_tokens: int = None, max_tokens: int = None
+        self,
+        model: Model,
+        buffer_tokens: int = None,
+        max_tokens: int = None,
+        ledger: typing.Optional[TokenLedger] = None,
     ):
         """Limit the context wndow to a certain number of tokens.
         Returns a new prompt with the context window limited.
@@ -89,41 +142,43 @@ class Prompt(Schema):
         buffer_tokens: number of tokens to leave as buffer
         max_tokens: maximum number of tokens to include in the context window
             - used IFF provided and < model context window
+        ledger: token ledger to reuse across calls, e.g. `Context.token_ledger()`,
+            so only messages added since the last call are counted
 
         Strategy:
+        - keep every message, without counting tokens, if their byte size
+          (an upper bound on their tokens, summed by the ledger) fits
         - include system message
-        - traverse other messages, starting from the end
-        - include messages until we're at the limit
+        - keep the longest run of most recent messages that fits,
+          found by binary search over the ledger's prefix sums
+        - return a window on the messages, sharing them instead of copying
         """
-
-        system_messages = [m for m in self.messages if m.role == Message.Role.SYSTEM]
-        other_messages = [m for m in self.messages if m.role != Message.Role.SYSTEM]
-
-        system_message_token_count = sum(
-            [m.count_tokens(model) for m in system_messages]
-        )
+        if ledger is not None and ledger.model.encoding != model.encoding:
+            raise ValueError("ledger counts tokens for a different encoding")
 
         model_limit = model.context_window
         if max_tokens is not None and max_tokens < model_limit:
             model_limit = max_tokens
 
         buffer_tokens = buffer_tokens if buffer_tokens is not None else 0
+        budget = model_limit - buffer_tokens
 
-        # max number of tokens other_messages can occupy
-        calculated_max_tokens = model_limit - system_message_token_count - buffer_tokens
+        if ledger is None:
+            ledger = TokenLedger(model)
+        ledger.sync(self.messages)
 
-        # iterate through messages, starting from the end
-        limited_messages: typing.List[Message] = []
-        num_tokens = 0
-        for message in reversed(other_messages):
-            message_tokens = message.count_tokens(model)
-            if num_tokens + message_tokens > calculated_max_tokens:
-                break
+        if ledger.bound() <= budget:
+            return Prompt.model_construct(messages=self.messages)
+
+        # the system message, if any, is always first
+        start = int(
+            bool(self.messages) and self.messages[0].role == Message.Role.SYSTEM
+        )
 
-            limited_messages.append(message)
-            num_tokens += message_tokens
+        # max number of tokens other messages can occupy
+        calculated_max_tokens = budget - ledger.tokens(0, start)
 
-        limited_messages.reverse()
+        cut = ledger.cut(calculated_max_tokens, start=start)
 
-        # return a new prompt with the limited messages
-        return Prompt(messages=system_messages + limited_messages)
+        # the kept messages are a valid prompt already, skip re-validating them
+        return Prompt.model_construct(messages=self.messages.window(cut, head=start))
@@ -0,0 +1,101 @@
+import bisect
+import typing
+from array import array
+
+from socra.messages import Message, MessageSequence
+from socra.models import Model
+
+
+class TokenLedger:
+    """
+    Prefix sums of per-message token counts over a growing list of messages.
+
+    `sync()` brings the ledger up to date with the current messages. Messages
+    added since the last sync are counted on the first `tokens()` or `cut()`
+    call, so the token count of any range of messages and the cut point for
+    a token budget are found in O(log n). Their UTF-8 sizes, an upper bound
+    on their tokens, are summed as they are synced: `bound()` tells whether
+    the messages fit without counting them.
+
+    Messages are matched by identity, and re-counted from the first message
+    that differs. For a `MessageSequence`, leaves shared with the last synced
+    sequence are matched at once, so appending to a history (or replacing
+    its tail, like the per-call instruction of a context prompt) is cheap.
+    """
+
+    def __init__(self, model: Model):
+        self.model = model
+        self._messages: typing.List[Message] = []
+        self._sequence: typing.Optional[MessageSequence] = None
+        self._prefix = array("q", [0])
+        self._bounds = array("q", [0])
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    def sync(self, messages: typing.Sequence[Message]) -> "TokenLedger":
+        common = self._common_prefix(messages)
+        if common < len(self._messages):
+            del self._messages[common:]
+            del self._prefix[common + 1 :]
+            del self._bounds[common + 1 :]
+
+        added = messages[common:]
+        if added:
+            total = self._bounds[-1]
+            for message in added:
+                total += message.estimate_tokens(self.model, upper_bound=True)
+                self._bounds.append(total)
+            self._messages.extend(added)
+        self._sequence = messages if isinstance(messages, MessageSequence) else None
+        return self
+
+    def bound(self, start: int = 0, end: typing.Optional[int] = None) -> int:
+        """
+        Upper bound on the token count of messages[start:end], without
+        counting them: their UTF-8 size.
+        """
+        end = len(self._messages) if end is None else end
+        return self._bounds[end] - self._bounds[start]
+
+    def tokens(self, start: int = 0, end: typing.Optional[int] = None) -> int:
+        """
+        Token count of messages[start:end].
+        """
+        self._count()
+        end = len(self._messages) if end is None else end
+        return self._prefix[end] - self._prefix[start]
+
+    def cut(self, budget: int, start: int = 0) -> int:
+        """
+        Smallest index `i >= start` such that messages[i:] fit in `budget` tokens.
+        Returns the number of messages if not even the last one fits.
+        """
+        self._count()
+        # messages[i:] fit iff prefix[i] >= total - budget
+        return bisect.bisect_left(
+            self._prefix,
+            self._prefix[-1] - budget,
+            lo=start,
+            hi=len(self._messages),
+        )
+
+    def _count(self):
+        """
+        Count the messages synced since the last count.
+        """
+        uncounted = self._messages[len(self._prefix) - 1 :]
+        if uncounted:
+            total = self._prefix[-1]
+            for count in Message.count_tokens_many(self.model, uncounted):
+                total += count
+                self._prefix.append(total)
+
+    def _common_prefix(self, messages: typing.Sequence[Message]) -> int:
+        if self._sequence is not None and isinstance(messages, MessageSequence):
+            return messages.common_prefix(self._sequence)
+
+        for i, (a, b) in enumerate(zip(messages, self._messages)):
+            if a is not b:
+                return i
+        return min(len(messages), len(self._messages))